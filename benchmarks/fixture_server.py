@@ -0,0 +1,321 @@
+# -*- coding: utf-8 -*-
+"""Servidor HTTP local que imita as páginas do Google Maps usadas pelo scraper.
+
+Serve uma página inicial com ``#searchboxinput``, uma lista ``role="feed"`` com
+links ``/maps/place`` carregados em lotes durante a rolagem e painéis de detalhes
+com as mesmas classes e atributos procurados pelo scraper (``DUwDvf``, ``F7nice``,
+``LTs0Rc``, ``data-item-id="address"``...). Os dados são sintéticos e
+determinísticos, e cada tipo de requisição tem uma latência configurável.
+
+Os links apontam para ``https://www.google.com/maps/place/...`` (o scraper procura
+esse prefixo); ``route_to_fixture`` redireciona essas requisições do navegador
+para este servidor.
+
+Uso isolado: python benchmarks/fixture_server.py --port 8765
+"""
+import argparse
+import asyncio
+import html
+import json
+import re
+import threading
+import time
+import urllib.error
+import urllib.request
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, quote, unquote, urlsplit
+
+PUBLIC_BASE = "https://www.google.com"
+
+_PLACE_ID_RE = re.compile(r"!19sChIJfx(\d+)")
+_SEARCH_PATH_RE = re.compile(r"^/maps/search/([^/@]+)")
+
+NEIGHBORHOODS = ["Centro", "Jardim dos Estados", "Tiradentes", "Amambaí", "Monte Castelo", "Santa Fé"]
+SERVICES = ["Compras na loja", "Retirada na porta", "Entrega"]
+
+PAGE_TEMPLATE = """<!DOCTYPE html>
+<html lang="pt-BR">
+<head>
+<meta charset="UTF-8">
+<title>Google Maps (fixture)</title>
+<style>
+  body { margin: 0; font-family: sans-serif; display: flex; height: 100vh; }
+  #side { width: 420px; display: flex; flex-direction: column; }
+  #results { flex: 1; min-height: 0; }
+  div[role="feed"] { height: 600px; overflow-y: auto; }
+  .Nv2PK { height: 80px; border-bottom: 1px solid #ddd; }
+  .Nv2PK a { display: block; padding: 8px; }
+  #details { flex: 1; padding: 16px; }
+</style>
+</head>
+<body>
+<div id="side">
+  <input id="searchboxinput" name="q" value="__QUERY__" autocomplete="off">
+  <div id="results"></div>
+</div>
+<div id="details">__DETAILS__</div>
+<script>
+const feedState = {query: null, offset: 0, done: false, loading: false};
+
+async function loadMore() {
+  if (feedState.loading || feedState.done) return;
+  feedState.loading = true;
+  const response = await fetch('/maps/feed?q=' + encodeURIComponent(feedState.query) + '&offset=' + feedState.offset);
+  const batch = await response.json();
+  const feed = document.querySelector('div[role="feed"]');
+  feed.insertAdjacentHTML('beforeend', batch.html);
+  feedState.offset = batch.next;
+  feedState.done = batch.done;
+  if (batch.done) feed.insertAdjacentHTML('beforeend', '<p class="HlvSq">Você chegou ao final da lista.</p>');
+  feedState.loading = false;
+}
+
+async function runSearch(query) {
+  Object.assign(feedState, {query, offset: 0, done: false, loading: false});
+  const results = document.getElementById('results');
+  results.innerHTML = '<div aria-label="Resultados para ' + query.replace(/"/g, '') + '"><div role="feed"></div></div>';
+  const feed = results.querySelector('div[role="feed"]');
+  feed.addEventListener('scroll', () => {
+    if (feed.scrollTop + feed.clientHeight >= feed.scrollHeight - 200) loadMore();
+  });
+  await loadMore();
+}
+
+document.getElementById('searchboxinput').addEventListener('keydown', (event) => {
+  if (event.key !== 'Enter') return;
+  const query = event.target.value.trim();
+  history.pushState({}, '', '/maps/search/' + encodeURIComponent(query));
+  runSearch(query);
+});
+
+document.addEventListener('click', async (event) => {
+  const link = event.target.closest('a.hfpxzc');
+  if (!link) return;
+  event.preventDefault();
+  const path = new URL(link.href).pathname;
+  history.pushState({}, '', path);
+  const response = await fetch(path + '?panel=1');
+  document.getElementById('details').innerHTML = await response.text();
+});
+
+const initialQuery = __INITIAL_QUERY__;
+if (initialQuery) runSearch(initialQuery);
+</script>
+</body>
+</html>
+"""
+
+
+def place_id_for(query, index):
+    """ID sintético do lugar: estável para a mesma consulta e posição na lista."""
+    return (zlib.crc32(query.encode("utf-8")) % 10000) * 1000 + index
+
+
+def place_url(place_id):
+    slug = quote(f"Estabelecimento {place_id}".replace(" ", "+"), safe="+")
+    return (
+        f"{PUBLIC_BASE}/maps/place/{slug}/data=!4m7!3m6!1s0x{place_id:x}:0x{place_id * 7:x}"
+        f"!8m2!3d-20.4{place_id % 1000:03d}!4d-54.6{place_id % 997:03d}!16s!19sChIJfx{place_id}"
+    )
+
+
+def place_data(place_id):
+    reviews = 10 + (place_id * 7) % 900
+    data = {
+        "name": f"Estabelecimento {place_id}",
+        "type": "Farmácia",
+        "address": f"Rua {place_id % 500 + 1}, {NEIGHBORHOODS[place_id % len(NEIGHBORHOODS)]} - Campo Grande - MS",
+        "phone": f"(67) 3{place_id % 1000:03d}-{place_id % 10000:04d}",
+        "website": f"estabelecimento{place_id}.com.br" if place_id % 5 else None,
+        "opening_hours": "Aberto ⋅ Fecha às 22:00",
+        "introduction": "Atendimento de bairro com entrega rápida." if place_id % 3 == 0 else None,
+        "rating": f"{3 + place_id % 3},{place_id % 10}",
+        "reviews": reviews,
+        "services": [service for bit, service in enumerate(SERVICES) if (place_id >> bit) & 1],
+    }
+    return data
+
+
+def render_feed_item(place_id):
+    data = place_data(place_id)
+    name = html.escape(data["name"])
+    return (
+        f'<div class="Nv2PK"><a class="hfpxzc" aria-label="{name}" href="{html.escape(place_url(place_id))}">{name}</a>'
+        f'<span role="img" aria-label="{data["rating"]} estrelas {data["reviews"]} avaliações"></span></div>'
+    )
+
+
+def render_details(place_id):
+    data = place_data(place_id)
+    esc = html.escape
+    parts = [
+        f'<h1 class="DUwDvf fontHeadlineLarge">{esc(data["name"])}</h1>',
+        f'<div class="F7nice"><span>{data["rating"]}</span> '
+        f'<span aria-label="{data["reviews"]} avaliações">({data["reviews"]})</span></div>',
+        f'<button jsaction="pane.rating.category">{esc(data["type"])}</button>',
+    ]
+    if data["introduction"]:
+        parts.append(f'<div class="WeS02d"><div class="PYvSYb">{esc(data["introduction"])}</div></div>')
+    parts.extend(f'<div class="LTs0Rc">{esc(service)}</div>' for service in data["services"])
+    parts.append(f'<button data-item-id="address"><div class="fontBodyMedium">{esc(data["address"])}</div></button>')
+    parts.append(f'<div aria-label="Horário de funcionamento">{esc(data["opening_hours"])}</div>')
+    if data["website"]:
+        parts.append(
+            f'<a data-item-id="authority" href="https://{data["website"]}/">'
+            f'<div class="fontBodyMedium">{esc(data["website"])}</div></a>'
+        )
+    digits = re.sub(r"\D", "", data["phone"])
+    parts.append(
+        f'<button data-item-id="phone:tel:+55{digits}"><div class="fontBodyMedium">{esc(data["phone"])}</div></button>'
+    )
+    return "\n".join(parts)
+
+
+def render_page(query="", details="", initial_query=None):
+    return (
+        PAGE_TEMPLATE
+        .replace("__QUERY__", html.escape(query))
+        .replace("__DETAILS__", details)
+        .replace("__INITIAL_QUERY__", json.dumps(initial_query))
+    )
+
+
+class FixtureServer:
+    """Servidor da fixture em uma thread, com latências (ms) por tipo de requisição."""
+
+    def __init__(self, listings=120, batch_size=20, page_latency_ms=0, feed_latency_ms=0,
+                 detail_latency_ms=0, host="127.0.0.1", port=0):
+        self.listings = listings
+        self.batch_size = batch_size
+        self.page_latency_ms = page_latency_ms
+        self.feed_latency_ms = feed_latency_ms
+        self.detail_latency_ms = detail_latency_ms
+        self.requests = 0
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fixture-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _handler_class(self):
+        fixture = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def _send(self, body, content_type="text/html; charset=utf-8", status=200, latency_ms=0):
+                if latency_ms:
+                    time.sleep(latency_ms / 1000)
+                payload = body.encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_GET(self):
+                fixture.requests += 1
+                parts = urlsplit(self.path)
+                path = unquote(parts.path)
+                params = parse_qs(parts.query)
+
+                if path == "/maps/feed":
+                    query = params.get("q", [""])[0]
+                    offset = int(params.get("offset", ["0"])[0])
+                    end = min(fixture.listings, offset + fixture.batch_size)
+                    items = "".join(render_feed_item(place_id_for(query, index)) for index in range(offset, end))
+                    body = json.dumps({"html": items, "next": end, "done": end >= fixture.listings})
+                    return self._send(body, "application/json", latency_ms=fixture.feed_latency_ms)
+
+                if path.startswith("/maps/place/"):
+                    match = _PLACE_ID_RE.search(path)
+                    if not match:
+                        return self._send("Lugar não encontrado", status=404)
+                    details = render_details(int(match.group(1)))
+                    if "panel" in params:
+                        return self._send(details, latency_ms=fixture.detail_latency_ms)
+                    return self._send(render_page(details=details), latency_ms=fixture.detail_latency_ms)
+
+                search = _SEARCH_PATH_RE.match(path)
+                if search:
+                    query = search.group(1).replace("+", " ")
+                    return self._send(render_page(query, initial_query=query), latency_ms=fixture.page_latency_ms)
+
+                if path.rstrip("/") == "/maps":
+                    return self._send(render_page(), latency_ms=fixture.page_latency_ms)
+
+                return self._send("Não encontrado", status=404)
+
+        return Handler
+
+
+def fixture_url_for(fixture_url, public_url):
+    """URL da fixture que atende uma URL pública do Maps (usada também pela extração via HTTP)."""
+    parts = urlsplit(public_url)
+    return fixture_url + parts.path + (f"?{parts.query}" if parts.query else "")
+
+
+def _fetch_from_fixture(fixture_url, public_url):
+    try:
+        with urllib.request.urlopen(fixture_url_for(fixture_url, public_url), timeout=60) as response:
+            return response.status, response.headers.get("Content-Type"), response.read()
+    except urllib.error.HTTPError as e:
+        return e.code, e.headers.get("Content-Type"), e.read()
+
+
+def route_to_fixture(context, fixture_url):
+    """Atende as requisições do navegador para www.google.com/maps a partir da fixture."""
+
+    def handle(route):
+        status, content_type, body = _fetch_from_fixture(fixture_url, route.request.url)
+        route.fulfill(status=status, content_type=content_type, body=body)
+
+    context.route(f"{PUBLIC_BASE}/maps**", handle)
+
+
+async def route_to_fixture_async(context, fixture_url):
+    """Versão de ``route_to_fixture`` para contextos da API assíncrona (motor ``async``)."""
+
+    async def handle(route):
+        status, content_type, body = await asyncio.to_thread(_fetch_from_fixture, fixture_url, route.request.url)
+        await route.fulfill(status=status, content_type=content_type, body=body)
+
+    await context.route(f"{PUBLIC_BASE}/maps**", handle)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor local que imita o Google Maps para benchmarks.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--listings", type=int, default=120, help="Lugares por busca")
+    parser.add_argument("--batch", type=int, default=20, help="Lugares carregados a cada rolagem")
+    parser.add_argument("--page-latency-ms", type=int, default=0)
+    parser.add_argument("--feed-latency-ms", type=int, default=0)
+    parser.add_argument("--detail-latency-ms", type=int, default=0)
+    args = parser.parse_args()
+    server = FixtureServer(
+        args.listings, args.batch, args.page_latency_ms, args.feed_latency_ms, args.detail_latency_ms, port=args.port
+    ).start()
+    print(f"Fixture em {server.url}/maps (Ctrl+C para encerrar)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
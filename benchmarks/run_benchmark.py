@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+"""Benchmark offline de ``scrape_google_maps_v2`` contra a fixture local do Maps.
+
+Mede o tempo total e por fase (busca, rolagem, detalhes), a latência de extração
+por estabelecimento (p50/p95), as chamadas ao navegador (IPC) e o pico de memória
+(RSS do processo e dos navegadores). Com ``--baseline``, compara com um resultado
+salvo anteriormente por ``--json`` e termina com código 1 se alguma métrica piorar
+além de ``--max-regression``.
+
+Uso:
+    python benchmarks/run_benchmark.py --listings 120 --max-results 100 --json bench.json
+    python benchmarks/run_benchmark.py --baseline bench.json
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fixture_server import FixtureServer, fixture_url_for, route_to_fixture, route_to_fixture_async
+from src.metrics import RssSampler
+
+# Métricas em que um valor maior é pior, comparadas com o baseline
+REGRESSION_METRICS = [
+    "total_seconds",
+    "scroll_seconds",
+    "details_seconds",
+    "listing_seconds_p50",
+    "listing_seconds_p95",
+    "ipc_calls",
+    "peak_rss_mb",
+]
+
+
+def configure_environment(args, data_dir):
+    """Configura o scraper antes da importação: sem cache, índice de deduplicação, diário ou fila compartilhada."""
+    os.environ.update({
+        "SCRAPER_DETAIL_WORKERS": str(args.workers),
+        "SCRAPER_BROWSER_POOL_SIZE": str(args.workers),
+        "SCRAPER_WAIT_MODE": args.wait_mode,
+        "SCRAPER_EXTRACTION_MODE": args.extraction_mode,
+        "SCRAPER_ENGINE": args.engine,
+        "SCRAPER_ASYNC_MAX_PAGES": str(args.workers),
+        "SCRAPER_HTTP_EXTRACTION": "1" if args.http_extraction else "0",
+        "SCRAPER_CACHE_ENABLED": "0",
+        "SCRAPER_DEDUPE_INDEX_ENABLED": "0",
+        "SCRAPER_JOURNAL_ENABLED": "0",
+        "SCRAPER_QUEUE_BACKEND": "local",
+        "SCRAPER_DATA_DIR": data_dir,
+    })
+
+
+def run_once(scraper, args):
+    status = {}
+    start = time.time()
+    search_query = f"{args.establishment_type} em {args.location}"
+    with RssSampler(interval=0.1) as sampler:
+        if scraper.async_engine is not None:
+            results = scraper.async_engine.run(
+                scraper.scrape_google_maps_async(search_query, args.max_results, status, args.wait_mode)
+            )
+        else:
+            results = scraper.scrape_google_maps_v2(search_query, args.max_results, status, args.wait_mode)
+    phases = status.get("phase_seconds", {})
+    return {
+        "results": len(results),
+        "error": status.get("error"),
+        "total_seconds": round(time.time() - start, 3),
+        "search_seconds": phases.get("search"),
+        "scroll_seconds": phases.get("scroll"),
+        "details_seconds": phases.get("details"),
+        "listing_seconds_p50": status.get("listing_seconds_p50"),
+        "listing_seconds_p95": status.get("listing_seconds_p95"),
+        "ipc_calls": status.get("ipc_calls"),
+        "avg_round_trips_per_listing": status.get("avg_round_trips_per_listing"),
+        "http_extractions": status.get("http_extractions"),
+        "http_fallbacks": status.get("http_fallbacks"),
+        "wait_seconds": status.get("wait_seconds"),
+        "peak_rss_mb": round(sampler.peak_mb, 1) if sampler.peak_mb is not None else None,
+    }
+
+
+def summarize(runs):
+    """Mediana de cada métrica numérica entre as repetições."""
+    summary = {}
+    for key in runs[0]:
+        values = [run[key] for run in runs if isinstance(run[key], (int, float))]
+        summary[key] = round(statistics.median(values), 3) if values else runs[0][key]
+    return summary
+
+
+def compare(summary, baseline, max_regression):
+    regressions = []
+    for key in REGRESSION_METRICS:
+        current, previous = summary.get(key), baseline.get(key)
+        if not isinstance(current, (int, float)) or not isinstance(previous, (int, float)) or previous <= 0:
+            continue
+        change = (current - previous) / previous
+        if change > max_regression:
+            regressions.append(f"{key}: {previous} -> {current} (+{change:.0%})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark offline do scraper contra a fixture local do Maps.")
+    parser.add_argument("--listings", type=int, default=120, help="Lugares na lista da fixture")
+    parser.add_argument("--batch", type=int, default=20, help="Lugares carregados a cada rolagem")
+    parser.add_argument("--max-results", type=int, default=100)
+    parser.add_argument("--page-latency-ms", type=int, default=200)
+    parser.add_argument("--feed-latency-ms", type=int, default=300)
+    parser.add_argument("--detail-latency-ms", type=int, default=150)
+    parser.add_argument("--workers", type=int, default=4,
+                        help="SCRAPER_DETAIL_WORKERS (1 = extração por clique) ou páginas do motor assíncrono")
+    parser.add_argument("--engine", choices=["sync", "async"], default="sync", help="SCRAPER_ENGINE")
+    parser.add_argument("--wait-mode", choices=["event", "fixed"], default="event")
+    parser.add_argument("--extraction-mode", choices=["evaluate", "locators"], default="evaluate")
+    parser.add_argument("--http-extraction", action="store_true",
+                        help="SCRAPER_HTTP_EXTRACTION=1: detalhes pelo HTML, sem navegador")
+    parser.add_argument("--establishment-type", default="farmácia")
+    parser.add_argument("--location", default="Campo Grande")
+    parser.add_argument("--repeat", type=int, default=1, help="Repetições (o resumo usa a mediana)")
+    parser.add_argument("--json", help="Grava o resumo neste arquivo (para uso como baseline)")
+    parser.add_argument("--baseline", help="Resumo de uma execução anterior para comparação")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="Piora relativa tolerada (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    configure_environment(args, tempfile.mkdtemp(prefix="gms-bench-"))
+    import src.main as scraper
+
+    server = FixtureServer(
+        args.listings, args.batch, args.page_latency_ms, args.feed_latency_ms, args.detail_latency_ms
+    ).start()
+    if scraper.http_extractor is not None:
+        scraper.http_extractor.url_rewriter = lambda url: fixture_url_for(server.url, url)
+    if scraper.async_engine is not None:
+        async def setup_async(context):
+            await route_to_fixture_async(context, server.url)
+        scraper.async_engine.context_setup = setup_async
+    else:
+        context_setup = scraper.browser_pool.context_setup
+
+        def setup(context):
+            if context_setup is not None:
+                context_setup(context)
+            route_to_fixture(context, server.url)
+        scraper.browser_pool.context_setup = setup
+
+        # Inicia e aquece todos os navegadores antes de medir
+        start = time.time()
+        warmups = [scraper.browser_pool.submit(lambda page: time.sleep(0.5), needs_home=True)
+                   for _ in range(scraper.browser_pool.size)]
+        for future in warmups:
+            future.result()
+        print(f"Pool de {scraper.browser_pool.size} navegadores pronto em {time.time() - start:.2f}s.")
+
+    runs = []
+    try:
+        for index in range(args.repeat):
+            run = run_once(scraper, args)
+            runs.append(run)
+            print(f"Execução {index + 1}/{args.repeat}: {json.dumps(run, ensure_ascii=False)}")
+    finally:
+        scraper.browser_pool.shutdown()
+        if scraper.async_engine is not None:
+            scraper.async_engine.shutdown()
+        server.stop()
+
+    summary = summarize(runs)
+    summary["config"] = {key: value for key, value in vars(args).items() if key not in ("json", "baseline")}
+    print("\nResumo (mediana):")
+    for key, value in summary.items():
+        if key != "config":
+            print(f"  {key:<30} {value}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as output:
+            json.dump(summary, output, ensure_ascii=False, indent=2)
+        print(f"\nResumo gravado em {args.json}.")
+
+    expected = min(args.listings, args.max_results)
+    failures = []
+    if summary["error"] or summary["results"] != expected:
+        failures.append(f"esperados {expected} resultados, obtidos {summary['results']} (erro: {summary['error']})")
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as baseline_file:
+            failures.extend(compare(summary, json.load(baseline_file), args.max_regression))
+    if failures:
+        print("\nFALHA:")
+        for failure in failures:
+            print(f"  - {failure}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
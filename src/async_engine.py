@@ -0,0 +1,388 @@
+# -*- coding: utf-8 -*-
+"""Motor de coleta assíncrono, baseado na API ``async_api`` do Playwright.
+
+Um único navegador, com alguns contextos, atende todas as páginas a partir de um
+event loop que roda em uma thread própria. As páginas ficam em um pool de
+tamanho fixo (``max_pages``), que funciona como o semáforo das extrações: com
+uma só conexão ao Playwright, dezenas de estabelecimentos são abertos ao mesmo
+tempo sem uma thread (e um driver) por navegador.
+
+Quem usa o motor a partir de código síncrono chama ``engine.run(coro)``.
+"""
+import asyncio
+import atexit
+import logging
+import threading
+import time
+from contextlib import asynccontextmanager
+from urllib.parse import quote
+
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+from playwright.async_api import async_playwright
+
+from src.governor import BLOCKED, ERROR, NO_NAME, OK, TIMEOUT, detect_block_page_async
+from src.harvester import FeedHarvester
+from src.metrics import (
+    BROWSER_LAUNCH_SECONDS, BROWSER_RECYCLES_TOTAL, ERRORS_TOTAL, LISTING_EXTRACT_SECONDS, LISTING_READY_SECONDS,
+    PAGE_LOAD_SECONDS, SCROLL_ITERATION_SECONDS, SEARCH_SECONDS
+)
+from src.place_extractor import NAME_XPATH, IpcCounter, extract_place_details_async
+from src.waits import DOM_STABLE_JS, FEED_GROWTH_JS
+
+MAPS_SEARCH_URL = "https://www.google.com/maps/search/"
+
+
+class _PageSlot:
+    """Uma vaga do pool de páginas, ligada sempre ao mesmo contexto."""
+
+    def __init__(self, slot_id):
+        self.slot_id = slot_id
+        self.page = None
+        self.generation = 0
+        self.uses = 0
+        self.busy = False
+        # Contadores de requisições bloqueadas do job que está usando a página
+        self.stats = None
+
+
+class AsyncEngine:
+    """Navegador compartilhado por muitas páginas, dirigido por um event loop."""
+
+    def __init__(self, max_pages=16, contexts=4, context_options=None, blocker=None, max_uses=200,
+                 context_setup=None, memory_guard=None):
+        self.max_pages = max(1, max_pages)
+        self.contexts = max(1, min(contexts, self.max_pages))
+        self.context_options = context_options or {}
+        # Corrotina opcional fn(context) chamada em cada contexto criado (ex: rotas de teste)
+        self.context_setup = context_setup
+        self.blocker = blocker
+        self.max_uses = max_uses
+        # MemoryGuard opcional: acima do limite de memória, a página devolvida é fechada e reaberta
+        self.memory_guard = memory_guard
+        self.restarts = 0
+        self._slots = [_PageSlot(slot_id + 1) for slot_id in range(self.max_pages)]
+        self._loop = None
+        self._thread = None
+        self._lock = threading.Lock()
+        self._closed = False
+        # Criados dentro do event loop
+        self._free = None
+        self._browser_lock = None
+        self._playwright = None
+        self._browser = None
+        self._contexts = []
+        self._generation = 0
+
+    # --- Event loop ---
+
+    def _ensure_loop(self):
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("O motor assíncrono já foi encerrado.")
+            if self._loop is not None:
+                return
+            self._loop = asyncio.new_event_loop()
+            self._thread = threading.Thread(target=self._loop.run_forever, name="async-engine", daemon=True)
+            self._thread.start()
+            asyncio.run_coroutine_threadsafe(self._setup(), self._loop).result()
+            atexit.register(self.shutdown)
+            logging.info(f"[Async] Motor assíncrono iniciado com até {self.max_pages} páginas em {self.contexts} contextos.")
+
+    async def _setup(self):
+        self._free = asyncio.Queue()
+        for slot in self._slots:
+            self._free.put_nowait(slot)
+        self._browser_lock = asyncio.Lock()
+
+    def run(self, coro, timeout=None):
+        """Executa a corrotina no event loop do motor e aguarda o resultado."""
+        self._ensure_loop()
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result(timeout=timeout)
+
+    # --- Navegador e páginas ---
+
+    async def _ensure_browser(self):
+        async with self._browser_lock:
+            if self._browser is not None and self._browser.is_connected():
+                return
+            if self._browser is not None:
+                logging.warning("[Async] Navegador desconectado. Reiniciando.")
+                self.restarts += 1
+                await self._close_browser()
+            if self._playwright is None:
+                self._playwright = await async_playwright().start()
+            logging.info("[Async] Iniciando navegador...")
+            with BROWSER_LAUNCH_SECONDS.time():
+                self._browser = await self._playwright.chromium.launch(headless=True)
+                self._contexts = [
+                    await self._browser.new_context(**self.context_options) for _ in range(self.contexts)
+                ]
+                if self.context_setup is not None:
+                    for context in self._contexts:
+                        await self.context_setup(context)
+            # Páginas abertas no navegador anterior deixam de valer
+            self._generation += 1
+
+    async def _close_browser(self):
+        browser, self._browser, self._contexts = self._browser, None, []
+        try:
+            if browser is not None and browser.is_connected():
+                await browser.close()
+        except Exception as e:
+            logging.warning(f"[Async] Erro ao fechar navegador: {e}")
+
+    async def _open_page(self, slot):
+        await self._ensure_browser()
+        context = self._contexts[(slot.slot_id - 1) % len(self._contexts)]
+        slot.page = await context.new_page()
+        slot.generation = self._generation
+        slot.uses = 0
+        if self.blocker is not None:
+            await self.blocker.install_async(slot.page, lambda: slot.stats)
+
+    async def _recycle_page(self, slot):
+        page, slot.page = slot.page, None
+        try:
+            if page is not None and not page.is_closed():
+                await page.close()
+        except Exception as e:
+            logging.debug(f"[Async] Erro ao fechar página {slot.slot_id}: {e}")
+
+    def _page_usable(self, slot):
+        return (
+            slot.page is not None
+            and not slot.page.is_closed()
+            and slot.generation == self._generation
+            and self._browser is not None
+            and self._browser.is_connected()
+        )
+
+    @asynccontextmanager
+    async def page(self, stats=None):
+        """Empresta uma página do pool; aguarda se todas estiverem em uso."""
+        slot = await self._free.get()
+        try:
+            if not self._page_usable(slot):
+                await self._recycle_page(slot)
+                await self._open_page(slot)
+            slot.busy = True
+            slot.stats = stats
+            yield slot.page
+        finally:
+            slot.busy = False
+            slot.stats = None
+            slot.uses += 1
+            reason = None
+            if self.max_uses and slot.uses >= self.max_uses:
+                reason = "uses"
+            elif self.memory_guard is not None:
+                memory_reason = self.memory_guard.claim_recycle()
+                if memory_reason is not None:
+                    logging.info(f"[Async] Reciclando página {slot.slot_id} ({memory_reason}).")
+                    reason = "memory"
+            if reason is not None:
+                BROWSER_RECYCLES_TOTAL.inc(reason=reason)
+                await self._recycle_page(slot)
+            self._free.put_nowait(slot)
+
+    @property
+    def pages_per_context(self):
+        return -(-self.max_pages // self.contexts)
+
+    def context_name(self, page):
+        """Nome do contexto ao qual a página emprestada pertence (usado pelo governador)."""
+        for slot in self._slots:
+            if slot.page is page:
+                return f"async-context-{(slot.slot_id - 1) % self.contexts + 1}"
+        return "async-context-?"
+
+    def stats(self):
+        return {
+            "max_pages": self.max_pages,
+            "contexts": self.contexts,
+            "started": self._loop is not None,
+            "browser_connected": bool(self._browser is not None and self._browser.is_connected()),
+            "busy_pages": sum(1 for slot in self._slots if slot.busy),
+            "open_pages": sum(1 for slot in self._slots if slot.page is not None),
+            "restarts": self.restarts,
+            "memory_guard": self.memory_guard.stats() if self.memory_guard is not None else None,
+        }
+
+    def shutdown(self, timeout=30):
+        """Fecha o navegador e encerra o event loop."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            loop = self._loop
+        if loop is None:
+            return
+
+        async def close():
+            await self._close_browser()
+            if self._playwright is not None:
+                await self._playwright.stop()
+        try:
+            asyncio.run_coroutine_threadsafe(close(), loop).result(timeout=timeout)
+        except Exception as e:
+            logging.warning(f"[Async] Erro ao encerrar o motor assíncrono: {e}")
+        loop.call_soon_threadsafe(loop.stop)
+        self._thread.join(timeout=timeout)
+        logging.info("[Async] Motor assíncrono encerrado.")
+
+
+# --- Esperas (mesmas regras do Waiter, em versão assíncrona) ---
+
+async def _timed(waiter, step, coro):
+    start = time.time()
+    try:
+        return await coro
+    finally:
+        waiter.record(step, time.time() - start)
+
+
+async def _dom_stable(page, quiet_ms, timeout_ms):
+    try:
+        return bool(await page.evaluate(DOM_STABLE_JS, [quiet_ms, timeout_ms]))
+    except Exception as e:
+        logging.warning(f"[Async] Falha ao aguardar DOM estável: {e}")
+        return False
+
+
+async def _feed_growth(page, link_xpath, previous_count, timeout_ms):
+    try:
+        await page.wait_for_function(FEED_GROWTH_JS, arg=[link_xpath, previous_count], timeout=timeout_ms)
+        return True
+    except PlaywrightTimeoutError:
+        return False
+
+
+async def after_scroll(waiter, page, link_xpath, previous_count):
+    if waiter.event_driven:
+        return await _timed(waiter, "scroll", _feed_growth(page, link_xpath, previous_count, 3000))
+    await _timed(waiter, "scroll", page.wait_for_timeout(3000))
+
+
+async def between_scrolls(waiter, page):
+    if not waiter.event_driven:
+        await _timed(waiter, "scroll", page.wait_for_timeout(500))
+
+
+async def after_detail_load(waiter, page):
+    if waiter.event_driven:
+        return await _timed(waiter, "detail", _dom_stable(page, 300, 1500))
+    await _timed(waiter, "detail", page.wait_for_timeout(1500))
+
+
+# --- Tarefas de coleta ---
+
+def search_page_url(search_query):
+    """URL de busca do Maps: abre a lista de resultados sem passar pela página inicial."""
+    return MAPS_SEARCH_URL + quote(search_query)
+
+
+async def search_and_collect_async(page, search_query, max_results, run, status, panel_xpath, link_xpath,
+                                   scrollable_xpath, shard=None):
+    """Abre a busca (ou a sub-área), rola a lista e retorna as URLs dos estabelecimentos.
+
+    Contraparte de ``_search_and_collect`` sem a extração por clique: os detalhes
+    são sempre abertos pela URL, em paralelo.
+    """
+    waiter = run.waiter
+    page = IpcCounter(page)
+    try:
+        search_started = time.time()
+        url = shard.url if shard is not None and shard.url else search_page_url(search_query)
+        status["progress"] = 10
+        status["message"] = f"Buscando por: {search_query}... "
+        logging.info(f"[Async] Abrindo busca: {url}")
+        with PAGE_LOAD_SECONDS.time(page="search"):
+            await page.goto(url, timeout=60000)
+        try:
+            await page.wait_for_selector(f"{panel_xpath} | {link_xpath}", timeout=45000)
+        except PlaywrightTimeoutError as e:
+            logging.error(f"[Async] Não foi possível encontrar resultados iniciais para '{search_query}': {e}")
+            ERRORS_TOTAL.inc(stage="search")
+            status["error"] = f"Não foi possível encontrar resultados para '{search_query}'"
+            return []
+        SEARCH_SECONDS.observe(time.time() - search_started)
+        run.add_phase("search", time.time() - search_started)
+        status["progress"] = 20
+        status["message"] = "Carregando resultados..."
+
+        harvester = FeedHarvester(page, link_xpath)
+        await harvester.harvest_async()
+        scroll_started = time.time()
+        scrollable = page.locator(scrollable_xpath).first
+        has_scrollable = await page.locator(scrollable_xpath).count() > 0
+        scroll_attempts = 0
+        no_new_results_streak = 0
+        while len(harvester.entries) < max_results and scroll_attempts < 100:
+            iteration_started = time.time()
+            if has_scrollable:
+                await scrollable.evaluate("node => node.scrollTop = node.scrollHeight")
+            else:
+                await page.mouse.wheel(0, 10000)
+            await after_scroll(waiter, page, link_xpath, harvester.link_count)
+            newly_found_count = len(await harvester.harvest_async())
+            SCROLL_ITERATION_SECONDS.observe(time.time() - iteration_started)
+            status["message"] = f"Encontrados {len(harvester.entries)} resultados únicos (URLs) até agora..."
+            if len(harvester.entries) >= max_results:
+                break
+            if newly_found_count == 0:
+                no_new_results_streak += 1
+                if no_new_results_streak >= 5:
+                    logging.info("[Async] Parando rolagem devido à falta de novos URLs em tentativas consecutivas.")
+                    break
+            else:
+                no_new_results_streak = 0
+            scroll_attempts += 1
+            await between_scrolls(waiter, page)
+
+        run.add_phase("scroll", time.time() - scroll_started)
+        if harvester.duplicates:
+            run.increment("duplicates_skipped", harvester.duplicates)
+        logging.info(f"[Async] Rolagem concluída. {len(harvester.entries)} URLs únicos encontrados em {harvester.calls} leituras da lista.")
+        return harvester.urls[:max_results]
+    finally:
+        run.increment("ipc_calls", page.calls)
+
+
+async def extract_from_url_async(page, index, url, run, governor, retries=0):
+    """Abre a URL do estabelecimento e extrai os detalhes; (None, 0) se não carregar.
+
+    O ``governor`` do contexto da página define quando cada tentativa começa;
+    após timeout ou página de bloqueio, até ``retries`` novas tentativas são feitas.
+    """
+    page = IpcCounter(page)
+    try:
+        for attempt in range(1 + retries):
+            await governor.acquire_async()
+            outcome = ERROR
+            loaded = False
+            started_at = time.time()
+            try:
+                with PAGE_LOAD_SECONDS.time(page="place"):
+                    await page.goto(url, timeout=60000)
+                loaded = True
+                await page.wait_for_selector(NAME_XPATH, timeout=15000)
+                await after_detail_load(run.waiter, page)
+                LISTING_READY_SECONDS.observe(time.time() - started_at, mode="url")
+                calls_before = page.calls
+                with LISTING_EXTRACT_SECONDS.time():
+                    result = await extract_place_details_async(page, url)
+                run.record_listing(time.time() - started_at)
+                outcome = OK
+                return result, page.calls - calls_before
+            except PlaywrightTimeoutError as wait_error:
+                outcome = BLOCKED if await detect_block_page_async(page) else (NO_NAME if loaded else TIMEOUT)
+                logging.error(f"[Async] Timeout ao carregar detalhes do elemento {index+1} ({outcome}): {wait_error}.")
+                ERRORS_TOTAL.inc(stage="detail")
+            finally:
+                governor.release(outcome)
+            if attempt < retries:
+                run.increment("retries")
+        logging.error(f"[Async] Elemento {index+1} não carregou após {1 + retries} tentativas. Pulando item.")
+        return None, 0
+    finally:
+        run.increment("ipc_calls", page.calls)
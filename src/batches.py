@@ -0,0 +1,274 @@
+# -*- coding: utf-8 -*-
+"""Lotes de buscas: muitas combinações de tipo e localização em uma só requisição.
+
+Cada consulta do lote vira um job comum, enviado ao gerenciador de jobs por uma
+thread de despacho que respeita um limite global de jobs de lote ativos ao mesmo
+tempo. Os jobs usam os mesmos navegadores das demais buscas. À medida que cada
+consulta termina, seus resultados são incorporados a uma lista única do lote,
+deduplicada pelo identificador do lugar e pela chave normalizada, e o job é
+descartado. Os jobs de lote não substituem a busca mais recente do usuário.
+"""
+import csv
+import io
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from src.jobs import JobQueueFullError
+from src.place_cache import place_id_from_url
+from src.place_index import dedupe_key
+from src.result_store import ResultStore
+
+ACTIVE_STATES = ("queued", "running")
+DONE_STATES = ("finished", "error", "cancelled")
+
+
+def parse_queries(rows, default_max_results=50, wait_modes=()):
+    """Valida as consultas (dicionários) de um lote; levanta ValueError na primeira inválida.
+
+    Consultas repetidas (mesmo tipo e localização) são enviadas uma só vez.
+    """
+    queries = []
+    seen = set()
+    for number, row in enumerate(rows, start=1):
+        if not isinstance(row, dict):
+            raise ValueError(f"Consulta {number}: esperado um objeto com establishment_type e location.")
+        establishment_type = str(row.get("establishment_type") or "").strip()
+        location = str(row.get("location") or "").strip()
+        if not establishment_type or not location:
+            raise ValueError(f"Consulta {number}: tipo de estabelecimento e localização são obrigatórios.")
+        try:
+            max_results = int(row.get("max_results") or default_max_results)
+        except (TypeError, ValueError):
+            raise ValueError(f"Consulta {number}: max_results inválido ({row.get('max_results')}).")
+        if max_results <= 0:
+            raise ValueError(f"Consulta {number}: max_results deve ser maior que zero.")
+        key = (establishment_type.casefold(), location.casefold())
+        if key in seen:
+            continue
+        seen.add(key)
+        params = {"establishment_type": establishment_type, "location": location, "max_results": max_results}
+        wait_mode = row.get("wait_mode")
+        if wait_mode in wait_modes:
+            params["wait_mode"] = wait_mode
+        queries.append(params)
+    if not queries:
+        raise ValueError("O lote não contém nenhuma consulta.")
+    return queries
+
+
+def parse_queries_csv(text, **kwargs):
+    """Consultas de um CSV com cabeçalho (establishment_type,location[,max_results][,wait_mode])."""
+    reader = csv.DictReader(io.StringIO(text.lstrip("\ufeff")))
+    if not reader.fieldnames or not {"establishment_type", "location"} <= {name.strip() for name in reader.fieldnames}:
+        raise ValueError("O CSV deve ter as colunas establishment_type e location.")
+    rows = [{(key or "").strip(): (value or "").strip() for key, value in row.items()} for row in reader]
+    return parse_queries(rows, **kwargs)
+
+
+class BatchQuery:
+    """Uma consulta do lote e o job que a executa."""
+
+    def __init__(self, index, params):
+        self.index = index
+        self.params = params
+        self.job = None
+        self.state = "pending"
+        self.error = None
+        self.unique_results = 0
+        # Resultados desta consulta que não estavam no lote
+        self.new_results = 0
+
+    def to_dict(self):
+        return {
+            "index": self.index,
+            "establishment_type": self.params["establishment_type"],
+            "location": self.params["location"],
+            "max_results": self.params["max_results"],
+            "job_id": self.job.id if self.job is not None else None,
+            "state": self.state,
+            "error": self.error,
+            "unique_results": self.unique_results,
+            "new_results": self.new_results,
+        }
+
+
+class Batch:
+    """Um lote de consultas e a lista deduplicada de seus resultados."""
+
+    def __init__(self, queries):
+        self.id = uuid.uuid4().hex[:12]
+        self.queries = [
+            BatchQuery(index, {**params, "batch_id": self.id}) for index, params in enumerate(queries)
+        ]
+        self.results = ResultStore()
+        self.created_at = time.time()
+        self.finished_at = None
+        self.cancelled = False
+        self._keys = set()
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        states = {query.state for query in self.queries}
+        if states <= set(DONE_STATES):
+            return "cancelled" if self.cancelled else "finished"
+        if states == {"pending"}:
+            return "queued"
+        return "running"
+
+    @property
+    def is_finished(self):
+        return self.state in ("finished", "cancelled")
+
+    @property
+    def params(self):
+        """Descrição do lote usada no cabeçalho das exportações."""
+        types = sorted({query.params["establishment_type"] for query in self.queries})
+        locations = sorted({query.params["location"] for query in self.queries})
+        return {
+            "batch_id": self.id,
+            "establishment_type": "; ".join(types),
+            "location": "; ".join(locations),
+            "queries": len(self.queries),
+        }
+
+    def merge(self, results):
+        """Acrescenta os resultados ainda não vistos no lote; retorna quantos foram novos."""
+        added = 0
+        with self._lock:
+            for result in results:
+                place_id = place_id_from_url(result.get("google_maps_url"))
+                key = dedupe_key(result)
+                if (place_id is not None and place_id in self._keys) or key in self._keys:
+                    continue
+                if place_id is not None:
+                    self._keys.add(place_id)
+                self._keys.add(key)
+                self.results.append(result)
+                added += 1
+        return added
+
+    def to_dict(self, include_queries=True):
+        counts = {}
+        for query in self.queries:
+            counts[query.state] = counts.get(query.state, 0) + 1
+        data = {
+            "batch_id": self.id,
+            "state": self.state,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+            "total_queries": len(self.queries),
+            "queries_by_state": counts,
+            "unique_results": len(self.results),
+        }
+        if include_queries:
+            data["queries"] = [query.to_dict() for query in self.queries]
+        return data
+
+
+class BatchManager:
+    """Despacha as consultas dos lotes para o gerenciador de jobs com um limite global."""
+
+    def __init__(self, job_manager, max_concurrent=2, max_batches=20, poll_interval=1.0):
+        self.job_manager = job_manager
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_batches = max_batches
+        self.poll_interval = poll_interval
+        self._batches = OrderedDict()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def submit(self, queries):
+        batch = Batch(queries)
+        with self._lock:
+            self._batches[batch.id] = batch
+            self._evict_finished()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name="batch-dispatcher", daemon=True)
+                self._thread.start()
+        logging.info(f"[Batch] Lote {batch.id} criado com {len(batch.queries)} consultas.")
+        self._wakeup.set()
+        return batch
+
+    def _evict_finished(self):
+        finished = [batch_id for batch_id, batch in self._batches.items() if batch.is_finished]
+        for batch_id in finished[:max(0, len(finished) - self.max_batches)]:
+            del self._batches[batch_id]
+
+    def get(self, batch_id):
+        return self._batches.get(batch_id)
+
+    def list(self):
+        with self._lock:
+            return list(self._batches.values())
+
+    def cancel(self, batch_id):
+        """Deixa de enviar as consultas pendentes; as que já estão em execução terminam normalmente."""
+        batch = self.get(batch_id)
+        if batch is not None:
+            batch.cancelled = True
+            logging.info(f"[Batch] Lote {batch_id} cancelado.")
+            self._wakeup.set()
+        return batch
+
+    # --- Despacho ---
+
+    def _loop(self):
+        while True:
+            self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
+            try:
+                self._dispatch()
+            except Exception:
+                logging.exception("[Batch] Erro ao despachar consultas dos lotes.")
+
+    def _refresh(self, batch, query):
+        job = query.job
+        if hasattr(job, "refresh"):
+            # Job da fila compartilhada: o estado é lido do armazenamento
+            job.refresh()
+        query.state = job.status["state"]
+        query.unique_results = job.status.get("unique_results", 0)
+        if job.is_finished:
+            query.error = job.status.get("error")
+            query.new_results = batch.merge(job.results)
+            # Os resultados já estão no lote: o job não ocupa a retenção das buscas interativas
+            self.job_manager.discard(job.id)
+            logging.info(
+                f"[Batch] Lote {batch.id}: consulta {query.index + 1} ({query.params['establishment_type']} em "
+                f"{query.params['location']}) finalizada com {query.unique_results} resultados, {query.new_results} novos."
+            )
+
+    def _dispatch(self):
+        batches = self.list()
+        active = 0
+        for batch in batches:
+            for query in batch.queries:
+                if query.state in ACTIVE_STATES:
+                    self._refresh(batch, query)
+                if query.state in ACTIVE_STATES:
+                    active += 1
+
+        for batch in batches:
+            pending = [query for query in batch.queries if query.state == "pending"]
+            if batch.cancelled:
+                for query in pending:
+                    query.state = "cancelled"
+                pending = []
+            for query in pending:
+                if active >= self.max_concurrent:
+                    break
+                try:
+                    query.job = self.job_manager.submit(query.params, track_latest=False)
+                except JobQueueFullError:
+                    # A fila está cheia com outras buscas: tenta novamente na próxima passada
+                    return
+                query.state = "queued"
+                active += 1
+            if batch.is_finished and batch.finished_at is None:
+                batch.finished_at = time.time()
+                logging.info(f"[Batch] Lote {batch.id} finalizado: {len(batch.results)} resultados únicos.")
@@ -0,0 +1,323 @@
+# -*- coding: utf-8 -*-
+"""Pool de navegadores Chromium reutilizáveis entre buscas.
+
+A API síncrona do Playwright só pode ser usada pela thread que a iniciou, por isso
+cada navegador do pool vive em uma thread própria ("slot") e as tarefas são
+executadas nessa thread: quem usa o pool envia uma função ``fn(page, *args)`` e
+recebe um ``Future`` com o resultado.
+"""
+import atexit
+import logging
+import queue
+import threading
+import time
+import traceback
+from concurrent.futures import Future
+
+from playwright.sync_api import sync_playwright
+
+from src.metrics import BROWSER_LAUNCH_SECONDS, BROWSER_RECYCLES_TOTAL, PAGE_LOAD_SECONDS
+
+_SHUTDOWN = object()
+
+
+class _BrowserSlot(threading.Thread):
+    """Thread dona de um navegador, um contexto e uma página mantidos aquecidos."""
+
+    def __init__(self, pool, slot_id):
+        super().__init__(name=f"browser-slot-{slot_id}", daemon=True)
+        self.pool = pool
+        self.slot_id = slot_id
+        self.playwright = None
+        self.browser = None
+        self.context = None
+        self.page = None
+        self.launched_at = 0.0
+        self.uses = 0
+        self.restarts = 0
+        self.launch_errors = 0
+        # Verdadeiro se a thread terminou sem poder atender tarefas (ex: Playwright não iniciou)
+        self.failed = False
+        self.busy = False
+        self.warm = False
+        # Reciclagem já decidida durante uma tarefa longa, feita antes da próxima
+        self.pending_recycle = None
+
+    # --- Ciclo de vida do navegador ---
+
+    def _launch(self):
+        logging.info(f"[Pool] Slot {self.slot_id}: iniciando navegador...")
+        try:
+            with BROWSER_LAUNCH_SECONDS.time():
+                self.browser = self.playwright.chromium.launch(headless=True)
+                self.context = self.browser.new_context(**self.pool.context_options)
+                if self.pool.context_setup is not None:
+                    self.pool.context_setup(self.context)
+                self.page = self.context.new_page()
+        except Exception:
+            self.launch_errors += 1
+            self._close()
+            raise
+        self.launched_at = time.time()
+        self.uses = 0
+        self.warm = False
+        self.pending_recycle = None
+
+    def _close(self):
+        try:
+            if self.browser is not None and self.browser.is_connected():
+                self.browser.close()
+        except Exception as e:
+            logging.warning(f"[Pool] Slot {self.slot_id}: erro ao fechar navegador: {e}")
+        self.browser = self.context = self.page = None
+        self.warm = False
+
+    def _restart(self, reason, kind=None):
+        logging.info(f"[Pool] Slot {self.slot_id}: reciclando navegador ({reason}).")
+        if kind is not None:
+            BROWSER_RECYCLES_TOTAL.inc(reason=kind)
+        self._close()
+        self._launch()
+        self.restarts += 1
+
+    def is_healthy(self):
+        try:
+            return (
+                self.browser is not None
+                and self.browser.is_connected()
+                and self.page is not None
+                and not self.page.is_closed()
+            )
+        except Exception:
+            return False
+
+    def recycle_reason(self):
+        """Motivo para reciclar o navegador (usos, idade ou memória), ou None."""
+        if self.pending_recycle is not None:
+            return self.pending_recycle
+        if self.pool.max_uses and self.uses >= self.pool.max_uses:
+            return f"{self.uses} usos", "uses"
+        if self.pool.max_age and time.time() - self.launched_at >= self.pool.max_age:
+            return f"idade máxima de {self.pool.max_age}s", "age"
+        if self.pool.memory_guard is not None:
+            reason = self.pool.memory_guard.claim_recycle()
+            if reason is not None:
+                return reason, "memory"
+        return None
+
+    def _maintain(self):
+        """Verifica saúde, idade, número de usos e memória, reiniciando o navegador se necessário."""
+        if self.browser is None:
+            # A última inicialização falhou: tenta de novo a cada tarefa e verificação
+            self._launch()
+            return
+        if not self.is_healthy():
+            self._restart("verificação de saúde falhou", "health")
+            return
+        recycle = self.recycle_reason()
+        if recycle is not None:
+            self._restart(*recycle)
+
+    def _warm_up(self, raise_errors=False):
+        """Deixa a página parada na URL de aquecimento (ex: página inicial do Maps)."""
+        if not self.pool.warm_url or self.warm or self.page is None:
+            return
+        try:
+            started_at = time.time()
+            self.page.goto(self.pool.warm_url, timeout=60000)
+            if self.pool.warm_ready is not None:
+                self.pool.warm_ready(self.page)
+            else:
+                self.page.wait_for_timeout(self.pool.warm_wait_ms)
+            PAGE_LOAD_SECONDS.observe(time.time() - started_at, page="home")
+            self.warm = True
+            logging.info(f"[Pool] Slot {self.slot_id}: página aquecida em {self.pool.warm_url}.")
+        except Exception as e:
+            logging.warning(f"[Pool] Slot {self.slot_id}: falha ao aquecer página: {e}")
+            if raise_errors:
+                raise
+
+    # --- Loop de tarefas ---
+
+    def run(self):
+        try:
+            self.playwright = sync_playwright().start()
+        except Exception as e:
+            logging.error(f"[Pool] Slot {self.slot_id}: erro fatal ao iniciar o Playwright: {e}")
+            self.failed = True
+            self.pool._fail_if_dead(e)
+            return
+        try:
+            try:
+                self._launch()
+                self._warm_up()
+            except Exception as e:
+                # As tarefas continuam sendo aceitas; cada uma tenta iniciar o navegador de novo
+                logging.error(f"[Pool] Slot {self.slot_id}: falha ao iniciar navegador: {e}")
+            while True:
+                try:
+                    task = self.pool._tasks.get(timeout=self.pool.health_check_interval)
+                except queue.Empty:
+                    try:
+                        self._maintain()
+                        self._warm_up()
+                    except Exception as e:
+                        logging.error(f"[Pool] Slot {self.slot_id}: erro na manutenção do navegador: {e}")
+                    continue
+                if task is _SHUTDOWN:
+                    break
+                self._execute(task)
+                if self.pool._tasks.empty():
+                    self._warm_up()
+        except Exception as e:
+            logging.error(f"[Pool] Slot {self.slot_id}: erro fatal: {e}")
+            traceback.print_exc()
+            self.failed = True
+            self.pool._fail_if_dead(e)
+        finally:
+            self._close()
+            self.playwright.stop()
+            logging.info(f"[Pool] Slot {self.slot_id}: finalizado.")
+
+    def _execute(self, task):
+        fn, args, kwargs, needs_home, future = task
+        if not future.set_running_or_notify_cancel():
+            return
+        self.busy = True
+        try:
+            self._maintain()
+            if needs_home:
+                self._warm_up(raise_errors=True)
+            # A tarefa vai navegar a página; ela deixa de estar aquecida
+            self.warm = False
+            future.set_result(fn(self.page, *args, **kwargs))
+        except BaseException as e:
+            future.set_exception(e)
+        finally:
+            self.uses += 1
+            self.busy = False
+
+
+class BrowserPool:
+    """Pool de navegadores de longa duração compartilhado pelo processo da aplicação."""
+
+    def __init__(self, size=1, context_options=None, warm_url=None, warm_wait_ms=3000,
+                 warm_ready=None, context_setup=None, max_uses=200, max_age=1800, memory_guard=None,
+                 health_check_interval=30):
+        self.size = max(1, size)
+        self.context_options = context_options or {}
+        # Função opcional fn(context) chamada em cada contexto criado (ex: regras de rota)
+        self.context_setup = context_setup
+        self.warm_url = warm_url
+        self.warm_wait_ms = warm_wait_ms
+        # Função opcional fn(page) que aguarda a página aquecida ficar pronta,
+        # usada no lugar da espera fixa de warm_wait_ms
+        self.warm_ready = warm_ready
+        self.max_uses = max_uses
+        self.max_age = max_age
+        # MemoryGuard opcional: recicla navegadores quando a memória somada passa do limite
+        self.memory_guard = memory_guard
+        self.health_check_interval = health_check_interval
+        self._tasks = queue.Queue()
+        self._slots = []
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("O pool de navegadores já foi encerrado.")
+            if self._slots:
+                return
+            logging.info(f"[Pool] Iniciando pool com {self.size} navegadores.")
+            self._slots = [_BrowserSlot(self, slot_id + 1) for slot_id in range(self.size)]
+            for slot in self._slots:
+                slot.start()
+            atexit.register(self.shutdown)
+
+    def submit(self, fn, *args, needs_home=False, **kwargs):
+        """Agenda ``fn(page, *args, **kwargs)`` em um navegador livre e retorna um Future.
+
+        Com ``needs_home=True`` e ``warm_url`` configurada, a página é entregue já
+        carregada na URL de aquecimento.
+        """
+        self._ensure_started()
+        future = Future()
+        self._tasks.put((fn, args, kwargs, needs_home, future))
+        self._fail_if_dead()
+        return future
+
+    def _fail_if_dead(self, error=None):
+        """Sem nenhum navegador capaz de atender, encerra as tarefas pendentes com erro."""
+        if not self._slots or not all(slot.failed for slot in self._slots):
+            return
+        error = error or RuntimeError("Nenhum navegador do pool está disponível.")
+        while True:
+            try:
+                task = self._tasks.get_nowait()
+            except queue.Empty:
+                return
+            if task is not _SHUTDOWN and task[-1].set_running_or_notify_cancel():
+                task[-1].set_exception(error)
+
+    def run(self, fn, *args, needs_home=False, timeout=None, **kwargs):
+        """Executa ``fn`` em um navegador do pool e aguarda o resultado."""
+        return self.submit(fn, *args, needs_home=needs_home, **kwargs).result(timeout=timeout)
+
+    def _current_slot(self):
+        thread = threading.current_thread()
+        return thread if isinstance(thread, _BrowserSlot) and thread.pool is self else None
+
+    def count_use(self):
+        """Conta um uso extra do navegador da tarefa atual (ex: cada clique de uma tarefa longa)."""
+        slot = self._current_slot()
+        if slot is not None:
+            slot.uses += 1
+
+    def should_recycle(self):
+        """Chamado por uma tarefa longa: True se o navegador dela precisa ser reciclado.
+
+        A reciclagem é feita pelo pool antes da próxima tarefa do navegador; a tarefa
+        atual deve encerrar e deixar o restante do trabalho para novas tarefas.
+        """
+        slot = self._current_slot()
+        if slot is None:
+            return False
+        slot.pending_recycle = slot.recycle_reason()
+        return slot.pending_recycle is not None
+
+    def stats(self):
+        """Resumo do estado de cada navegador do pool."""
+        now = time.time()
+        return {
+            "size": self.size,
+            "started": bool(self._slots),
+            "queued_tasks": self._tasks.qsize(),
+            "memory_guard": self.memory_guard.stats() if self.memory_guard is not None else None,
+            "browsers": [
+                {
+                    "slot": slot.slot_id,
+                    "alive": slot.is_alive(),
+                    "busy": slot.busy,
+                    "warm": slot.warm,
+                    "uses": slot.uses,
+                    "restarts": slot.restarts,
+                    "launch_errors": slot.launch_errors,
+                    "age_seconds": round(now - slot.launched_at, 1) if slot.launched_at else 0,
+                }
+                for slot in self._slots
+            ],
+        }
+
+    def shutdown(self, timeout=30):
+        """Encerra todos os navegadores, aguardando as tarefas em andamento."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            slots = list(self._slots)
+        for _ in slots:
+            self._tasks.put(_SHUTDOWN)
+        for slot in slots:
+            slot.join(timeout=timeout)
+        logging.info("[Pool] Pool de navegadores encerrado.")
@@ -0,0 +1,211 @@
+# -*- coding: utf-8 -*-
+"""Exportação dos resultados em streaming, com memória constante.
+
+Cada formato é um gerador que produz o arquivo em pedaços, registro a registro,
+sem montar o documento inteiro em memória. Todos usam o mesmo esquema de campos
+(``EXPORT_FIELDS``).
+"""
+import csv
+import io
+import json
+import logging
+from itertools import islice
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+# Esquema compartilhado: (chave no resultado, rótulo, tipo)
+EXPORT_FIELDS = [
+    ("name", "Nome", "string"),
+    ("type", "Tipo", "string"),
+    ("address", "Endereço", "string"),
+    ("phone", "Telefone", "string"),
+    ("website", "Website", "string"),
+    ("opening_hours", "Horário", "string"),
+    ("average_rating", "Avaliação Média", "float"),
+    ("review_count", "Contagem de Avaliações", "int"),
+    ("introduction", "Introdução", "string"),
+    ("store_shopping", "Compras na Loja", "bool"),
+    ("in_store_pickup", "Retirada na Loja", "bool"),
+    ("delivery", "Entrega", "bool"),
+    ("google_maps_url", "URL Google Maps", "string"),
+]
+
+# Registros por lote nos formatos colunares
+COLUMNAR_BATCH_SIZE = 1000
+
+
+def _snapshot(results):
+    """Itera os resultados existentes no início da exportação (o job pode ainda estar rodando)."""
+    return islice(results, len(results))
+
+
+def _display_value(result, key, field_type):
+    if field_type == "bool":
+        return 'Sim' if result.get(key) else 'Não'
+    return result.get(key, 'N/A')
+
+
+def iter_txt(results, search_params):
+    yield (
+        f"Resultados da busca por: {search_params.get('establishment_type', 'N/A')} em {search_params.get('location', 'N/A')}\n"
+        f"Total de estabelecimentos únicos encontrados: {len(results)}\n"
+        + "=" * 40 + "\n\n"
+    ).encode('utf-8')
+    for result in _snapshot(results):
+        lines = [f"{label}: {_display_value(result, key, field_type)}\n" for key, label, field_type in EXPORT_FIELDS]
+        lines.append("---" * 10 + "\n\n")
+        yield "".join(lines).encode('utf-8')
+
+
+def iter_csv(results):
+    output = io.StringIO()
+    writer = csv.writer(output, delimiter=';', quotechar='"', quoting=csv.QUOTE_MINIMAL)
+
+    def drain():
+        chunk = output.getvalue()
+        output.seek(0)
+        output.truncate(0)
+        return chunk
+
+    writer.writerow([label for _, label, _ in EXPORT_FIELDS])
+    yield drain().encode('utf-8-sig')
+    for result in _snapshot(results):
+        writer.writerow([_display_value(result, key, field_type) for key, _, field_type in EXPORT_FIELDS])
+        yield drain().encode('utf-8')
+
+
+def iter_json(results, search_params):
+    """Mesmo documento da exportação JSON original, escrito incrementalmente."""
+    total = len(results)
+    yield (
+        "{\n"
+        f'  "search_params": {json.dumps(search_params, ensure_ascii=False, indent=2).replace(chr(10), chr(10) + "  ")},\n'
+        f'  "total_unique_found": {total},\n'
+        '  "results": ['
+    ).encode('utf-8')
+    for index, result in enumerate(islice(results, total)):
+        item = json.dumps(result, ensure_ascii=False, indent=2).replace("\n", "\n    ")
+        yield (("," if index else "") + "\n    " + item).encode('utf-8')
+    yield ("\n  ]\n}" if total else "]\n}").encode('utf-8')
+
+
+def iter_ndjson(results):
+    for result in _snapshot(results):
+        yield (json.dumps(result, ensure_ascii=False) + "\n").encode('utf-8')
+
+
+# --- Formatos colunares (requerem pyarrow) ---
+
+def columnar_available():
+    return pa is not None
+
+
+def _arrow_schema():
+    types = {"string": pa.string(), "float": pa.float64(), "int": pa.int64(), "bool": pa.bool_()}
+    return pa.schema([(key, types[field_type]) for key, _, field_type in EXPORT_FIELDS])
+
+
+def _columnar_value(value, field_type):
+    """Converte o sentinela "N/A" de campos numéricos em nulo."""
+    if field_type in ("float", "int") and not isinstance(value, (int, float)):
+        return None
+    if field_type == "bool":
+        return bool(value)
+    return value
+
+
+def _iter_record_batches(results, schema):
+    rows = _snapshot(results)
+    while True:
+        batch = list(islice(rows, COLUMNAR_BATCH_SIZE))
+        if not batch:
+            return
+        columns = [
+            [_columnar_value(result.get(key), field_type) for result in batch]
+            for key, _, field_type in EXPORT_FIELDS
+        ]
+        yield pa.RecordBatch.from_arrays(
+            [pa.array(column, type=field.type) for column, field in zip(columns, schema)], schema=schema
+        )
+
+
+class _ChunkSink:
+    """Arquivo somente-escrita cujo conteúdo é drenado a cada lote gerado."""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data):
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        chunk = b"".join(self._chunks)
+        self._chunks.clear()
+        return chunk
+
+
+def iter_parquet(results):
+    schema = _arrow_schema()
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema)
+    try:
+        for batch in _iter_record_batches(results, schema):
+            writer.write_batch(batch)
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+def iter_arrow(results):
+    """Formato Arrow IPC (stream)."""
+    schema = _arrow_schema()
+    sink = _ChunkSink()
+    writer = pa.ipc.new_stream(sink, schema)
+    try:
+        for batch in _iter_record_batches(results, schema):
+            writer.write_batch(batch)
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+# Formato -> (gerador(results, search_params), extensão, mimetype)
+EXPORT_FORMATS = {
+    "txt": (lambda results, params: iter_txt(results, params), "txt", 'text/plain; charset=utf-8'),
+    "csv": (lambda results, params: iter_csv(results), "csv", 'text/csv; charset=utf-8-sig'),
+    "json": (lambda results, params: iter_json(results, params), "json", 'application/json; charset=utf-8'),
+    "ndjson": (lambda results, params: iter_ndjson(results), "ndjson", 'application/x-ndjson; charset=utf-8'),
+    "parquet": (lambda results, params: iter_parquet(results), "parquet", 'application/vnd.apache.parquet'),
+    "arrow": (lambda results, params: iter_arrow(results), "arrow", 'application/vnd.apache.arrow.stream'),
+}
+COLUMNAR_FORMATS = ("parquet", "arrow")
+
+
+def logged_stream(chunks, fmt):
+    """Registra erros ocorridos depois que a resposta já começou a ser enviada."""
+    try:
+        yield from chunks
+    except Exception:
+        logging.exception(f"[Export] Erro durante a exportação {fmt.upper()}.")
+        raise
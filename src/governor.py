@@ -0,0 +1,241 @@
+# -*- coding: utf-8 -*-
+"""Controle adaptativo do ritmo da coleta (AIMD), um governador por contexto do navegador.
+
+Enquanto as extrações dão certo, cada governador aumenta aos poucos a
+concorrência permitida no seu contexto e reduz a pausa entre requisições
+(aumento aditivo). Quando a proporção de timeouts, páginas sem o nome do
+estabelecimento ou páginas de bloqueio (consentimento, captcha) nas últimas
+extrações passa do limite, a concorrência cai pela metade e a pausa dobra
+(redução multiplicativa). Uma página de bloqueio também pausa o contexto por
+alguns segundos.
+"""
+import asyncio
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+from src.metrics import GOVERNOR_BACKOFFS_TOTAL, GOVERNOR_CONCURRENCY, GOVERNOR_DELAY_SECONDS
+
+OK = "ok"
+TIMEOUT = "timeout"
+NO_NAME = "no_name"
+BLOCKED = "blocked"
+# Erros que não indicam limitação pelo Google (não alteram o ritmo)
+ERROR = "error"
+FAILURES = (TIMEOUT, NO_NAME, BLOCKED)
+
+# Verdadeiro quando a página é de consentimento, captcha ou aviso de tráfego incomum
+BLOCK_PAGE_JS = """
+() => {
+    if (/consent\\.google\\.|\\/sorry\\//.test(location.href)) return true;
+    if (document.querySelector('iframe[src*="recaptcha"], form[action*="consent"], #captcha-form')) return true;
+    const text = (document.body && document.body.innerText || '').slice(0, 5000).toLowerCase();
+    return text.includes('unusual traffic') || text.includes('tráfego incomum');
+}
+"""
+
+
+def _looks_blocked(url, evaluate):
+    if url and ("consent.google." in url or "/sorry/" in url):
+        return True
+    try:
+        return bool(evaluate(BLOCK_PAGE_JS))
+    except Exception:
+        return False
+
+
+def detect_block_page(page):
+    """Verifica se a página atual é de consentimento ou captcha (usado apenas após falhas)."""
+    return _looks_blocked(page.url, page.evaluate)
+
+
+async def detect_block_page_async(page):
+    if page.url and ("consent.google." in page.url or "/sorry/" in page.url):
+        return True
+    try:
+        return bool(await page.evaluate(BLOCK_PAGE_JS))
+    except Exception:
+        return False
+
+
+class Governor:
+    """Concorrência e pausa entre requisições de um contexto, ajustadas por AIMD."""
+
+    def __init__(self, name, initial_concurrency=1, max_concurrency=1, min_concurrency=1, max_delay=30.0,
+                 backoff_delay=1.0, window=20, failure_threshold=0.2, block_pause=60.0, enabled=True):
+        self.name = name
+        self.enabled = enabled
+        self.max_concurrency = max(1, max_concurrency)
+        self.min_concurrency = max(1, min(min_concurrency, self.max_concurrency))
+        self.concurrency = float(max(self.min_concurrency, min(initial_concurrency, self.max_concurrency)))
+        self.delay = 0.0
+        self.max_delay = max_delay
+        self.backoff_delay = backoff_delay
+        self.failure_threshold = failure_threshold
+        self.block_pause = block_pause
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self.backoffs = 0
+        self.outcomes = deque(maxlen=max(1, window))
+        self._completed_at = deque()
+        self._last_start = 0.0
+        self._cooldown_until = 0.0
+        self._condition = threading.Condition()
+        self._publish()
+
+    # --- Admissão ---
+
+    def _try_acquire(self):
+        """Reserva uma vaga; retorna 0 se conseguiu ou quantos segundos aguardar."""
+        with self._condition:
+            if not self.enabled:
+                self.in_flight += 1
+                return 0.0
+            now = time.time()
+            if now < self.paused_until:
+                return self.paused_until - now
+            if self.in_flight >= int(self.concurrency):
+                return None
+            wait = self._last_start + self.delay - now
+            if wait > 0:
+                return wait
+            self.in_flight += 1
+            self._last_start = now
+            return 0.0
+
+    def acquire(self):
+        while True:
+            wait = self._try_acquire()
+            if wait == 0.0:
+                return
+            with self._condition:
+                # Sem vaga livre: acorda quando outra requisição terminar
+                self._condition.wait(timeout=wait if wait is not None else 1.0)
+
+    async def acquire_async(self):
+        while True:
+            wait = self._try_acquire()
+            if wait == 0.0:
+                return
+            await asyncio.sleep(min(wait, 1.0) if wait is not None else 0.05)
+
+    def release(self, outcome=None):
+        """Libera a vaga reservada por ``acquire`` e ajusta o ritmo pelo resultado.
+
+        Sem ``outcome``, apenas libera a vaga (o resultado foi informado com ``record``).
+        """
+        with self._condition:
+            self.in_flight = max(0, self.in_flight - 1)
+            if outcome is not None:
+                self._record(outcome)
+            self._condition.notify_all()
+
+    def record(self, outcome):
+        """Ajusta o ritmo por um resultado obtido fora de ``acquire``/``release`` (ex.: a busca)."""
+        with self._condition:
+            self._record(outcome)
+            self._condition.notify_all()
+
+    # --- Ajuste (AIMD) ---
+
+    def _record(self, outcome):
+        now = time.time()
+        self.outcomes.append(outcome)
+        if outcome == OK:
+            self._completed_at.append(now)
+        while self._completed_at and now - self._completed_at[0] > 60:
+            self._completed_at.popleft()
+        if not self.enabled:
+            return
+        if outcome == BLOCKED:
+            self.paused_until = max(self.paused_until, now + self.block_pause)
+            self._backoff(now, BLOCKED, force=True)
+        elif outcome in FAILURES:
+            if self.failure_rate > self.failure_threshold:
+                self._backoff(now, outcome)
+        elif outcome == OK:
+            # Aumento aditivo: +1 de concorrência a cada "concorrência atual" sucessos
+            self.concurrency = min(self.max_concurrency, self.concurrency + 1 / max(1.0, self.concurrency))
+            self.delay = self.delay * 0.8 if self.delay > 0.05 else 0.0
+        self._publish()
+
+    def _backoff(self, now, reason, force=False):
+        # Uma redução por período de resfriamento, para não reagir várias vezes às mesmas falhas
+        if now < self._cooldown_until and not force:
+            return
+        self.concurrency = max(float(self.min_concurrency), self.concurrency / 2)
+        self.delay = min(self.max_delay, max(self.delay * 2, self.backoff_delay))
+        self._cooldown_until = now + max(self.delay, 5.0)
+        self.backoffs += 1
+        GOVERNOR_BACKOFFS_TOTAL.inc(reason=reason)
+        logging.warning(
+            f"[Governor] {self.name}: reduzindo ritmo ({reason}, {self.failure_rate:.0%} de falhas). "
+            f"Concorrência {int(self.concurrency)}, pausa de {self.delay:.1f}s."
+        )
+
+    def _publish(self):
+        GOVERNOR_CONCURRENCY.set(int(self.concurrency), context=self.name)
+        GOVERNOR_DELAY_SECONDS.set(round(self.delay, 3), context=self.name)
+
+    @property
+    def failure_rate(self):
+        if not self.outcomes:
+            return 0.0
+        return sum(1 for outcome in self.outcomes if outcome in FAILURES) / len(self.outcomes)
+
+    def stats(self):
+        with self._condition:
+            return {
+                "context": self.name,
+                "concurrency": int(self.concurrency),
+                "delay_seconds": round(self.delay, 2),
+                "in_flight": self.in_flight,
+                "failure_rate": round(self.failure_rate, 2),
+                "listings_per_minute": len(self._completed_at),
+                "paused_for_seconds": round(max(0.0, self.paused_until - time.time()), 1),
+                "backoffs": self.backoffs,
+            }
+
+
+class GovernorRegistry:
+    """Um governador por contexto do navegador, criado na primeira requisição do contexto."""
+
+    def __init__(self, enabled=True, retries=1, **options):
+        self.enabled = enabled
+        # Novas tentativas de um estabelecimento após timeout ou bloqueio, já no ritmo reduzido
+        self.retries = retries if enabled else 0
+        self.options = options
+        self._governors = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            enabled=os.environ.get('SCRAPER_GOVERNOR_ENABLED', '1') != '0',
+            retries=int(os.environ.get('SCRAPER_GOVERNOR_RETRIES', 1)),
+            window=int(os.environ.get('SCRAPER_GOVERNOR_WINDOW', 20)),
+            failure_threshold=float(os.environ.get('SCRAPER_GOVERNOR_FAILURE_THRESHOLD', 0.2)),
+            max_delay=float(os.environ.get('SCRAPER_GOVERNOR_MAX_DELAY', 30)),
+            block_pause=float(os.environ.get('SCRAPER_GOVERNOR_BLOCK_PAUSE', 60)),
+        )
+
+    def get(self, name, max_concurrency=1):
+        with self._lock:
+            governor = self._governors.get(name)
+            if governor is None:
+                governor = self._governors[name] = Governor(
+                    name, initial_concurrency=max_concurrency, max_concurrency=max_concurrency,
+                    enabled=self.enabled, **self.options
+                )
+            return governor
+
+    def stats(self):
+        with self._lock:
+            governors = list(self._governors.values())
+        return {
+            "enabled": self.enabled,
+            "contexts": [governor.stats() for governor in governors],
+            "listings_per_minute": sum(governor.stats()["listings_per_minute"] for governor in governors),
+        }
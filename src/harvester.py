@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+"""Coleta incremental dos links da lista de resultados durante a rolagem.
+
+Em vez de reler todos os links (e chamar ``get_attribute`` em cada um) a cada
+rolagem, um script na página guarda um cursor e devolve, em uma única chamada,
+apenas as entradas adicionadas desde a última passada. Links diferentes para o
+mesmo lugar (mesmo identificador na URL) são descartados já aqui, antes de
+qualquer clique.
+"""
+import uuid
+
+from src.place_cache import place_id_from_url
+
+# Devolve as entradas novas desde o cursor guardado em window[stateKey]
+HARVEST_JS = """
+([xpath, stateKey]) => {
+    const state = window[stateKey] || (window[stateKey] = {cursor: 0, seen: new Set()});
+    const links = document.evaluate(
+        xpath, document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null
+    );
+    // A lista foi recriada (ex: nova busca na mesma página): recomeça do início
+    if (links.snapshotLength < state.cursor) state.cursor = 0;
+    const entries = [];
+    for (let i = state.cursor; i < links.snapshotLength; i++) {
+        const link = links.snapshotItem(i);
+        const href = link.getAttribute('href');
+        if (!href || state.seen.has(href)) continue;
+        state.seen.add(href);
+        const card = link.parentElement;
+        const rating = card ? card.querySelector('span[role="img"][aria-label]') : null;
+        entries.push({
+            href,
+            name: link.getAttribute('aria-label'),
+            rating: rating ? rating.getAttribute('aria-label') : null,
+        });
+    }
+    state.cursor = links.snapshotLength;
+    return {entries, total: links.snapshotLength};
+}
+"""
+
+
+class FeedHarvester:
+    """Acumula, em ordem, as entradas da lista de resultados de uma página."""
+
+    def __init__(self, page, link_xpath):
+        self.page = page
+        self.link_xpath = link_xpath
+        self.state_key = f"__gmsHarvest_{uuid.uuid4().hex}"
+        self.entries = []
+        self.link_count = 0
+        self.calls = 0
+        self.duplicates = 0
+        self._place_ids = set()
+
+    @property
+    def urls(self):
+        return [entry["href"] for entry in self.entries]
+
+    def harvest(self):
+        """Lê as entradas novas da lista (uma chamada ao navegador) e as retorna."""
+        return self._absorb(self.page.evaluate(HARVEST_JS, [self.link_xpath, self.state_key]))
+
+    async def harvest_async(self):
+        """Versão de ``harvest`` para páginas da API assíncrona do Playwright."""
+        return self._absorb(await self.page.evaluate(HARVEST_JS, [self.link_xpath, self.state_key]))
+
+    def _absorb(self, payload):
+        self.calls += 1
+        self.link_count = payload["total"]
+        new_entries = []
+        for entry in payload["entries"]:
+            place_id = place_id_from_url(entry["href"]) or entry["href"]
+            if place_id in self._place_ids:
+                self.duplicates += 1
+                continue
+            self._place_ids.add(place_id)
+            new_entries.append(entry)
+        self.entries.extend(new_entries)
+        return new_entries
@@ -0,0 +1,392 @@
+# -*- coding: utf-8 -*-
+"""Extração rápida, sem navegador, a partir do HTML da página do estabelecimento.
+
+Depois da rolagem, as URLs dos estabelecimentos já são conhecidas. Em vez de
+renderizar o Maps no Chromium, ``HttpPlaceExtractor`` baixa cada URL por
+conexões HTTP mantidas abertas (keep-alive, uma por thread e servidor) e lê os
+campos:
+
+- do painel de detalhes presente no HTML (as mesmas classes e atributos dos
+  XPaths de ``place_extractor``), com ``parse_place_html``;
+- ou, sem o painel, dos dados de inicialização embutidos na página
+  (``window.APP_INITIALIZATION_STATE``), com ``parse_initialization_state``.
+
+Os dois produzem o mesmo dicionário da extração pelo navegador. Quando nenhum
+encontra ao menos o nome, ``extract`` retorna None e quem chama usa o navegador.
+As funções de parse recebem apenas o HTML e são verificadas com as páginas
+salvas em ``tests/fixtures`` (``tests/test_http_extractor.py``).
+"""
+import gzip
+import http.client
+import json
+import logging
+import os
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from html.parser import HTMLParser
+from urllib.parse import urljoin, urlsplit
+
+from src.governor import BLOCKED, ERROR, NO_NAME, OK, TIMEOUT
+from src.metrics import HTTP_EXTRACTIONS_TOTAL, PAGE_LOAD_SECONDS
+from src.place_extractor import build_result, parse_service_badges, result_from_payload
+
+_VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "track", "wbr"}
+
+
+def _classes(attrs):
+    return (attrs.get("class") or "").split()
+
+
+class _PanelParser(HTMLParser):
+    """Lê os campos do painel de detalhes, seguindo as mesmas regras dos XPaths do navegador."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.fields = {}
+        self.review_text = None
+        self.review_aria_label = None
+        self.info_texts = []
+        # Pilha de (tag, contextos abertos pelo elemento, campos capturados pelo elemento)
+        self._stack = []
+        self._captures = {}
+        self._skip_depth = 0
+
+    def _contexts(self):
+        return {context for _, contexts, _ in self._stack for context in contexts}
+
+    def _targets(self, tag, attrs, active):
+        """Contextos que o elemento abre e campos cujo texto ele contém."""
+        classes = _classes(attrs)
+        item_id = attrs.get("data-item-id") or ""
+        contexts, targets = set(), []
+        if tag == "h1" and ({"DUwDvf", "fontHeadlineLarge"} & set(classes)):
+            targets.append("name")
+        if tag == "button" and "category" in (attrs.get("jsaction") or ""):
+            targets.append("type")
+        if tag == "button" and item_id == "address":
+            contexts.add("address")
+        if tag == "button" and "phone:tel:" in item_id:
+            contexts.add("phone")
+        if tag == "a" and item_id == "authority":
+            contexts.add("website")
+        if tag == "div" and "fontBodyMedium" in classes:
+            targets.extend(context for context in ("address", "phone", "website") if context in active)
+        if (tag == "div" and "Horário" in (attrs.get("aria-label") or "")) or (tag == "button" and "oh" in item_id):
+            targets.append("opening_hours")
+        if tag == "div" and "WeS02d" in classes:
+            contexts.add("intro")
+        if tag == "div" and "PYvSYb" in classes and "intro" in active:
+            targets.append("introduction")
+        if tag == "div" and "F7nice" in classes:
+            contexts.add("reviews")
+            targets.append("reviews")
+        if tag == "span" and "reviews" in active and "avaliaç" in (attrs.get("aria-label") or ""):
+            if self.review_aria_label is None:
+                self.review_aria_label = attrs.get("aria-label")
+        if tag == "div" and ({"LTs0Rc", "iP2t7d"} & set(classes)):
+            targets.append("info")
+        # Campos de texto usam o primeiro elemento encontrado, como no navegador
+        done = set(self.fields) | set(self._captures) | ({"reviews"} if self.review_text is not None else set())
+        return contexts, [target for target in targets if target == "info" or target not in done]
+
+    def handle_starttag(self, tag, attrs):
+        if tag in ("script", "style"):
+            self._skip_depth += 1
+            return
+        if tag in _VOID_TAGS:
+            if tag == "br":
+                self.handle_data("\n")
+            return
+        attrs = {name: value for name, value in attrs}
+        contexts, targets = self._targets(tag, attrs, self._contexts())
+        for target in targets:
+            self._captures.setdefault(target, [])
+        self._stack.append((tag, contexts, targets))
+
+    def handle_startendtag(self, tag, attrs):
+        if tag not in _VOID_TAGS and tag not in ("script", "style"):
+            self.handle_starttag(tag, attrs)
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        if tag in ("script", "style"):
+            self._skip_depth = max(0, self._skip_depth - 1)
+            return
+        # HTML malformado: fecha também os elementos que ficaram abertos dentro deste
+        if not any(open_tag == tag for open_tag, _, _ in self._stack):
+            return
+        while self._stack:
+            open_tag, _, targets = self._stack.pop()
+            for target in targets:
+                self._finish(target)
+            if open_tag == tag:
+                break
+
+    def _finish(self, target):
+        text = "".join(self._captures.pop(target, [])).strip()
+        if target == "info":
+            self.info_texts.append(text)
+        elif target == "reviews":
+            self.review_text = text
+        else:
+            self.fields[target] = text
+
+    def handle_data(self, data):
+        if self._skip_depth:
+            return
+        for parts in self._captures.values():
+            parts.append(data)
+
+    def payload(self):
+        """Mesmo formato retornado pelo script da extração em uma chamada."""
+        return {
+            "fields": {key: self.fields.get(key) for key in
+                       ("name", "type", "address", "phone", "website", "opening_hours", "introduction")},
+            "reviewText": self.review_text,
+            "reviewAriaLabel": self.review_aria_label,
+            "infoTexts": self.info_texts,
+        }
+
+
+def parse_place_html(html, google_maps_url):
+    """Resultado a partir do painel de detalhes no HTML; None se o nome não for encontrado."""
+    parser = _PanelParser()
+    parser.feed(html)
+    parser.close()
+    if not parser.fields.get("name"):
+        return None
+    return result_from_payload(parser.payload(), google_maps_url)
+
+
+# --- Dados de inicialização embutidos na página ---
+
+def _dig(data, *path):
+    for index in path:
+        if not isinstance(data, list) or index >= len(data):
+            return None
+        data = data[index]
+    return data
+
+
+def _strings(data):
+    if isinstance(data, str):
+        yield data
+    elif isinstance(data, list):
+        for item in data:
+            yield from _strings(item)
+
+
+def _place_array(state):
+    """Procura, nos blocos JSON da resposta embutida, o vetor com os dados do lugar."""
+    for chunk in _strings(state):
+        if not chunk.startswith(")]}'"):
+            continue
+        try:
+            data = json.loads(chunk[4:].lstrip())
+        except ValueError:
+            continue
+        place = _dig(data, 6)
+        if isinstance(_dig(place, 11), str):
+            return place
+    return None
+
+
+def _text_or_na(value):
+    return value.strip() if isinstance(value, str) and value.strip() else "N/A"
+
+
+# Posições (não documentadas pelo Google) dos campos no vetor do lugar, como em
+# tests/fixtures/place_initialization_state.html:
+#   11 nome; 13/0 categoria; 39 endereço completo (ou 18, nome + endereço);
+#   178/0/0 telefone; 7/1 domínio do site (ou 7/0, URL); 4/7 nota; 4/8 avaliações;
+#   32/1/1 descrição; 34/1 horários [[dia, [faixas]], ...]; 100 opções de serviço.
+def parse_initialization_state(html, google_maps_url):
+    """Resultado a partir de ``window.APP_INITIALIZATION_STATE``; None se a página não o trouxer.
+
+    As posições dos campos no vetor do lugar não são documentadas e podem mudar;
+    nesse caso o nome não é encontrado e a extração volta para o navegador.
+    """
+    marker = html.find("APP_INITIALIZATION_STATE=")
+    if marker < 0:
+        return None
+    try:
+        state, _ = json.JSONDecoder().raw_decode(html, marker + len("APP_INITIALIZATION_STATE="))
+    except ValueError:
+        return None
+    place = _place_array(state)
+    if place is None:
+        return None
+
+    website = _dig(place, 7, 1) or _dig(place, 7, 0)
+    if isinstance(website, str):
+        website = website.split("://", 1)[-1].rstrip("/")
+    hours = _dig(place, 34, 1)
+    if isinstance(hours, list):
+        days = [
+            f"{day[0]}: {', '.join(_strings(day[1]))}"
+            for day in hours if isinstance(day, list) and len(day) > 1 and isinstance(day[0], str)
+        ]
+        hours = "; ".join(days) or None
+    fields = {
+        "name": _text_or_na(_dig(place, 11)),
+        "type": _text_or_na(_dig(place, 13, 0)),
+        "address": _text_or_na(_dig(place, 39) or _dig(place, 18)),
+        "phone": _text_or_na(_dig(place, 178, 0, 0)),
+        "website": _text_or_na(website),
+        "opening_hours": _text_or_na(hours),
+        "introduction": _text_or_na(_dig(place, 32, 1, 1)),
+    }
+    rating = _dig(place, 4, 7)
+    count = _dig(place, 4, 8)
+    rev_avg = float(rating) if isinstance(rating, (int, float)) else "N/A"
+    rev_count = count if isinstance(count, int) else "N/A"
+    badges = parse_service_badges(_strings(_dig(place, 100)))
+    return build_result(fields, rev_avg, rev_count, badges, google_maps_url)
+
+
+def parse_place_page(html, google_maps_url):
+    """Tenta o painel no HTML e depois os dados de inicialização."""
+    return parse_place_html(html, google_maps_url) or parse_initialization_state(html, google_maps_url)
+
+
+# --- Cliente HTTP ---
+
+def _looks_blocked(url, status):
+    return status == 429 or "consent.google." in url or "/sorry/" in url
+
+
+class _HttpClient:
+    """GET com conexões keep-alive reaproveitadas, uma por thread e servidor."""
+
+    def __init__(self, headers, timeout=15, max_redirects=3):
+        self.headers = headers
+        self.timeout = timeout
+        self.max_redirects = max_redirects
+        self._local = threading.local()
+
+    def _connection(self, scheme, netloc, fresh=False):
+        connections = getattr(self._local, "connections", None)
+        if connections is None:
+            connections = self._local.connections = {}
+        key = (scheme, netloc)
+        if fresh and key in connections:
+            connections.pop(key).close()
+        if key not in connections:
+            connection_class = http.client.HTTPSConnection if scheme == "https" else http.client.HTTPConnection
+            connections[key] = connection_class(netloc, timeout=self.timeout)
+        return connections[key]
+
+    def _request(self, parts):
+        path = parts.path + (f"?{parts.query}" if parts.query else "")
+        for attempt in range(2):
+            connection = self._connection(parts.scheme, parts.netloc, fresh=attempt > 0)
+            try:
+                connection.request("GET", path or "/", headers=self.headers)
+                response = connection.getresponse()
+                return response, response.read()
+            except (http.client.RemoteDisconnected, http.client.CannotSendRequest, ConnectionResetError, BrokenPipeError):
+                # Conexão keep-alive encerrada pelo servidor: tenta uma vez com uma nova
+                if attempt:
+                    raise
+
+    def get(self, url):
+        """Retorna (url final, status, html)."""
+        for _ in range(self.max_redirects + 1):
+            response, body = self._request(urlsplit(url))
+            location = response.getheader("Location")
+            if response.status in (301, 302, 303, 307, 308) and location:
+                url = urljoin(url, location)
+                continue
+            encoding = (response.getheader("Content-Encoding") or "").lower()
+            if encoding == "gzip":
+                body = gzip.decompress(body)
+            elif encoding == "deflate":
+                body = zlib.decompress(body)
+            return url, response.status, body.decode(response.headers.get_content_charset() or "utf-8", "replace")
+        return url, response.status, ""
+
+
+class HttpPlaceExtractor:
+    """Extrai estabelecimentos pelo HTML obtido via HTTP, com várias conexões em paralelo."""
+
+    def __init__(self, user_agent, max_connections=16, timeout=15, governor=None, url_rewriter=None):
+        self.max_connections = max(1, max_connections)
+        self.governor = governor
+        # Função opcional url -> url usada para buscar a página (ex: fixture local nos benchmarks)
+        self.url_rewriter = url_rewriter
+        self.client = _HttpClient({
+            "User-Agent": user_agent,
+            "Accept": "text/html,application/xhtml+xml",
+            "Accept-Language": "pt-BR,pt;q=0.9",
+            "Accept-Encoding": "gzip",
+            # Evita o redirecionamento para a página de consentimento de cookies
+            "Cookie": "CONSENT=YES+",
+        }, timeout=timeout)
+        self.executor = ThreadPoolExecutor(self.max_connections, thread_name_prefix="http-extractor")
+        self.counters = {"parsed": 0, "fallback": 0, "blocked": 0, "error": 0}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, user_agent, governors=None):
+        """Cria o extrator a partir de SCRAPER_HTTP_*; None se a extração via HTTP estiver desativada."""
+        if os.environ.get('SCRAPER_HTTP_EXTRACTION', '0') != '1':
+            return None
+        max_connections = int(os.environ.get('SCRAPER_HTTP_MAX_CONNECTIONS', 16))
+        return cls(
+            user_agent,
+            max_connections=max_connections,
+            timeout=float(os.environ.get('SCRAPER_HTTP_TIMEOUT', 15)),
+            governor=governors.get("http", max_connections) if governors is not None else None,
+        )
+
+    def _count(self, outcome):
+        HTTP_EXTRACTIONS_TOTAL.inc(outcome=outcome)
+        with self._lock:
+            self.counters[outcome] += 1
+
+    def extract(self, url):
+        """Resultado extraído do HTML, ou None para usar o navegador."""
+        if self.governor is not None:
+            self.governor.acquire()
+        outcome = ERROR
+        try:
+            started_at = time.time()
+            fetch_url = self.url_rewriter(url) if self.url_rewriter is not None else url
+            final_url, status, html = self.client.get(fetch_url)
+            PAGE_LOAD_SECONDS.observe(time.time() - started_at, page="place_http")
+            if _looks_blocked(final_url, status):
+                outcome = BLOCKED
+                self._count("blocked")
+                logging.warning(f"[HTTP] Página de bloqueio ao buscar {url} (status {status}). Usando o navegador.")
+                return None
+            result = parse_place_page(html, url) if status == 200 else None
+            if result is None:
+                outcome = NO_NAME if status == 200 else TIMEOUT
+                self._count("fallback")
+                logging.info(f"[HTTP] Campos não encontrados no HTML (status {status}). Usando o navegador.")
+                return None
+            outcome = OK
+            self._count("parsed")
+            return result
+        except (OSError, http.client.HTTPException) as e:
+            outcome = TIMEOUT
+            self._count("error")
+            logging.warning(f"[HTTP] Erro ao buscar {url}: {e}. Usando o navegador.")
+            return None
+        except Exception as e:
+            # Corpo comprimido corrompido (EOFError, zlib.error) ou HTML inesperado para o parser
+            self._count("error")
+            logging.warning(f"[HTTP] Erro ao ler {url}: {e!r}. Usando o navegador.")
+            return None
+        finally:
+            if self.governor is not None:
+                self.governor.release(outcome)
+
+    def stats(self):
+        with self._lock:
+            return {"max_connections": self.max_connections, **self.counters}
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False)
@@ -0,0 +1,337 @@
+# -*- coding: utf-8 -*-
+"""Fila de jobs e armazenamento de resultados compartilhados entre processos.
+
+Permite que vários workers do gunicorn (e vários hosts) enxerguem os mesmos jobs
+e que a coleta rode em processos separados (``python -m src.worker``). Há dois
+backends com a mesma interface:
+
+- ``SqliteJobStore``: arquivo SQLite local, compartilhado pelos processos do host;
+- ``RedisJobStore``: qualquer servidor compatível com o protocolo Redis
+  (requer o pacote ``redis``).
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+QUEUE_BACKENDS = ("local", "sqlite", "redis")
+
+
+def _new_record(job_id, params, status, track_latest=True):
+    return {
+        "job_id": job_id,
+        "params": params,
+        "track_latest": track_latest,
+        "created_at": time.time(),
+        "started_at": None,
+        "finished_at": None,
+        "heartbeat": None,
+        "worker": None,
+        "status": status,
+    }
+
+
+class SqliteJobStore:
+    """Fila e resultados em um arquivo SQLite (modo WAL)."""
+
+    def __init__(self, path, stale_after=120):
+        self.path = path
+        self.stale_after = stale_after
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " job_id TEXT PRIMARY KEY,"
+            " state TEXT NOT NULL,"
+            " record TEXT NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " heartbeat REAL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_state ON jobs (state, created_at)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            " job_id TEXT NOT NULL,"
+            " idx INTEGER NOT NULL,"
+            " data TEXT NOT NULL,"
+            " PRIMARY KEY (job_id, idx))"
+        )
+
+    def _write(self, statements):
+        """Executa os comandos em uma única transação de escrita."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = statements(self._conn)
+                self._conn.execute("COMMIT")
+                return result
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def _read(self, sql, args=()):
+        with self._lock:
+            return self._conn.execute(sql, args).fetchall()
+
+    def enqueue(self, job_id, params, status, track_latest=True):
+        record = _new_record(job_id, params, status, track_latest)
+
+        def insert(conn):
+            conn.execute("DELETE FROM results WHERE job_id = ?", (job_id,))
+            conn.execute(
+                "INSERT OR REPLACE INTO jobs (job_id, state, record, created_at, heartbeat) VALUES (?, 'queued', ?, ?, NULL)",
+                (job_id, json.dumps(record, ensure_ascii=False), record["created_at"])
+            )
+        self._write(insert)
+        return record
+
+    def claim(self, worker_id, timeout=5):
+        """Reserva o job mais antigo da fila; retorna o registro ou None após ``timeout`` segundos."""
+        deadline = time.time() + timeout
+        while True:
+            self.requeue_stale()
+
+            def take(conn):
+                row = conn.execute(
+                    "SELECT job_id, record FROM jobs WHERE state = 'queued' ORDER BY created_at LIMIT 1"
+                ).fetchone()
+                if row is None:
+                    return None
+                record = json.loads(row[1])
+                record["worker"] = worker_id
+                record["heartbeat"] = time.time()
+                record["status"]["state"] = "running"
+                conn.execute(
+                    "UPDATE jobs SET state = 'running', record = ?, heartbeat = ? WHERE job_id = ?",
+                    (json.dumps(record, ensure_ascii=False), record["heartbeat"], row[0])
+                )
+                return record
+            record = self._write(take)
+            if record is not None or time.time() >= deadline:
+                return record
+            time.sleep(0.5)
+
+    def requeue_stale(self):
+        """Devolve à fila os jobs cujo worker parou de enviar sinais de vida."""
+        if not self.stale_after:
+            return
+        limit = time.time() - self.stale_after
+
+        def requeue(conn):
+            rows = conn.execute(
+                "SELECT job_id, record FROM jobs WHERE state = 'running' AND heartbeat < ?", (limit,)
+            ).fetchall()
+            for job_id, data in rows:
+                record = json.loads(data)
+                record["status"]["state"] = "queued"
+                conn.execute(
+                    "UPDATE jobs SET state = 'queued', record = ?, heartbeat = NULL WHERE job_id = ?",
+                    (json.dumps(record, ensure_ascii=False), job_id)
+                )
+                conn.execute("DELETE FROM results WHERE job_id = ?", (job_id,))
+            return [job_id for job_id, _ in rows]
+        for job_id in self._write(requeue):
+            logging.warning(f"[Queue] Job {job_id} sem sinal do worker há {self.stale_after}s. Devolvido à fila.")
+
+    def save(self, record, new_results=()):
+        """Grava o registro do job e anexa novos resultados."""
+        record["heartbeat"] = time.time()
+        state = record["status"]["state"]
+
+        def update(conn):
+            (start,) = conn.execute("SELECT COUNT(*) FROM results WHERE job_id = ?", (record["job_id"],)).fetchone()
+            conn.executemany(
+                "INSERT INTO results (job_id, idx, data) VALUES (?, ?, ?)",
+                [(record["job_id"], start + offset, json.dumps(result, ensure_ascii=False))
+                 for offset, result in enumerate(new_results)]
+            )
+            conn.execute(
+                "UPDATE jobs SET state = ?, record = ?, heartbeat = ? WHERE job_id = ?",
+                (state, json.dumps(record, ensure_ascii=False), record["heartbeat"], record["job_id"])
+            )
+        self._write(update)
+
+    def get(self, job_id):
+        rows = self._read("SELECT record FROM jobs WHERE job_id = ?", (job_id,))
+        return json.loads(rows[0][0]) if rows else None
+
+    def count_results(self, job_id):
+        return self._read("SELECT COUNT(*) FROM results WHERE job_id = ?", (job_id,))[0][0]
+
+    def get_results(self, job_id, start=0, stop=None):
+        limit = -1 if stop is None else max(0, stop - start)
+        rows = self._read(
+            "SELECT data FROM results WHERE job_id = ? AND idx >= ? ORDER BY idx LIMIT ?", (job_id, start, limit)
+        )
+        return [json.loads(data) for (data,) in rows]
+
+    def job_ids(self, state=None):
+        """IDs dos jobs do mais antigo ao mais recente."""
+        if state is None:
+            rows = self._read("SELECT job_id FROM jobs ORDER BY created_at")
+        else:
+            rows = self._read("SELECT job_id FROM jobs WHERE state = ? ORDER BY created_at", (state,))
+        return [job_id for (job_id,) in rows]
+
+    def delete(self, job_id):
+        def remove(conn):
+            conn.execute("DELETE FROM results WHERE job_id = ?", (job_id,))
+            conn.execute("DELETE FROM jobs WHERE job_id = ?", (job_id,))
+        self._write(remove)
+
+    def describe(self):
+        return {"backend": "sqlite", "path": self.path}
+
+
+class RedisJobStore:
+    """Fila e resultados em um servidor compatível com Redis.
+
+    Usa apenas comandos básicos (listas, strings e sorted sets), de modo que
+    substitutos locais compatíveis com o protocolo também funcionam.
+    """
+
+    def __init__(self, url, prefix="gms", stale_after=120):
+        if redis is None:
+            raise RuntimeError("O backend Redis requer o pacote 'redis' (pip install redis).")
+        self.url = url
+        self.prefix = prefix
+        self.stale_after = stale_after
+        self._redis = redis.Redis.from_url(url, decode_responses=True)
+
+    def _key(self, *parts):
+        return ":".join((self.prefix,) + parts)
+
+    def enqueue(self, job_id, params, status, track_latest=True):
+        record = _new_record(job_id, params, status, track_latest)
+        pipe = self._redis.pipeline()
+        pipe.delete(self._key("results", job_id))
+        pipe.set(self._key("job", job_id), json.dumps(record, ensure_ascii=False))
+        pipe.zadd(self._key("jobs"), {job_id: record["created_at"]})
+        pipe.lpush(self._key("queue"), job_id)
+        pipe.execute()
+        return record
+
+    def claim(self, worker_id, timeout=5):
+        self.requeue_stale()
+        processing = self._key("processing", worker_id)
+        # O sinal de vida do worker cobre a janela entre retirar o job da fila e
+        # gravá-lo como "running"; se o worker cair nela, requeue_stale devolve o job
+        pipe = self._redis.pipeline()
+        pipe.sadd(self._key("workers"), worker_id)
+        pipe.set(self._key("worker", worker_id), time.time(), ex=max(1, int(self.stale_after or 120)))
+        pipe.execute()
+        # BRPOPLPUSH em vez de BLMOVE: também existe em servidores anteriores ao Redis 6.2
+        job_id = self._redis.brpoplpush(self._key("queue"), processing, timeout=max(1, int(timeout)))
+        if job_id is None:
+            return None
+        record = self.get(job_id)
+        if record is None:
+            self._redis.lrem(processing, 1, job_id)
+            return None
+        record["worker"] = worker_id
+        record["status"]["state"] = "running"
+        record["heartbeat"] = time.time()
+        pipe = self._redis.pipeline()
+        pipe.set(self._key("job", job_id), json.dumps(record, ensure_ascii=False))
+        pipe.zadd(self._key("running"), {job_id: record["heartbeat"]})
+        pipe.lrem(processing, 1, job_id)
+        pipe.execute()
+        return record
+
+    def requeue_stale(self):
+        if not self.stale_after:
+            return
+        running = self._key("running")
+        for job_id in self._redis.zrangebyscore(running, 0, time.time() - self.stale_after):
+            # Só um processo consegue remover o job de "running" e devolvê-lo à fila
+            if self._redis.zrem(running, job_id):
+                logging.warning(f"[Queue] Job {job_id} sem sinal do worker há {self.stale_after}s. Devolvido à fila.")
+                record = self.get(job_id)
+                if record is not None:
+                    record["status"]["state"] = "queued"
+                    pipe = self._redis.pipeline()
+                    pipe.delete(self._key("results", job_id))
+                    pipe.set(self._key("job", job_id), json.dumps(record, ensure_ascii=False))
+                    pipe.lpush(self._key("queue"), job_id)
+                    pipe.execute()
+        # Jobs retirados da fila por workers que caíram antes de marcá-los como "running"
+        for worker_id in self._redis.smembers(self._key("workers")):
+            if self._redis.exists(self._key("worker", worker_id)):
+                continue
+            processing = self._key("processing", worker_id)
+            # RPOPLPUSH é atômico: cada job volta à fila uma única vez
+            while True:
+                job_id = self._redis.rpoplpush(processing, self._key("queue"))
+                if job_id is None:
+                    break
+                logging.warning(f"[Queue] Job {job_id} retirado por {worker_id}, que parou de responder. Devolvido à fila.")
+            self._redis.srem(self._key("workers"), worker_id)
+
+    def save(self, record, new_results=()):
+        record["heartbeat"] = time.time()
+        job_id = record["job_id"]
+        pipe = self._redis.pipeline()
+        if new_results:
+            pipe.rpush(self._key("results", job_id), *[json.dumps(result, ensure_ascii=False) for result in new_results])
+        pipe.set(self._key("job", job_id), json.dumps(record, ensure_ascii=False))
+        if record["status"]["state"] == "running":
+            pipe.zadd(self._key("running"), {job_id: record["heartbeat"]})
+        else:
+            pipe.zrem(self._key("running"), job_id)
+        pipe.execute()
+
+    def get(self, job_id):
+        data = self._redis.get(self._key("job", job_id))
+        return json.loads(data) if data else None
+
+    def count_results(self, job_id):
+        return self._redis.llen(self._key("results", job_id))
+
+    def get_results(self, job_id, start=0, stop=None):
+        end = -1 if stop is None else stop - 1
+        if stop is not None and stop <= start:
+            return []
+        return [json.loads(data) for data in self._redis.lrange(self._key("results", job_id), start, end)]
+
+    def job_ids(self, state=None):
+        job_ids = self._redis.zrange(self._key("jobs"), 0, -1)
+        if state is None:
+            return job_ids
+        return [job_id for job_id in job_ids if (self.get(job_id) or {}).get("status", {}).get("state") == state]
+
+    def delete(self, job_id):
+        pipe = self._redis.pipeline()
+        pipe.delete(self._key("job", job_id), self._key("results", job_id))
+        pipe.zrem(self._key("jobs"), job_id)
+        pipe.zrem(self._key("running"), job_id)
+        pipe.execute()
+
+    def describe(self):
+        return {"backend": "redis", "url": self.url, "prefix": self.prefix}
+
+
+def job_store_from_env(default_path):
+    """Cria o armazenamento compartilhado a partir de SCRAPER_QUEUE_*; None no modo local."""
+    backend = os.environ.get('SCRAPER_QUEUE_BACKEND', 'local')
+    if backend not in QUEUE_BACKENDS:
+        raise ValueError(f"SCRAPER_QUEUE_BACKEND inválido: {backend} (use {', '.join(QUEUE_BACKENDS)}).")
+    stale_after = int(os.environ.get('SCRAPER_WORKER_STALE_AFTER', 120))
+    if backend == "sqlite":
+        return SqliteJobStore(os.environ.get('SCRAPER_QUEUE_PATH', default_path), stale_after=stale_after)
+    if backend == "redis":
+        return RedisJobStore(
+            os.environ.get('SCRAPER_REDIS_URL', 'redis://localhost:6379/0'),
+            prefix=os.environ.get('SCRAPER_QUEUE_PREFIX', 'gms'),
+            stale_after=stale_after,
+        )
+    return None
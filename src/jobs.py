@@ -0,0 +1,307 @@
+# -*- coding: utf-8 -*-
+"""Gerenciamento de buscas como jobs independentes executados em paralelo."""
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from src.metrics import JOB_DURATION_SECONDS, JOBS_RUNNING, JOBS_TOTAL
+from src.result_store import ResultStore
+
+
+class JobQueueFullError(Exception):
+    """A fila de jobs atingiu o limite configurado."""
+
+
+class JobAlreadyActiveError(Exception):
+    """Já existe um job com o mesmo ID na fila ou em execução."""
+
+
+class BaseJob:
+    """Parâmetros e status de uma busca, comuns aos jobs locais e aos da fila compartilhada."""
+
+    def __init__(self, params, job_id=None, track_latest=True):
+        self.id = job_id or uuid.uuid4().hex[:12]
+        self.params = dict(params)
+        # Jobs de lote não passam a ser "o job mais recente" nem contam na retenção
+        self.track_latest = track_latest
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        # Mesmas chaves do antigo search_status global, para manter o front-end compatível.
+        # is_running permanece True enquanto o job está na fila ou em execução.
+        self.status = {
+            "job_id": self.id,
+            "state": "queued",
+            "is_running": True,
+            "progress": 0,
+            "message": "Aguardando na fila...",
+            "error": None,
+            "total_found": 0,
+            "unique_results": 0
+        }
+
+    @property
+    def is_finished(self):
+        return self.status["state"] in ("finished", "error")
+
+    def to_dict(self):
+        return {
+            "job_id": self.id,
+            "search_params": self.params,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            **self.status
+        }
+
+
+class Job(BaseJob):
+    """Uma busca executada neste processo, que recebe seus resultados à medida que são extraídos."""
+
+    def __init__(self, params, job_id=None, track_latest=True):
+        super().__init__(params, job_id, track_latest)
+        self.results = ResultStore()
+        # Notifica quem acompanha o job (ex: stream SSE) a cada resultado ou ao finalizar
+        self._updated = threading.Condition()
+
+    def add_result(self, result):
+        """Publica um resultado assim que é extraído."""
+        with self._updated:
+            self.results.append(result)
+            self._updated.notify_all()
+
+    def notify(self):
+        with self._updated:
+            self._updated.notify_all()
+
+    def wait_for_update(self, seen_results, timeout):
+        """Aguarda um resultado além de ``seen_results`` ou o fim do job, até ``timeout`` segundos."""
+        with self._updated:
+            return self._updated.wait_for(
+                lambda: len(self.results) > seen_results or self.is_finished, timeout=timeout
+            )
+
+
+def run_job(job, runner):
+    """Executa um job com ``runner``, registrando início, fim e erros não tratados."""
+    job.started_at = time.time()
+    job.status["state"] = "running"
+    job.status["message"] = "Iniciando coleta..."
+    logging.info(f"[Jobs] Job {job.id} iniciado.")
+    JOBS_RUNNING.inc()
+    try:
+        runner(job)
+    except Exception as e:
+        logging.exception(f"[Jobs] Erro não tratado no job {job.id}.")
+        job.status["error"] = f"Erro crítico: {str(e)}"
+    finally:
+        job.finished_at = time.time()
+        job.status["state"] = "error" if job.status["error"] else "finished"
+        job.status["is_running"] = False
+        JOBS_RUNNING.dec()
+        JOBS_TOTAL.inc(state=job.status["state"])
+        JOB_DURATION_SECONDS.observe(job.finished_at - job.started_at)
+        job.notify()
+        logging.info(f"[Jobs] Job {job.id} finalizado ({job.status['state']}).")
+
+
+class JobManager:
+    """Executa jobs com um limite de concorrência, enfileirando os excedentes."""
+
+    def __init__(self, runner, max_concurrent=2, max_queued=50, max_finished=20):
+        self.runner = runner
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_queued = max_queued
+        self.max_finished = max_finished
+        self._jobs = OrderedDict()
+        self._latest_id = None
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=self.max_concurrent, thread_name_prefix="scraper-job")
+
+    def submit(self, params, job_id=None, track_latest=True):
+        """Cria um job e o agenda para execução.
+
+        ``job_id`` reaproveita o ID de um job anterior (ex: ao retomar uma coleta).
+        Com ``track_latest=False`` (consultas de lote), o job não substitui o mais
+        recente usado pelos endpoints sem ID e deve ser removido com ``discard``.
+        """
+        with self._lock:
+            existing = self._jobs.get(job_id) if job_id else None
+            if existing is not None and not existing.is_finished:
+                raise JobAlreadyActiveError(f"O job {job_id} já está na fila ou em execução.")
+            queued = sum(1 for job in self._jobs.values() if job.status["state"] == "queued")
+            if self.max_queued and queued >= self.max_queued:
+                raise JobQueueFullError(f"A fila de buscas está cheia ({queued} aguardando).")
+            job = Job(params, job_id, track_latest=track_latest)
+            self._jobs.pop(job.id, None)
+            self._jobs[job.id] = job
+            if track_latest:
+                self._latest_id = job.id
+            self._evict_finished()
+        logging.info(f"[Jobs] Job {job.id} criado: {job.params}")
+        self._executor.submit(run_job, job, self.runner)
+        return job
+
+    def _evict_finished(self):
+        """Descarta os jobs finalizados mais antigos além do limite de retenção."""
+        finished = [job_id for job_id, job in self._jobs.items() if job.is_finished and job.track_latest]
+        for job_id in finished[:max(0, len(finished) - self.max_finished)]:
+            if job_id != self._latest_id:
+                del self._jobs[job_id]
+
+    def discard(self, job_id):
+        """Remove um job finalizado (ex: consulta de lote já incorporada ao lote)."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None and job.is_finished:
+                del self._jobs[job_id]
+
+    def get(self, job_id):
+        return self._jobs.get(job_id)
+
+    def latest(self):
+        """Job criado mais recentemente, usado pelos endpoints sem ID de job."""
+        return self._jobs.get(self._latest_id) if self._latest_id else None
+
+    def list(self):
+        with self._lock:
+            return list(self._jobs.values())
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+class StoredResults:
+    """Resultados de um job no armazenamento compartilhado, lidos sob demanda."""
+
+    PAGE_SIZE = 500
+
+    def __init__(self, store, job_id):
+        self._store = store
+        self._job_id = job_id
+
+    def __len__(self):
+        return self._store.count_results(self._job_id)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            positions = range(*index.indices(len(self)))
+            if not positions:
+                return []
+            # Lê o trecho contínuo coberto pela fatia e aplica o passo (inclusive negativo)
+            results = self._store.get_results(self._job_id, min(positions), max(positions) + 1)
+            return results[::positions.step] if positions.step > 0 else results[::-1][::-positions.step]
+        if index < 0:
+            index += len(self)
+        results = self._store.get_results(self._job_id, index, index + 1) if index >= 0 else []
+        if not results:
+            raise IndexError(index)
+        return results[0]
+
+    def __iter__(self):
+        start = 0
+        while True:
+            page = self._store.get_results(self._job_id, start, start + self.PAGE_SIZE)
+            yield from page
+            if len(page) < self.PAGE_SIZE:
+                return
+            start += len(page)
+
+
+class StoredJob(BaseJob):
+    """Job mantido no armazenamento compartilhado e executado por um worker.
+
+    Somente leitura neste processo: os resultados são gravados pelo worker.
+    """
+
+    POLL_INTERVAL = 0.25
+
+    def __init__(self, store, record):
+        super().__init__(record["params"], record["job_id"], track_latest=record.get("track_latest", True))
+        self._store = store
+        self.results = StoredResults(store, self.id)
+        self._load(record)
+
+    def _load(self, record):
+        self.created_at = record["created_at"]
+        self.started_at = record["started_at"]
+        self.finished_at = record["finished_at"]
+        self.status = record["status"]
+
+    def refresh(self):
+        record = self._store.get(self.id)
+        if record is not None:
+            self._load(record)
+
+    def wait_for_update(self, seen_results, timeout):
+        """Consulta o armazenamento até haver um resultado além de ``seen_results`` ou o job terminar."""
+        deadline = time.time() + timeout
+        while True:
+            self.refresh()
+            if len(self.results) > seen_results or self.is_finished:
+                return True
+            if time.time() >= deadline:
+                return False
+            time.sleep(self.POLL_INTERVAL)
+
+
+class SharedJobManager:
+    """Enfileira jobs no armazenamento compartilhado; a coleta roda em ``src.worker``."""
+
+    def __init__(self, store, max_queued=50, max_finished=20):
+        self.store = store
+        self.max_queued = max_queued
+        self.max_finished = max_finished
+
+    def submit(self, params, job_id=None, track_latest=True):
+        if self.max_queued:
+            queued = len(self.store.job_ids("queued"))
+            if queued >= self.max_queued:
+                raise JobQueueFullError(f"A fila de buscas está cheia ({queued} aguardando).")
+        existing = self.store.get(job_id) if job_id else None
+        if existing is not None and existing["status"]["state"] in ("queued", "running"):
+            raise JobAlreadyActiveError(f"O job {job_id} já está na fila ou em execução.")
+        job = BaseJob(params, job_id, track_latest=track_latest)
+        record = self.store.enqueue(job.id, job.params, job.status, track_latest=track_latest)
+        self._evict_finished()
+        logging.info(f"[Jobs] Job {job.id} enfileirado na fila compartilhada: {job.params}")
+        return StoredJob(self.store, record)
+
+    def _evict_finished(self):
+        finished = self.store.job_ids("finished") + self.store.job_ids("error")
+        if len(finished) <= self.max_finished:
+            return
+        records = [self.store.get(job_id) for job_id in finished]
+        records = sorted(
+            (record for record in records if record and record.get("track_latest", True)),
+            key=lambda record: record["created_at"]
+        )
+        if len(records) <= self.max_finished:
+            return
+        for record in records[:len(records) - self.max_finished]:
+            self.store.delete(record["job_id"])
+
+    def discard(self, job_id):
+        record = self.store.get(job_id)
+        if record is not None and record["status"]["state"] not in ("queued", "running"):
+            self.store.delete(job_id)
+
+    def get(self, job_id):
+        record = self.store.get(job_id)
+        return StoredJob(self.store, record) if record else None
+
+    def latest(self):
+        for job_id in reversed(self.store.job_ids()):
+            record = self.store.get(job_id)
+            if record is not None and record.get("track_latest", True):
+                return StoredJob(self.store, record)
+        return None
+
+    def list(self):
+        return [job for job in (self.get(job_id) for job_id in self.store.job_ids()) if job is not None]
+
+    def shutdown(self):
+        pass
@@ -0,0 +1,242 @@
+# -*- coding: utf-8 -*-
+"""Diário (journal) em disco de cada job, para retomar coletas interrompidas.
+
+Cada job grava um arquivo JSON Lines somente-anexação com os parâmetros da
+busca, as URLs coletadas na lista de resultados e cada estabelecimento extraído,
+à medida que são produzidos. Se o processo ou o navegador cair no meio da coleta,
+o job pode ser retomado a partir do diário: a busca não é refeita e apenas os
+estabelecimentos ainda não extraídos são abertos.
+"""
+import json
+import logging
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows: sem travas entre processos
+    fcntl = None
+
+FINISHED = "finished"
+RESUME_LOCK_FILENAME = ".resume.lock"
+
+
+class JournalLockedError(Exception):
+    """O diário já está aberto por outro processo, que está executando o job."""
+
+
+def _try_lock(file):
+    """Tenta travar o arquivo com exclusividade, sem bloquear; a trava cai ao fechá-lo."""
+    if fcntl is None:
+        return True
+    try:
+        fcntl.flock(file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        return False
+    return True
+
+
+class Checkpoint:
+    """Estado de um job reconstruído a partir do seu diário."""
+
+    def __init__(self, job_id):
+        self.job_id = job_id
+        self.params = None
+        self.created_at = None
+        self.updated_at = None
+        self.urls = None
+        # URL do estabelecimento -> resultado extraído
+        self.results = {}
+        self.state = None
+
+    @property
+    def is_finished(self):
+        return self.state == FINISHED
+
+    def to_dict(self):
+        return {
+            "job_id": self.job_id,
+            "search_params": self.params,
+            "created_at": self.created_at,
+            "updated_at": self.updated_at,
+            "state": self.state,
+            "listing_urls": len(self.urls) if self.urls is not None else None,
+            "extracted": len(self.results),
+        }
+
+
+class JobJournal:
+    """Arquivo de diário de um job, aberto para anexação."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        # Uma linha truncada por uma queda não pode se juntar ao próximo registro
+        needs_newline = False
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            with open(path, "rb") as existing:
+                existing.seek(-1, os.SEEK_END)
+                needs_newline = existing.read(1) != b"\n"
+        self._file = open(path, "a", encoding="utf-8")
+        # Travado enquanto o job roda: outro processo não pode anexar ao mesmo diário
+        if not _try_lock(self._file):
+            self._file.close()
+            raise JournalLockedError(f"O diário {os.path.basename(path)} já está em uso por outro processo.")
+        if needs_newline:
+            self._file.write("\n")
+
+    def _append(self, record):
+        record["at"] = time.time()
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self._lock:
+            if self._file.closed:
+                return
+            self._file.write(line)
+            self._file.flush()
+
+    def record_params(self, params):
+        self._append({"type": "params", "params": params})
+
+    def record_urls(self, urls):
+        """Registra as URLs coletadas na lista de resultados (o ponto de retomada)."""
+        self._append({"type": "urls", "urls": list(urls)})
+
+    def record_result(self, url, result):
+        self._append({"type": "result", "url": url, "result": result})
+
+    def record_state(self, state):
+        self._append({"type": "state", "state": state})
+
+    def close(self):
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+
+
+class JournalStore:
+    """Diretório com os diários dos jobs."""
+
+    def __init__(self, directory, keep_finished=False):
+        self.directory = directory
+        self.keep_finished = keep_finished
+        self._resume_lock = None
+        os.makedirs(directory, exist_ok=True)
+
+    @classmethod
+    def from_env(cls, default_directory):
+        """Cria o repositório a partir de SCRAPER_JOURNAL_*; retorna None se estiver desativado."""
+        if os.environ.get('SCRAPER_JOURNAL_ENABLED', '1') == '0':
+            return None
+        try:
+            return cls(
+                os.environ.get('SCRAPER_JOURNAL_DIR', default_directory),
+                keep_finished=os.environ.get('SCRAPER_JOURNAL_KEEP_FINISHED', '0') == '1',
+            )
+        except OSError as e:
+            logging.error(f"[Journal] Não foi possível abrir o diretório de diários: {e}. Retomada desativada.")
+            return None
+
+    def path_for(self, job_id):
+        # O ID vem da URL na retomada: aceita apenas IDs gerados pelo JobManager
+        if not job_id.isalnum():
+            raise ValueError(f"ID de job inválido: {job_id}")
+        return os.path.join(self.directory, f"{job_id}.jsonl")
+
+    def open(self, job_id, params):
+        """Abre o diário do job, gravando os parâmetros se ele ainda não existir."""
+        path = self.path_for(job_id)
+        is_new = not os.path.exists(path)
+        journal = JobJournal(path)
+        if is_new:
+            journal.record_params(params)
+        return journal
+
+    def load(self, job_id):
+        """Reconstrói o checkpoint de um job; retorna None se não houver diário."""
+        try:
+            path = self.path_for(job_id)
+        except ValueError:
+            return None
+        if not os.path.exists(path):
+            return None
+        checkpoint = Checkpoint(job_id)
+        skipped = 0
+        with open(path, encoding="utf-8") as journal_file:
+            for line in journal_file:
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # Última linha truncada por uma queda
+                    skipped += 1
+                    continue
+                record_type = record.get("type")
+                checkpoint.updated_at = record.get("at", checkpoint.updated_at)
+                if record_type == "params":
+                    checkpoint.params = record["params"]
+                    checkpoint.created_at = record.get("at")
+                elif record_type == "urls":
+                    checkpoint.urls = record["urls"]
+                elif record_type == "result":
+                    checkpoint.results[record["url"]] = record["result"]
+                elif record_type == "state":
+                    checkpoint.state = record["state"]
+        if skipped:
+            logging.warning(f"[Journal] {skipped} registros ilegíveis ignorados no diário do job {job_id}.")
+        if checkpoint.params is None:
+            return None
+        return checkpoint
+
+    def finish(self, job_id, journal, state):
+        """Registra o fim do job; diários de jobs concluídos com sucesso são removidos."""
+        journal.record_state(state)
+        journal.close()
+        if state == FINISHED and not self.keep_finished:
+            try:
+                os.remove(self.path_for(job_id))
+            except OSError as e:
+                logging.warning(f"[Journal] Não foi possível remover o diário do job {job_id}: {e}")
+
+    def is_active(self, job_id):
+        """Indica se o diário do job está aberto por um job em execução (em qualquer processo)."""
+        try:
+            path = self.path_for(job_id)
+        except ValueError:
+            return False
+        try:
+            with open(path, "rb") as journal_file:
+                return not _try_lock(journal_file)
+        except OSError:
+            return False
+
+    def claim_resume(self):
+        """Elege este processo como o responsável pela retomada automática dos diários.
+
+        A trava em RESUME_LOCK_FILENAME é mantida enquanto o processo viver, de modo
+        que os demais workers do gunicorn e da fila não retomem os mesmos jobs.
+        """
+        if self._resume_lock is not None:
+            return True
+        try:
+            lock_file = open(os.path.join(self.directory, RESUME_LOCK_FILENAME), "a")
+        except OSError as e:
+            logging.error(f"[Journal] Não foi possível abrir a trava de retomada: {e}")
+            return False
+        if not _try_lock(lock_file):
+            lock_file.close()
+            return False
+        self._resume_lock = lock_file
+        return True
+
+    def resumable(self):
+        """Checkpoints de jobs que não terminaram com sucesso."""
+        checkpoints = []
+        for filename in sorted(os.listdir(self.directory)):
+            if not filename.endswith(".jsonl"):
+                continue
+            checkpoint = self.load(filename[:-len(".jsonl")])
+            if checkpoint is not None and not checkpoint.is_finished:
+                checkpoints.append(checkpoint)
+        return checkpoints
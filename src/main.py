@@ -3,385 +3,1141 @@ import sys
 import os
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
-from flask import Flask, render_template, request, jsonify, send_file, redirect, url_for
+from flask import Flask, Response, render_template, request, jsonify, redirect, url_for
 import json
 import time
 import threading
 import traceback
 from datetime import datetime
-import io
+from itertools import islice
 import os
 import logging
-from playwright.sync_api import sync_playwright, TimeoutError as PlaywrightTimeoutError
+import math
+import asyncio
+import concurrent.futures
+from playwright.sync_api import TimeoutError as PlaywrightTimeoutError
+from src.async_engine import AsyncEngine, extract_from_url_async, search_and_collect_async
+from src.batches import BatchManager, parse_queries, parse_queries_csv
+from src.browser_pool import BrowserPool
+from src.exporters import COLUMNAR_FORMATS, EXPORT_FORMATS, columnar_available, logged_stream
+from src.governor import BLOCKED, ERROR, NO_NAME, OK, TIMEOUT, GovernorRegistry, detect_block_page
+from src.http_extractor import HttpPlaceExtractor
+from src.job_store import job_store_from_env
+from src.metrics import (
+    ERRORS_TOTAL, JOB_PHASE_SECONDS, LISTING_EXTRACT_SECONDS, LISTING_READY_SECONDS, LISTINGS_TOTAL,
+    PAGE_LOAD_SECONDS, REGISTRY, SCROLL_ITERATION_SECONDS, SEARCH_SECONDS, rss_sampler
+)
+from src.memory_guard import MemoryGuard
+from src.jobs import JobAlreadyActiveError, JobManager, JobQueueFullError, SharedJobManager
+from src.journal import FINISHED, JournalLockedError, JournalStore
+from src.place_extractor import NAME_XPATH, IpcCounter, extract_place_details
+from src.harvester import FeedHarvester
+from src.place_cache import PlaceCache, place_id_from_url
+from src.place_index import PlaceIndex, dedupe_key
+from src.resource_blocker import BlockStats, ResourceBlocker
+from src.result_store import ResultStore
+from src.shards import FEED_CAP, SHARD_MODES, build_shards
+from src.waits import DETAIL_TIMEOUT_MS, WAIT_MODE, WAIT_MODES, Waiter, wait_for_maps_ready
 
 # --- Configuração de Logging ---
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 app = Flask(__name__)
 
-# Configuração global para armazenar os resultados da busca
-search_results = []
-search_params = {}
-search_status = {
-    "is_running": False,
-    "progress": 0,
-    "message": "",
-    "error": None,
-    "total_found": 0,
-    "unique_results": 0
-}
+# Uso de memória do processo e dos navegadores, amostrado em segundo plano (métrica gms_rss_bytes)
+rss_sampler.start()
+
+# XPaths usados na coleta
+RESULTS_LINK_XPATH = '//a[contains(@href, "https://www.google.com/maps/place")]'
+RESULTS_PANEL_XPATH = '//div[contains(@aria-label, "Resultados para")]'
+SCROLLABLE_ELEMENT_XPATH = '//div[contains(@aria-label, "Resultados para")]/..//div[@role="feed"]'
+
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+
+# Número de páginas do pool que extraem detalhes em paralelo.
+# Com 1, mantém a extração sequencial por clique na lista de resultados.
+DETAIL_WORKERS = max(1, int(os.environ.get('SCRAPER_DETAIL_WORKERS', min(4, os.cpu_count() or 1))))
+
+MAPS_URL = "https://www.google.com/maps"
+
+# Busca dividida em sub-áreas: células da grade com pelo menos SHARD_CAP lugares
+# são subdivididas, até SHARD_MAX_DEPTH níveis
+SHARD_CAP = int(os.environ.get('SCRAPER_SHARD_CAP', 100))
+SHARD_MAX_DEPTH = int(os.environ.get('SCRAPER_SHARD_MAX_DEPTH', 2))
+
+# Diretório para arquivos persistentes (cache, etc.)
+DATA_DIR = os.environ.get('SCRAPER_DATA_DIR', os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data'))
+
+# Detalhes de lugares já extraídos, reaproveitados entre buscas dentro do TTL
+place_cache = PlaceCache.from_env(os.path.join(DATA_DIR, 'place_cache.sqlite3'))
+
+# Chave normalizada de cada lugar já extraído, para deduplicar antes de abrir os detalhes
+place_index = PlaceIndex.from_env(os.path.join(DATA_DIR, 'place_index.sqlite3'))
+
+# Diários dos jobs em andamento, usados para retomar coletas interrompidas
+journal_store = JournalStore.from_env(os.path.join(DATA_DIR, 'journals'))
+
+# Imagens, fontes, tiles do mapa e telemetria não são necessários para os campos extraídos
+resource_blocker = ResourceBlocker.from_env()
+
+# Ritmo de cada contexto do navegador, ajustado pelas falhas e bloqueios recentes
+governors = GovernorRegistry.from_env()
+# Governador compartilhado pelos navegadores do pool (motor sync): quantos extraem ao mesmo tempo
+POOL_GOVERNOR = "pool"
+
+# Extração sem navegador, pelo HTML das páginas dos estabelecimentos (opcional)
+http_extractor = HttpPlaceExtractor.from_env(USER_AGENT, governors)
+
+# Recicla navegadores (ou páginas) quando a memória do processo e dos navegadores passa do limite
+memory_guard = MemoryGuard.from_env()
+
+# Navegadores mantidos aquecidos entre buscas, já parados na página inicial do Maps
+browser_pool = BrowserPool(
+    size=int(os.environ.get('SCRAPER_BROWSER_POOL_SIZE', DETAIL_WORKERS)),
+    context_options={"user_agent": USER_AGENT},
+    context_setup=resource_blocker.install,
+    warm_url=os.environ.get('SCRAPER_BROWSER_WARM_URL', MAPS_URL) or None,
+    warm_wait_ms=5000,
+    warm_ready=wait_for_maps_ready if WAIT_MODE == "event" else None,
+    max_uses=int(os.environ.get('SCRAPER_BROWSER_MAX_USES', 200)),
+    max_age=int(os.environ.get('SCRAPER_BROWSER_MAX_AGE', 1800)),
+    memory_guard=memory_guard,
+)
+
+# Motor de coleta: "sync" usa o pool de navegadores (uma thread por navegador);
+# "async" usa um único navegador com muitas páginas em um event loop
+ENGINES = ("sync", "async")
+ENGINE = os.environ.get('SCRAPER_ENGINE', 'sync')
+if ENGINE not in ENGINES:
+    raise ValueError(f"SCRAPER_ENGINE inválido: {ENGINE} (use {', '.join(ENGINES)}).")
+
+async_engine = None
+if ENGINE == "async":
+    async_engine = AsyncEngine(
+        max_pages=int(os.environ.get('SCRAPER_ASYNC_MAX_PAGES', 16)),
+        contexts=int(os.environ.get('SCRAPER_ASYNC_CONTEXTS', 4)),
+        context_options={"user_agent": USER_AGENT},
+        blocker=resource_blocker,
+        max_uses=int(os.environ.get('SCRAPER_BROWSER_MAX_USES', 200)),
+        memory_guard=memory_guard,
+    )
 
-def check_memory_usage():
-    """Verifica o uso de memória atual."""
+def _percentile(values, fraction):
+    """Percentil pelo método do posto mais próximo; None sem valores."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+class ScrapeRun:
+    """Estado compartilhado pelas tarefas de um mesmo job de scraping."""
+
+    def __init__(self, status, wait_mode=None, journal=None, checkpoint=None):
+        self.status = status
+        self.waiter = Waiter(wait_mode)
+        self.block_stats = BlockStats()
+        self.counters = {"cache_hits": 0, "cache_misses": 0, "ipc_calls": 0, "duplicates_skipped": 0, "retries": 0,
+                         "http_extractions": 0, "http_fallbacks": 0, "index_hits": 0}
+        # Tempo gasto em cada fase (busca, rolagem, detalhes) e por estabelecimento extraído
+        self.phase_seconds = {}
+        self.listing_seconds = []
+        self.journal = journal
+        # Resultados já extraídos antes da retomada (URL -> resultado)
+        self.completed = dict(checkpoint.results) if checkpoint else {}
+        # Resultados de lugares já extraídos por jobs anteriores, vindos do índice (URL -> resultado)
+        self.reused = {}
+        # Posição em que a extração por clique parou para reciclar o navegador
+        self.click_stopped_at = None
+        self._lock = threading.Lock()
+
+    def known_result(self, url):
+        """Resultado já disponível para a URL (retomada ou índice de lugares), ou None."""
+        return self.completed.get(url) or self.reused.get(url)
+
+    def record_urls(self, listing_urls):
+        if self.journal is not None:
+            self.journal.record_urls(listing_urls)
+
+    def record_result(self, result):
+        """Registra no diário um resultado extraído nesta execução."""
+        url = result.get("google_maps_url")
+        if self.journal is not None and url not in self.completed:
+            self.journal.record_result(url, result)
+
+    def increment(self, counter, amount=1):
+        with self._lock:
+            self.counters[counter] = self.counters.get(counter, 0) + amount
+
+    def add_phase(self, phase, seconds):
+        JOB_PHASE_SECONDS.observe(seconds, phase=phase)
+        with self._lock:
+            self.phase_seconds[phase] = self.phase_seconds.get(phase, 0.0) + seconds
+
+    def record_listing(self, seconds):
+        with self._lock:
+            self.listing_seconds.append(seconds)
+
+    def summary(self):
+        with self._lock:
+            counters = dict(self.counters)
+            timings = {
+                "phase_seconds": {phase: round(seconds, 2) for phase, seconds in self.phase_seconds.items()},
+                "listing_seconds_p50": _percentile(self.listing_seconds, 0.5),
+                "listing_seconds_p95": _percentile(self.listing_seconds, 0.95),
+            }
+        for key in ("listing_seconds_p50", "listing_seconds_p95"):
+            if timings[key] is not None:
+                timings[key] = round(timings[key], 3)
+        return {**self.waiter.summary(), **self.block_stats.to_dict(), **counters, **timings}
+
+def get_cached_place(url, run):
+    """Consulta o cache de lugares antes de abrir os detalhes de um estabelecimento."""
+    if place_cache is None:
+        return None
+    try:
+        result = place_cache.get(url)
+    except Exception as e:
+        logging.error(f"[V2] Erro ao consultar o cache de lugares: {e}")
+        result = None
+    run.increment("cache_hits" if result is not None else "cache_misses")
+    if result is not None:
+        logging.info(f"[V2] Detalhes de '{result['name']}' obtidos do cache.")
+    return result
+
+def store_cached_place(url, result):
+    """Grava no cache de lugares um resultado extraído com sucesso."""
+    if place_cache is None or result is None or result["name"] == "N/A":
+        return
+    try:
+        place_cache.put(url, result)
+    except Exception as e:
+        logging.error(f"[V2] Erro ao gravar no cache de lugares: {e}")
+
+def drop_known_duplicates(listing_urls, run):
+    """Prepara as URLs para a extração usando o índice de lugares.
+
+    Remove as URLs de lugares que o índice associa a outra URL da lista e, para
+    lugares já extraídos por um job anterior, guarda em ``run.reused`` o último
+    resultado do índice, que é entregue sem abrir os detalhes de novo.
+    """
+    if place_index is None or not listing_urls:
+        return listing_urls
+    place_ids = {url: place_id_from_url(url) for url in listing_urls}
+    try:
+        keys = place_index.keys_for(place_ids.values())
+    except Exception as e:
+        logging.error(f"[V2] Erro ao consultar o índice de lugares: {e}")
+        return listing_urls
+    kept = []
+    seen_keys = set()
+    for url in listing_urls:
+        key = keys.get(place_ids[url])
+        # Resultados já extraídos antes da retomada são mantidos
+        if key is not None and key in seen_keys and url not in run.completed:
+            continue
+        if key is not None:
+            seen_keys.add(key)
+        kept.append(url)
+    try:
+        stored = place_index.results_for(keys.get(place_ids[url]) for url in kept if url not in run.completed)
+    except Exception as e:
+        logging.error(f"[V2] Erro ao consultar os resultados do índice de lugares: {e}")
+        stored = {}
+    for url in kept:
+        result = stored.get(keys.get(place_ids[url]))
+        if result is not None and url not in run.completed:
+            run.reused[url] = {**result, "google_maps_url": url}
+    if run.reused:
+        run.increment("index_hits", len(run.reused))
+        logging.info(f"[V2] {len(run.reused)} estabelecimentos já extraídos por buscas anteriores serão reaproveitados do índice.")
+    skipped = len(listing_urls) - len(kept)
+    if skipped:
+        run.increment("duplicates_skipped", skipped)
+        LISTINGS_TOTAL.inc(skipped, outcome="skipped")
+        logging.info(f"[V2] {skipped} estabelecimentos já conhecidos por outra URL foram ignorados antes da extração.")
+    return kept
+
+def remember_place(url, key, result=None):
+    """Associa o identificador do lugar à chave normalizada (e ao resultado) no índice."""
+    if place_index is None:
+        return
     try:
-        import psutil
-        process = psutil.Process()
-        memory_info = process.memory_info()
-        mem_mb = memory_info.rss / 1024 / 1024
-        logging.info(f"Uso de memória atual: {mem_mb:.2f} MB")
-        return mem_mb
-    except ImportError:
-        logging.warning("psutil não instalado. Não é possível verificar o uso de memória.")
-        return 0
+        place_index.add(place_id_from_url(url), key, result)
     except Exception as e:
-        logging.error(f"Erro ao verificar uso de memória: {e}")
-        return 0
+        logging.error(f"[V2] Erro ao gravar no índice de lugares: {e}")
 
-# Função para extrair dados de um elemento usando XPath
-def extract_data(xpath, page, field_name="Dado"):
-    """Extrai texto de um elemento usando XPath, com logging."""
+def _run_tracked(page, run, fn, *args, **kwargs):
+    """Executa uma tarefa do pool associando ao job as requisições e as chamadas ao navegador."""
+    counted_page = IpcCounter(page)
     try:
-        locator = page.locator(xpath)
-        if locator.count() > 0:
-            data = locator.first.inner_text().strip()
-            return data
+        with resource_blocker.track(run.block_stats):
+            return fn(counted_page, *args, **kwargs)
+    finally:
+        run.increment("ipc_calls", counted_page.calls)
+
+def extract_place_counted(page, url):
+    """Extrai os detalhes do estabelecimento e conta as chamadas IPC feitas ao navegador."""
+    counted_page = IpcCounter(page)
+    with LISTING_EXTRACT_SECONDS.time():
+        result = extract_place_details(counted_page, url)
+    logging.info(f"[V2] Detalhes extraídos com {counted_page.calls} chamadas ao navegador.")
+    return result, counted_page.calls
+
+def _extract_from_url(page, index, url, run):
+    """Tarefa do pool: abre a URL do estabelecimento diretamente e extrai os detalhes.
+
+    O governador do navegador define a pausa antes de cada abertura, e o resultado
+    também é informado ao governador do pool, que define quantos navegadores
+    extraem ao mesmo tempo. Após timeout ou página de bloqueio, o item é tentado
+    de novo, já no ritmo reduzido.
+    """
+    waiter = run.waiter
+    governor = governors.get(threading.current_thread().name)
+    pool_governor = governors.get(POOL_GOVERNOR, browser_pool.size)
+    for attempt in range(1 + governors.retries):
+        governor.acquire()
+        outcome = ERROR
+        loaded = False
+        started_at = time.time()
+        try:
+            with PAGE_LOAD_SECONDS.time(page="place"):
+                page.goto(url, timeout=60000)
+            loaded = True
+            page.wait_for_selector(NAME_XPATH, timeout=15000)
+            waiter.after_detail_load(page)
+            LISTING_READY_SECONDS.observe(time.time() - started_at, mode="url")
+            result, round_trips = extract_place_counted(page, url)
+            run.record_listing(time.time() - started_at)
+            store_cached_place(url, result)
+            outcome = OK
+            return result, round_trips
+        except PlaywrightTimeoutError as wait_error:
+            outcome = BLOCKED if detect_block_page(page) else (NO_NAME if loaded else TIMEOUT)
+            logging.error(f"[V2] Timeout ao carregar detalhes do elemento {index+1} ({outcome}): {wait_error}.")
+            ERRORS_TOTAL.inc(stage="detail")
+        finally:
+            governor.release(outcome)
+            pool_governor.record(outcome)
+        if attempt < governors.retries:
+            run.increment("retries")
+            logging.info(f"[V2] Nova tentativa para o elemento {index+1} no ritmo reduzido.")
+    logging.error(f"[V2] Elemento {index+1} não carregou após {1 + governors.retries} tentativas. Pulando item.")
+    return None, 0
+
+def _extract_fast(index, url, run):
+    """Extrai pelo HTML obtido via HTTP; se não conseguir, usa um navegador do pool."""
+    started_at = time.time()
+    result = http_extractor.extract(url)
+    if result is None:
+        run.increment("http_fallbacks")
+        return browser_pool.run(_run_tracked, run, _extract_from_url, index, url, run)
+    run.increment("http_extractions")
+    run.record_listing(time.time() - started_at)
+    store_cached_place(url, result)
+    return result, 0
+
+def extract_details_parallel(listing_urls, on_result, run, workers=DETAIL_WORKERS):
+    """Distribui as URLs coletadas entre os navegadores do pool e extrai os detalhes em paralelo.
+
+    Com a extração via HTTP ativa, cada URL é tentada primeiro pelo HTML, com
+    até ``SCRAPER_HTTP_MAX_CONNECTIONS`` requisições em paralelo. Sem ela, o
+    governador do pool reduz o número de navegadores em uso quando as falhas
+    aumentam e volta a aumentá-lo aos poucos.
+    """
+    pool = browser_pool
+    # O governador do HTTP limita as próprias requisições
+    pool_governor = governors.get(POOL_GOVERNOR, pool.size) if http_extractor is None else None
+    if http_extractor is not None:
+        workers = http_extractor.max_connections
+    workers = max(1, min(workers, len(listing_urls)))
+    in_flight = threading.Semaphore(workers)
+    logging.info(f"[V2] Extraindo {len(listing_urls)} detalhes com até {workers} páginas em paralelo.")
+
+    def on_done(index, future):
+        try:
+            result, round_trips = future.result()
+        except Exception as e:
+            logging.error(f"[V2] Erro ao processar elemento {index+1}: {e}")
+            ERRORS_TOTAL.inc(stage="detail")
+            result, round_trips = None, 0
+        try:
+            on_result(index, result, round_trips)
+        finally:
+            if pool_governor is not None:
+                pool_governor.release()
+            in_flight.release()
+
+    futures = []
+    for index, url in enumerate(listing_urls):
+        known = run.known_result(url)
+        if known is not None:
+            on_result(index, known, 0)
+            continue
+        cached = get_cached_place(url, run)
+        if cached is not None:
+            on_result(index, cached, 0)
+            continue
+        in_flight.acquire()
+        if http_extractor is not None:
+            future = http_extractor.executor.submit(_extract_fast, index, url, run)
         else:
-            return "N/A"
-    except Exception as e:
-        logging.error(f"Erro ao extrair {field_name} com XPath {xpath}: {e}")
-        return "N/A"
+            pool_governor.acquire()
+            future = pool.submit(_run_tracked, run, _extract_from_url, index, url, run)
+        future.add_done_callback(lambda f, index=index: on_done(index, f))
+        futures.append(future)
+    concurrent.futures.wait(futures)
+
+def _search_and_collect(page, search_query, max_results, run, on_click_result=None, shard=None):
+    """Tarefa do pool: faz a busca, rola a lista e retorna as URLs dos estabelecimentos.
+
+    Se ``on_click_result`` for informado, os detalhes também são extraídos aqui,
+    clicando em cada elemento da lista. Com ``shard``, busca apenas a sub-área
+    (pela URL com viewport, se houver) sem alterar o status do job.
+    """
+    status = run.status if shard is None else {}
+    waiter = run.waiter
+    search_started = time.time()
+    if shard is not None and shard.url:
+        logging.info(f"[V2] Abrindo sub-área {shard.label}: {shard.url}")
+        with PAGE_LOAD_SECONDS.time(page="search"):
+            page.goto(shard.url, timeout=60000)
+            waiter.after_goto(page)
+    elif not browser_pool.warm_url:
+        status["progress"] = 10
+        status["message"] = "Acessando Google Maps..."
+        logging.info(f"[V2] Acessando {MAPS_URL}")
+        with PAGE_LOAD_SECONDS.time(page="home"):
+            page.goto(MAPS_URL, timeout=60000)
+            waiter.after_goto(page)
+        logging.info("[V2] Página do Google Maps carregada.")
+    else:
+        logging.info("[V2] Usando página do Google Maps já aquecida pelo pool.")
+
+    if shard is None or not shard.url:
+        status["progress"] = 15
+        status["message"] = f"Buscando por: {search_query}... "
+        logging.info(f"[V2] Preenchendo busca: '{search_query}'")
+        search_input_xpath = '//input[@id="searchboxinput"]'
+        page.locator(search_input_xpath).fill(search_query)
+        waiter.after_fill(page, "#searchboxinput", search_query)
+        page.keyboard.press("Enter")
+        logging.info("[V2] Busca realizada.")
 
-# Função principal de scraping - Versão 2 (baseada em main_improved.py + técnicas do script antigo)
-def scrape_google_maps_v2(search_query, max_results):
-    """Função principal para scraping do Google Maps com hover e clique."""
-    global search_status
-    results = []
-    unique_results_set = set() # Conjunto para rastrear resultados únicos (nome, endereço)
+    try:
+        logging.info("[V2] Aguardando painel de resultados...")
+        page.wait_for_selector(f"{RESULTS_PANEL_XPATH} | {RESULTS_LINK_XPATH}", timeout=45000)
+        logging.info("[V2] Painel de resultados encontrado.")
+        SEARCH_SECONDS.observe(time.time() - search_started)
+        run.add_phase("search", time.time() - search_started)
+        status["message"] = "Resultados encontrados, carregando mais..."
+
+        logging.info("[V2] Aplicando hover no primeiro resultado para focar na lista...")
+        if page.locator(RESULTS_LINK_XPATH).count() > 0:
+            page.locator(RESULTS_LINK_XPATH).first.hover()
+            waiter.after_hover(page)
+        else:
+            logging.warning("[V2] Nenhum link de resultado encontrado para aplicar hover inicial.")
+
+    except PlaywrightTimeoutError as e:
+        logging.error(f"[V2] Não foi possível encontrar resultados iniciais para '{search_query}': {e}")
+        ERRORS_TOTAL.inc(stage="search")
+        governors.get(threading.current_thread().name).record(BLOCKED if detect_block_page(page) else TIMEOUT)
+        status["error"] = f"Não foi possível encontrar resultados para '{search_query}'"
+        return []
+
+    status["progress"] = 20
+    status["message"] = "Carregando resultados..."
+    logging.info("[V2] Iniciando rolagem para carregar mais resultados...")
+
+    harvester = FeedHarvester(page, RESULTS_LINK_XPATH)
+    harvester.harvest()
+    scroll_started = time.time()
+    scroll_attempts = 0
+    max_scroll_attempts = 100
+    no_new_results_streak = 0
+    max_no_new_results_streak = 5
+
+    scroll_target = page.locator(SCROLLABLE_ELEMENT_XPATH).first if page.locator(SCROLLABLE_ELEMENT_XPATH).count() > 0 else page
+    if scroll_target == page: logging.warning("[V2] Painel de rolagem específico não encontrado, rolando a página inteira.")
+    else: logging.info("[V2] Painel de rolagem específico encontrado.")
+
+    while len(harvester.entries) < max_results and scroll_attempts < max_scroll_attempts:
+        logging.info(f"[V2] Tentativa de rolagem {scroll_attempts + 1}/{max_scroll_attempts}")
+        iteration_started = time.time()
+        if scroll_target != page:
+            scroll_target.evaluate("node => node.scrollTop = node.scrollHeight")
+        else:
+            page.mouse.wheel(0, 10000)
+        waiter.after_scroll(page, RESULTS_LINK_XPATH, harvester.link_count)
 
-    logging.info(f"[V2] Iniciando scraping para: '{search_query}', max_results={max_results}")
-    search_status['unique_results'] = 0
+        newly_found_count = len(harvester.harvest())
+        current_url_count = len(harvester.entries)
+        SCROLL_ITERATION_SECONDS.observe(time.time() - iteration_started)
+
+        logging.info(f"[V2] Rolagem {scroll_attempts + 1}: {harvester.link_count} links na lista. Total único até agora: {current_url_count}. Novos nesta rolagem: {newly_found_count}")
+
+        status["message"] = f"Encontrados {current_url_count} resultados únicos (URLs) até agora..."
 
-    with sync_playwright() as p:
-        search_status["progress"] = 5
-        search_status["message"] = "Iniciando navegador..."
-        logging.info("[V2] Iniciando navegador Playwright...")
+        if current_url_count >= max_results:
+            logging.info(f"[V2] Limite de {max_results} URLs únicos atingido durante a rolagem.")
+            break
 
+        if newly_found_count == 0:
+            no_new_results_streak += 1
+            logging.warning(f"[V2] Nenhum URL novo encontrado nesta rolagem (sequência: {no_new_results_streak}/{max_no_new_results_streak}).")
+            if no_new_results_streak >= max_no_new_results_streak:
+                logging.info("[V2] Parando rolagem devido à falta de novos URLs em tentativas consecutivas.")
+                break
+        else:
+            no_new_results_streak = 0
+
+        scroll_attempts += 1
+        waiter.between_scrolls(page)
+
+    run.add_phase("scroll", time.time() - scroll_started)
+    logging.info(f"[V2] Rolagem concluída. {len(harvester.entries)} URLs únicos encontrados em {harvester.calls} leituras da lista.")
+    if harvester.duplicates:
+        run.increment("duplicates_skipped", harvester.duplicates)
+        LISTINGS_TOTAL.inc(harvester.duplicates, outcome="skipped")
+        logging.info(f"[V2] {harvester.duplicates} links repetidos para o mesmo lugar descartados durante a rolagem.")
+
+    listing_urls = harvester.urls
+    if len(listing_urls) > max_results:
+        logging.info(f"[V2] Limitando {len(listing_urls)} URLs encontrados para os {max_results} solicitados.")
+        listing_urls = listing_urls[:max_results]
+    if shard is not None:
+        return listing_urls
+    run.record_urls(listing_urls)
+    listing_urls = drop_known_duplicates(listing_urls, run)
+
+    if on_click_result is None:
+        return listing_urls
+
+    # Localiza cada elemento da lista pelo href coletado; a consulta só ocorre no clique
+    listings_elements = [page.locator(f"a[href={json.dumps(url)}]").first for url in listing_urls]
+    total_elements_to_process = len(listings_elements)
+    status["total_found"] = total_elements_to_process
+    status["message"] = f"Coletando detalhes para {total_elements_to_process} estabelecimentos via clique..."
+    logging.info(f"[V2] Iniciando extração de detalhes para {total_elements_to_process} elementos via clique.")
+
+    details_started = time.time()
+    previous_name = ""
+    governor = governors.get(threading.current_thread().name)
+    for i, listing_element in enumerate(listings_elements):
+        logging.info(f"--- [V2] Processando Elemento {i+1}/{total_elements_to_process} --- ")
+        result = None
+        round_trips = 0
+
+        known = run.known_result(listing_urls[i])
+        if known is not None:
+            on_click_result(i, known, total_elements_to_process, 0)
+            continue
+        cached = get_cached_place(listing_urls[i], run)
+        if cached is not None:
+            on_click_result(i, cached, total_elements_to_process, 0)
+            continue
+
+        governor.acquire()
+        outcome = ERROR
         try:
-            browser = p.chromium.launch(headless=True)
-            context = browser.new_context(
-                user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+            logging.info(f"[V2] Clicando no elemento {i+1}...")
+            listing_started = time.time()
+            previous_url = page.url
+            listing_element.click()
+            waiter.after_click(page, NAME_XPATH, previous_name, previous_url, listing_urls[i])
+
+            try:
+                # As duas esperas dividem o mesmo limite de DETAIL_TIMEOUT_MS
+                remaining_ms = max(1, DETAIL_TIMEOUT_MS - int((time.time() - listing_started) * 1000))
+                page.wait_for_selector(NAME_XPATH, timeout=remaining_ms)
+                logging.info(f"[V2] Detalhes do elemento {i+1} carregados (nome encontrado).")
+                waiter.after_detail_load(page)
+                LISTING_READY_SECONDS.observe(time.time() - listing_started, mode="click")
+                result, round_trips = extract_place_counted(page, listing_urls[i])
+                run.record_listing(time.time() - listing_started)
+                previous_name = result["name"]
+                store_cached_place(listing_urls[i], result)
+                outcome = OK
+            except PlaywrightTimeoutError as wait_error:
+                outcome = BLOCKED if detect_block_page(page) else NO_NAME
+                logging.error(f"[V2] Erro ao esperar pelos detalhes do elemento {i+1} após clique ({outcome}): {wait_error}. Pulando item.")
+                ERRORS_TOTAL.inc(stage="detail")
+
+        except Exception as e:
+            logging.error(f"[V2] Erro GERAL ao processar elemento {i+1}: {e}")
+            ERRORS_TOTAL.inc(stage="detail")
+            traceback.print_exc()
+        finally:
+            governor.release(outcome)
+
+        on_click_result(i, result, total_elements_to_process, round_trips)
+        browser_pool.count_use()
+        if i + 1 < total_elements_to_process and browser_pool.should_recycle():
+            # O restante é aberto pela URL, em tarefas que já usam o navegador reciclado
+            logging.info(f"[V2] Navegador precisa ser reciclado após {i+1} elementos. Continuando pela URL dos demais.")
+            run.click_stopped_at = i + 1
+            break
+        if result is None:
+            continue
+
+        waiter.between_items(page)
+
+    run.add_phase("details", time.time() - details_started)
+    return listing_urls
+
+class ShardCollection:
+    """Estado da busca dividida em sub-áreas: shards pendentes e URLs únicas já coletadas.
+
+    Usado pelas versões síncrona e assíncrona da busca; quem a conduz retira os
+    shards com ``next_shard`` e entrega as URLs de cada um com ``add``.
+    """
+
+    def __init__(self, shards, max_results, run):
+        self.run = run
+        self.max_results = max_results
+        self.all_shards = list(shards)
+        self.pending = list(shards)
+        self.listing_urls = []
+        self.url_shards = {}
+        self.seen_places = set()
+        self.searched = 0
+        self.shard_limit = min(FEED_CAP, max_results)
+        logging.info(f"[V2] Busca dividida em {len(shards)} sub-áreas.")
+
+    def can_start(self, in_flight, capacity):
+        return bool(self.pending) and in_flight < capacity and len(self.listing_urls) < self.max_results
+
+    def next_shard(self):
+        return self.pending.pop(0)
+
+    def add(self, shard, shard_urls, error=None):
+        """Junta as URLs de um shard buscado e subdivide as células que atingiram o limite."""
+        self.searched += 1
+        if error is not None:
+            logging.error(f"[V2] Erro ao buscar a sub-área {shard.label}: {error}")
+            shard.error = str(error)
+            shard_urls = []
+        shard.found = len(shard_urls)
+        for url in shard_urls:
+            place_key = place_id_from_url(url) or url
+            if place_key in self.seen_places:
+                continue
+            self.seen_places.add(place_key)
+            self.listing_urls.append(url)
+            self.url_shards[url] = shard
+            shard.new_urls += 1
+        shard.capped = shard.found >= min(SHARD_CAP, self.shard_limit)
+        if shard.capped and shard.can_subdivide and shard.depth < SHARD_MAX_DEPTH and len(self.listing_urls) < self.max_results:
+            children = shard.subdivide()
+            self.pending.extend(children)
+            self.all_shards.extend(children)
+            logging.info(f"[V2] Sub-área {shard.label} atingiu o limite ({shard.found} lugares). Subdividindo em {len(children)}.")
+        logging.info(f"[V2] Sub-área {shard.label}: {shard.found} lugares, {shard.new_urls} novos. Total único: {len(self.listing_urls)}.")
+
+    def update_status(self):
+        status = self.run.status
+        status["progress"] = 5 + int((self.searched / len(self.all_shards)) * 25)
+        status["message"] = f"Buscando em sub-áreas ({self.searched}/{len(self.all_shards)}): {len(self.listing_urls)} estabelecimentos únicos até agora..."
+        status["shards"] = [shard.to_dict() for shard in self.all_shards]
+
+    def result(self):
+        """URLs únicas na ordem em que foram encontradas, o shard de origem de cada uma e todos os shards."""
+        if self.pending:
+            logging.info(f"[V2] Limite de {self.max_results} URLs atingido; {len(self.pending)} sub-áreas não foram buscadas.")
+        return self.listing_urls[:self.max_results], self.url_shards, self.all_shards
+
+def collect_sharded_urls(shards, max_results, run):
+    """Busca as sub-áreas em paralelo nos navegadores do pool e junta as URLs coletadas.
+
+    Células da grade que atingem o limite da lista são subdivididas. Retorna as
+    URLs únicas, na ordem em que foram encontradas, o shard de origem de cada uma
+    e todos os shards (incluindo os criados por subdivisão).
+    """
+    collection = ShardCollection(shards, max_results, run)
+    in_flight = {}
+
+    while collection.pending or in_flight:
+        while collection.can_start(len(in_flight), browser_pool.size):
+            shard = collection.next_shard()
+            future = browser_pool.submit(
+                _run_tracked, run, _search_and_collect, shard.query, collection.shard_limit, run,
+                shard=shard, needs_home=not shard.url
             )
-            page = context.new_page()
-            logging.info("[V2] Navegador e página criados.")
-
-            search_status["progress"] = 10
-            search_status["message"] = "Acessando Google Maps..."
-            logging.info("[V2] Acessando https://www.google.com/maps")
-            page.goto("https://www.google.com/maps", timeout=60000)
-            page.wait_for_timeout(5000)
-            logging.info("[V2] Página do Google Maps carregada.")
-
-            search_status["progress"] = 15
-            search_status["message"] = f"Buscando por: {search_query}... "
-            logging.info(f"[V2] Preenchendo busca: '{search_query}'")
-            search_input_xpath = '//input[@id="searchboxinput"]'
-            page.locator(search_input_xpath).fill(search_query)
-            page.wait_for_timeout(1000)
-            page.keyboard.press("Enter")
-            logging.info("[V2] Busca realizada.")
-
-            results_link_xpath = '//a[contains(@href, "https://www.google.com/maps/place")]'
-            results_panel_xpath = '//div[contains(@aria-label, "Resultados para")]'
+            in_flight[future] = shard
+        if not in_flight:
+            break
 
+        done, _ = concurrent.futures.wait(in_flight, return_when=concurrent.futures.FIRST_COMPLETED)
+        for future in done:
+            shard = in_flight.pop(future)
             try:
-                logging.info("[V2] Aguardando painel de resultados...")
-                page.wait_for_selector(f"{results_panel_xpath} | {results_link_xpath}", timeout=45000)
-                logging.info("[V2] Painel de resultados encontrado.")
-                search_status["message"] = "Resultados encontrados, carregando mais..."
-
-                logging.info("[V2] Aplicando hover no primeiro resultado para focar na lista...")
-                if page.locator(results_link_xpath).count() > 0:
-                    page.locator(results_link_xpath).first.hover()
-                    page.wait_for_timeout(500)
+                collection.add(shard, future.result())
+            except Exception as e:
+                collection.add(shard, [], error=e)
+        collection.update_status()
+
+    return collection.result()
+
+class ResultCollector:
+    """Deduplica os resultados extraídos de um job e atualiza o progresso no status.
+
+    ``register`` pode ser chamado de várias threads (extração paralela) ou do
+    event loop do motor assíncrono.
+    """
+
+    def __init__(self, status, run, on_result=None):
+        self.status = status
+        self.run = run
+        self.on_result = on_result
+        # Com on_result, quem chama guarda os resultados; aqui só são contados
+        self.results = ResultStore()
+        self.unique_count = 0
+        self.unique_keys = set() # Chaves normalizadas (nome + endereço ou telefone) dos resultados únicos
+        self.processed = 0
+        self.extracted = 0
+        # Shard de origem de cada URL, na busca dividida em sub-áreas
+        self.url_shards = {}
+        self.shards = None
+        self._lock = threading.Lock()
+
+    def register(self, index, result, total, round_trips=0):
+        """Deduplica e adiciona um resultado extraído, atualizando o progresso."""
+        status = self.status
+        run = self.run
+        with self._lock:
+            self.processed += 1
+            status["progress"] = 30 + int((self.processed / total) * 65)
+            status["message"] = f"Coletando dados ({self.processed}/{total})..."
+            if result is None:
+                LISTINGS_TOTAL.inc(outcome="failed")
+                return
+            if round_trips:
+                # Resultados vindos do cache não passam pelo navegador
+                self.extracted += 1
+                status['extraction_round_trips'] += round_trips
+                status['avg_round_trips_per_listing'] = round(status['extraction_round_trips'] / self.extracted, 1)
+            status.update(run.summary())
+            name = result["name"]
+            address = result["address"]
+            unique_key = dedupe_key(result)
+
+            if name != "N/A":
+                run.record_result(result)
+                remember_place(result.get("google_maps_url"), unique_key, result)
+
+            if name != "N/A" and unique_key not in self.unique_keys:
+                self.unique_keys.add(unique_key)
+                self.unique_count += 1
+                status['unique_results'] = self.unique_count
+                shard = self.url_shards.get(result.get("google_maps_url"))
+                if shard is not None:
+                    shard.unique_results += 1
+                    status["shards"] = [shard.to_dict() for shard in self.shards]
+                if self.on_result is not None:
+                    self.on_result(result)
                 else:
-                    logging.warning("[V2] Nenhum link de resultado encontrado para aplicar hover inicial.")
-
-            except PlaywrightTimeoutError as e:
-                logging.error(f"[V2] Não foi possível encontrar resultados iniciais para '{search_query}': {e}")
-                search_status["error"] = f"Não foi possível encontrar resultados para '{search_query}'"
-                browser.close()
-                return []
-
-            search_status["progress"] = 20
-            search_status["message"] = "Carregando resultados..."
-            logging.info("[V2] Iniciando rolagem para carregar mais resultados...")
-
-            collected_urls_for_scroll_control = set()
-            previously_counted_urls = 0
-            scroll_attempts = 0
-            max_scroll_attempts = 100
-            no_new_results_streak = 0
-            max_no_new_results_streak = 5
+                    self.results.append(result)
+                LISTINGS_TOTAL.inc(outcome="unique")
+                logging.info(f"[V2] Adicionado resultado único: {name} ({address})")
+            elif name != "N/A":
+                 LISTINGS_TOTAL.inc(outcome="duplicate")
+                 logging.warning(f"[V2] Resultado duplicado encontrado e ignorado: {name} ({address})")
+            else:
+                 LISTINGS_TOTAL.inc(outcome="no_name")
+                 logging.warning(f"[V2] Resultado sem nome encontrado e ignorado (Elemento {index+1}).")
 
-            scrollable_element_xpath = '//div[contains(@aria-label, "Resultados para")]/..//div[@role="feed"]'
-            scroll_target = page.locator(scrollable_element_xpath).first if page.locator(scrollable_element_xpath).count() > 0 else page
-            if scroll_target == page: logging.warning("[V2] Painel de rolagem específico não encontrado, rolando a página inteira.")
-            else: logging.info("[V2] Painel de rolagem específico encontrado.")
+def _start_scrape(search_query, max_results, status, wait_mode, on_result, journal, checkpoint):
+    """Estado inicial comum às versões síncrona e assíncrona da coleta."""
+    logging.info(f"[V2] Iniciando scraping para: '{search_query}', max_results={max_results}")
+    status['unique_results'] = 0
+    status['extraction_round_trips'] = 0
+    status['avg_round_trips_per_listing'] = 0
+    run = ScrapeRun(status, wait_mode, journal, checkpoint)
+    status.update(run.summary())
+    return run, ResultCollector(status, run, on_result)
+
+def _finish_scrape(run, collector):
+    status = run.status
+    status.update(run.summary())
+    logging.info(f"[V2] Requisições bloqueadas: {run.block_stats.blocked} (~{run.block_stats.estimated_saved_bytes / 1024 / 1024:.1f} MB economizados).")
+    logging.info(f"[V2] Scraping finalizado. {collector.unique_count} resultados únicos coletados. Tempo em esperas ({run.waiter.mode}): {run.waiter.total_seconds:.2f}s.")
+    status['unique_results'] = collector.unique_count
+    return collector.results
 
-            while scroll_attempts < max_scroll_attempts:
-                logging.info(f"[V2] Tentativa de rolagem {scroll_attempts + 1}/{max_scroll_attempts}")
-                if scroll_target != page:
-                    scroll_target.evaluate("node => node.scrollTop = node.scrollHeight")
-                else:
-                    page.mouse.wheel(0, 10000)
-                page.wait_for_timeout(3000)
-
-                current_links_elements = page.locator(results_link_xpath).all()
-                current_urls_for_control = set()
-                for link in current_links_elements:
-                    try:
-                        href = link.get_attribute('href')
-                        if href and "https://www.google.com/maps/place" in href:
-                            current_urls_for_control.add(href)
-                    except Exception: continue
-
-                newly_found_count = len(current_urls_for_control - collected_urls_for_scroll_control)
-                total_unique_found_urls = len(collected_urls_for_scroll_control.union(current_urls_for_control))
-
-                logging.info(f"[V2] Rolagem {scroll_attempts + 1}: Encontrados {len(current_urls_for_control)} URLs visíveis. Total único até agora: {total_unique_found_urls}. Novos nesta rolagem: {newly_found_count}")
-
-                collected_urls_for_scroll_control.update(current_urls_for_control)
-                current_url_count = len(collected_urls_for_scroll_control)
-
-                search_status["message"] = f"Encontrados {current_url_count} resultados únicos (URLs) até agora..."
-
-                if current_url_count >= max_results:
-                    logging.info(f"[V2] Limite de {max_results} URLs únicos atingido durante a rolagem.")
-                    break
-
-                if newly_found_count == 0:
-                    no_new_results_streak += 1
-                    logging.warning(f"[V2] Nenhum URL novo encontrado nesta rolagem (sequência: {no_new_results_streak}/{max_no_new_results_streak}).")
-                    if no_new_results_streak >= max_no_new_results_streak:
-                        logging.info("[V2] Parando rolagem devido à falta de novos URLs em tentativas consecutivas.")
-                        break
-                else:
-                    no_new_results_streak = 0
-
-                previously_counted_urls = current_url_count
-                scroll_attempts += 1
-                page.wait_for_timeout(500)
-
-            logging.info(f"[V2] Rolagem concluída. {len(collected_urls_for_scroll_control)} URLs únicos encontrados para controle.")
-
-            logging.info("[V2] Coletando elementos finais da lista para processamento por clique...")
-            listings_elements = page.locator(results_link_xpath).all()
-
-            if len(listings_elements) > max_results:
-                logging.info(f"[V2] Limitando {len(listings_elements)} elementos visíveis para os {max_results} solicitados.")
-                listings_elements = listings_elements[:max_results]
-
-            total_elements_to_process = len(listings_elements)
-            search_status["total_found"] = total_elements_to_process
-            search_status["message"] = f"Coletando detalhes para {total_elements_to_process} estabelecimentos via clique..."
-            logging.info(f"[V2] Iniciando extração de detalhes para {total_elements_to_process} elementos via clique.")
-
-            for i, listing_element in enumerate(listings_elements):
-                progress = 30 + int((i / total_elements_to_process) * 65)
-                search_status["progress"] = progress
-                search_status["message"] = f"Coletando dados ({i+1}/{total_elements_to_process})..."
-                logging.info(f"--- [V2] Processando Elemento {i+1}/{total_elements_to_process} --- ")
-
-                try:
-                    logging.info(f"[V2] Clicando no elemento {i+1}...")
-                    listing_element.click()
-
-                    name_xpath = '//h1[contains(@class, "DUwDvf")] | //h1[contains(@class, "fontHeadlineLarge")]'
-                    try:
-                        page.wait_for_selector(name_xpath, timeout=15000)
-                        logging.info(f"[V2] Detalhes do elemento {i+1} carregados (nome encontrado).")
-                    except PlaywrightTimeoutError as wait_error:
-                        logging.error(f"[V2] Erro ao esperar pelos detalhes do elemento {i+1} após clique: {wait_error}. Pulando item.")
-                        continue
-
-                    page.wait_for_timeout(1500)
-
-                    place_type_xpath = '//button[contains(@jsaction, "category")]'
-                    address_xpath = '//button[@data-item-id="address"]//div[contains(@class, "fontBodyMedium")]'
-                    phone_xpath = '//button[contains(@data-item-id, "phone:tel:")]//div[contains(@class, "fontBodyMedium")]'
-                    website_xpath = '//a[@data-item-id="authority"]//div[contains(@class, "fontBodyMedium")]'
-                    opening_hours_xpath = '//div[contains(@aria-label, "Horário")] | //button[contains(@data-item-id, "oh")]'
-                    intro_xpath = '//div[contains(@class, "WeS02d")]//div[contains(@class, "PYvSYb")]'
-                    reviews_xpath = '//div[contains(@class, "F7nice")]'
-                    info_xpath_base = '//div[contains(@class, "LTs0Rc")] | //div[contains(@class, "iP2t7d")]'
-
-                    name = extract_data(name_xpath, page, "Nome")
-                    place_type = extract_data(place_type_xpath, page, "Tipo")
-                    address = extract_data(address_xpath, page, "Endereço")
-                    phone = extract_data(phone_xpath, page, "Telefone")
-                    website = extract_data(website_xpath, page, "Website")
-                    opening_hours = extract_data(opening_hours_xpath, page, "Horário")
-                    intro = extract_data(intro_xpath, page, "Introdução")
-
-                    rev_count = "N/A"
-                    rev_avg = "N/A"
-                    try:
-                        if page.locator(reviews_xpath).count() > 0:
-                            review_locator = page.locator(reviews_xpath).first
-                            review_text = review_locator.inner_text()
-                            parts = review_text.split()
-                            if parts:
-                                try: rev_avg = float(parts[0].replace(",", "."))
-                                except (ValueError, IndexError): rev_avg = "N/A"
-                                try:
-                                    count_part = next((p.strip("()").replace(".", "").replace(",", "") for p in parts if p.startswith("(")), None)
-                                    if count_part and count_part.isdigit(): rev_count = int(count_part)
-                                    elif len(parts) > 1 and parts[1].replace(".", "").replace(",", "").isdigit(): rev_count = int(parts[1].replace(".", "").replace(",", ""))
-                                    else:
-                                        count_span_xpath = reviews_xpath + '//span[contains(@aria-label, "avaliaç")]'
-                                        if page.locator(count_span_xpath).count() > 0:
-                                            aria_label = page.locator(count_span_xpath).first.get_attribute("aria-label")
-                                            count_part_aria = aria_label.split()[0].replace(".", "").replace(",", "")
-                                            if count_part_aria.isdigit(): rev_count = int(count_part_aria)
-                                            else: rev_count = "N/A"
-                                        else: rev_count = "N/A"
-                                except (ValueError, IndexError, AttributeError) as rev_e:
-                                    logging.warning(f"[V2] Não foi possível extrair contagem de avaliações de '{review_text}': {rev_e}")
-                                    rev_count = "N/A"
-                        else: logging.warning("[V2] Bloco de avaliações não encontrado.")
-                    except Exception as e_rev: logging.error(f"[V2] Erro ao processar bloco de avaliações: {e_rev}")
-
-                    store_shopping = False
-                    in_store_pickup = False
-                    delivery = False
-                    try:
-                        info_elements = page.locator(info_xpath_base).all()
-                        for info_element in info_elements:
-                            info_text = info_element.inner_text().lower()
-                            if "compra" in info_text or "shop" in info_text: store_shopping = True
-                            if "retira" in info_text or "pickup" in info_text: in_store_pickup = True
-                            if "entrega" in info_text or "delivery" in info_text: delivery = True
-                    except Exception as e_info: logging.error(f"[V2] Erro ao extrair informações de serviço: {e_info}")
-
-                    unique_key = (name, address if address != "N/A" else phone)
-
-                    if name != "N/A" and unique_key not in unique_results_set:
-                        try: current_url = listing_element.get_attribute('href')
-                        except Exception: current_url = "N/A"
-
-                        result = {
-                            "name": name,
-                            "type": place_type,
-                            "address": address,
-                            "phone": phone,
-                            "website": website,
-                            "opening_hours": opening_hours,
-                            "average_rating": rev_avg,
-                            "review_count": rev_count,
-                            "introduction": intro,
-                            "store_shopping": store_shopping,
-                            "in_store_pickup": in_store_pickup,
-                            "delivery": delivery,
-                            "google_maps_url": current_url
-                        }
-                        results.append(result)
-                        unique_results_set.add(unique_key)
-                        search_status['unique_results'] = len(results)
-                        logging.info(f"[V2] Adicionado resultado único: {name} ({address})")
-                    elif name != "N/A":
-                         logging.warning(f"[V2] Resultado duplicado encontrado e ignorado: {name} ({address})")
-                    else:
-                         logging.warning(f"[V2] Resultado sem nome encontrado e ignorado (Elemento {i+1}).")
-
-                except Exception as e:
-                    logging.error(f"[V2] Erro GERAL ao processar elemento {i+1}: {e}")
-                    traceback.print_exc()
-                    continue
-
-                page.wait_for_timeout(500)
-                check_memory_usage()
-
-            search_status["progress"] = 95
-            search_status["message"] = "Finalizando coleta de dados..."
-            logging.info("[V2] Extração de detalhes por clique concluída.")
+# Função principal de scraping - Versão 2 (baseada em main_improved.py + técnicas do script antigo)
+def scrape_google_maps_v2(search_query, max_results, status, wait_mode=None, on_result=None,
+                          journal=None, checkpoint=None, shards=None):
+    """Função principal para scraping do Google Maps, usando navegadores do pool.
+
+    ``on_result`` é chamado com cada resultado único assim que ele é extraído;
+    nesse caso os resultados ficam com quem chama e o armazenamento retornado
+    fica vazio (o total está em ``status['unique_results']``).
+    Com ``journal``, as URLs coletadas e cada resultado são gravados em disco;
+    com ``checkpoint``, a coleta continua de onde o diário parou. Com ``shards``,
+    a busca é feita em cada sub-área e as URLs são combinadas antes da extração.
+    """
+    run, collector = _start_scrape(search_query, max_results, status, wait_mode, on_result, journal, checkpoint)
+    register_result = collector.register
+
+    status["progress"] = 5
+    status["message"] = "Aguardando navegador disponível..."
+    logging.info("[V2] Solicitando navegador ao pool...")
 
+    try:
+        parallel = DETAIL_WORKERS > 1 or http_extractor is not None
+        if checkpoint is not None and checkpoint.urls is not None:
+            # A lista já foi coletada: abre diretamente os estabelecimentos restantes
+            listing_urls = drop_known_duplicates(checkpoint.urls[:max_results], run)
+            parallel = True
+            logging.info(f"[V2] Retomando coleta: {len(run.completed)} de {len(listing_urls)} estabelecimentos já extraídos.")
+        elif shards:
+            listing_urls, collector.url_shards, collector.shards = collect_sharded_urls(shards, max_results, run)
+            run.record_urls(listing_urls)
+            listing_urls = drop_known_duplicates(listing_urls, run)
+            parallel = True
+        else:
+            listing_urls = browser_pool.run(
+                _run_tracked, run, _search_and_collect, search_query, max_results, run,
+                on_click_result=None if parallel else register_result,
+                needs_home=True
+            )
+            if run.click_stopped_at is not None:
+                # A extração por clique parou para reciclar o navegador: os demais são abertos pela URL
+                offset = run.click_stopped_at
+                total_elements_to_process = len(listing_urls)
+                details_started = time.time()
+                extract_details_parallel(
+                    listing_urls[offset:],
+                    lambda index, result, round_trips: register_result(offset + index, result, total_elements_to_process, round_trips),
+                    run
+                )
+                run.add_phase("details", time.time() - details_started)
+
+        if parallel and listing_urls:
+            total_elements_to_process = len(listing_urls)
+            status["total_found"] = total_elements_to_process
+            status["message"] = f"Coletando detalhes para {total_elements_to_process} estabelecimentos em paralelo..."
+            logging.info(f"[V2] Iniciando extração paralela de detalhes para {total_elements_to_process} URLs.")
+            details_started = time.time()
+            extract_details_parallel(
+                listing_urls,
+                lambda index, result, round_trips: register_result(index, result, total_elements_to_process, round_trips),
+                run
+            )
+            run.add_phase("details", time.time() - details_started)
+
+        status["progress"] = 95
+        status["message"] = "Finalizando coleta de dados..."
+        logging.info("[V2] Extração de detalhes concluída.")
+
+    except Exception as e:
+        logging.error(f"[V2] Erro fatal durante o scraping: {e}")
+        ERRORS_TOTAL.inc(stage="scrape")
+        status["error"] = f"Erro durante a coleta: {str(e)}"
+        status["message"] = f"Erro durante a coleta: {str(e)}"
+        traceback.print_exc()
+
+    return _finish_scrape(run, collector)
+
+async def _collect_sharded_urls_async(shards, max_results, run):
+    """Versão assíncrona de ``collect_sharded_urls``: uma página do motor por sub-área."""
+    collection = ShardCollection(shards, max_results, run)
+    in_flight = {}
+
+    async def search(shard):
+        async with async_engine.page(run.block_stats) as page:
+            return await search_and_collect_async(
+                page, shard.query, collection.shard_limit, run, {}, RESULTS_PANEL_XPATH, RESULTS_LINK_XPATH,
+                SCROLLABLE_ELEMENT_XPATH, shard=shard
+            )
+
+    while collection.pending or in_flight:
+        while collection.can_start(len(in_flight), async_engine.max_pages):
+            shard = collection.next_shard()
+            in_flight[asyncio.ensure_future(search(shard))] = shard
+        if not in_flight:
+            break
+        done, _ = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            shard = in_flight.pop(task)
+            if task.exception() is not None:
+                collection.add(shard, [], error=task.exception())
+            else:
+                collection.add(shard, task.result())
+        collection.update_status()
+
+    return collection.result()
+
+async def _extract_details_async(listing_urls, on_result, run):
+    """Extrai os detalhes de todas as URLs, limitadas pelo número de páginas do motor assíncrono.
+
+    O cache, o índice de lugares e o diário usam SQLite: essas chamadas (inclusive
+    ``on_result``) rodam em threads, para não travar as demais páginas do loop.
+    """
+    logging.info(f"[V2] Extraindo {len(listing_urls)} detalhes com até {async_engine.max_pages} páginas assíncronas.")
+
+    async def extract(index, url):
+        known = run.known_result(url)
+        if known is not None:
+            await asyncio.to_thread(on_result, index, known, 0)
+            return
+        cached = await asyncio.to_thread(get_cached_place, url, run)
+        if cached is not None:
+            await asyncio.to_thread(on_result, index, cached, 0)
+            return
+        try:
+            result = None
+            if http_extractor is not None:
+                started_at = time.time()
+                result = await asyncio.get_running_loop().run_in_executor(
+                    http_extractor.executor, http_extractor.extract, url
+                )
+                if result is not None:
+                    run.increment("http_extractions")
+                    run.record_listing(time.time() - started_at)
+                    round_trips = 0
+                else:
+                    run.increment("http_fallbacks")
+            if result is None:
+                async with async_engine.page(run.block_stats) as page:
+                    governor = governors.get(async_engine.context_name(page), async_engine.pages_per_context)
+                    result, round_trips = await extract_from_url_async(page, index, url, run, governor, governors.retries)
+            await asyncio.to_thread(store_cached_place, url, result)
         except Exception as e:
-            logging.error(f"[V2] Erro fatal durante o scraping: {e}")
-            search_status["error"] = f"Erro durante a coleta: {str(e)}"
-            search_status["message"] = f"Erro durante a coleta: {str(e)}"
-            traceback.print_exc()
-        finally:
-            if 'browser' in locals() and browser.is_connected():
-                logging.info("[V2] Fechando navegador...")
-                browser.close()
-                logging.info("[V2] Navegador fechado.")
+            logging.error(f"[V2] Erro ao processar elemento {index+1}: {e}")
+            ERRORS_TOTAL.inc(stage="detail")
+            result, round_trips = None, 0
+        await asyncio.to_thread(on_result, index, result, round_trips)
+
+    await asyncio.gather(*(extract(index, url) for index, url in enumerate(listing_urls)))
+
+async def scrape_google_maps_async(search_query, max_results, status, wait_mode=None, on_result=None,
+                                   journal=None, checkpoint=None, shards=None):
+    """Contraparte assíncrona de ``scrape_google_maps_v2``, executada no motor assíncrono.
+
+    Recebe os mesmos parâmetros e produz os mesmos resultados. A busca abre a URL
+    de busca do Maps diretamente e os detalhes são sempre extraídos pela URL, em
+    paralelo, em vez de por clique.
+    """
+    run, collector = _start_scrape(search_query, max_results, status, wait_mode, on_result, journal, checkpoint)
+    status["progress"] = 5
+    status["message"] = "Aguardando página disponível..."
+
+    try:
+        if checkpoint is not None and checkpoint.urls is not None:
+            listing_urls = await asyncio.to_thread(drop_known_duplicates, checkpoint.urls[:max_results], run)
+            logging.info(f"[V2] Retomando coleta: {len(run.completed)} de {len(listing_urls)} estabelecimentos já extraídos.")
+        else:
+            if shards:
+                listing_urls, collector.url_shards, collector.shards = await _collect_sharded_urls_async(shards, max_results, run)
             else:
-                 logging.info("[V2] Navegador já estava fechado ou não foi iniciado.")
+                async with async_engine.page(run.block_stats) as page:
+                    listing_urls = await search_and_collect_async(
+                        page, search_query, max_results, run, status, RESULTS_PANEL_XPATH, RESULTS_LINK_XPATH,
+                        SCROLLABLE_ELEMENT_XPATH
+                    )
+            await asyncio.to_thread(run.record_urls, listing_urls)
+            listing_urls = await asyncio.to_thread(drop_known_duplicates, listing_urls, run)
+
+        if listing_urls:
+            total_elements_to_process = len(listing_urls)
+            status["total_found"] = total_elements_to_process
+            status["message"] = f"Coletando detalhes para {total_elements_to_process} estabelecimentos em paralelo..."
+            details_started = time.time()
+            await _extract_details_async(
+                listing_urls,
+                lambda index, result, round_trips: collector.register(index, result, total_elements_to_process, round_trips),
+                run
+            )
+            run.add_phase("details", time.time() - details_started)
 
-    logging.info(f"[V2] Scraping finalizado. {len(results)} resultados únicos coletados.")
-    search_status['unique_results'] = len(results)
-    return results
+        status["progress"] = 95
+        status["message"] = "Finalizando coleta de dados..."
+        logging.info("[V2] Extração de detalhes concluída.")
 
-def run_scraper(establishment_type, location, max_results):
-    global search_results, search_params, search_status
+    except Exception as e:
+        logging.error(f"[V2] Erro fatal durante o scraping: {e}")
+        ERRORS_TOTAL.inc(stage="scrape")
+        status["error"] = f"Erro durante a coleta: {str(e)}"
+        status["message"] = f"Erro durante a coleta: {str(e)}"
+        traceback.print_exc()
+
+    return _finish_scrape(run, collector)
+
+def run_scraper(job):
+    """Executa a coleta de um job, atualizando seu status e resultados."""
+    status = job.status
+    establishment_type = job.params["establishment_type"]
+    location = job.params["location"]
+    max_results = job.params["max_results"]
     start_time = time.time()
-    logging.info(f"[V2] Iniciando thread de scraping para: {establishment_type} em {location}, max: {max_results}")
+    logging.info(f"[V2] Iniciando job {job.id} de scraping para: {establishment_type} em {location}, max: {max_results}")
 
+    checkpoint = journal_store.load(job.id) if journal_store else None
     try:
-        search_status['is_running'] = True
-        search_status['progress'] = 0
-        search_status['message'] = "Iniciando coleta..."
-        search_status['error'] = None
-        search_status['total_found'] = 0
-        search_status['unique_results'] = 0
-        search_results.clear()
-        search_params.update({
-            "establishment_type": establishment_type,
-            "location": location,
-            "max_results": max_results
-        })
+        journal = journal_store.open(job.id, job.params) if journal_store else None
+    except JournalLockedError as e:
+        # O mesmo job já está rodando em outro processo
+        logging.warning(f"[V2] Job {job.id} não iniciado: {e}")
+        status['error'] = str(e)
+        status['message'] = "Job já em execução em outro processo."
+        return
+    status['resumed'] = checkpoint is not None
+    if checkpoint is not None:
+        status['resumed_results'] = len(checkpoint.results)
+        logging.info(f"[V2] Job {job.id} será retomado do diário ({len(checkpoint.results)} estabelecimentos já extraídos).")
+
+    try:
+        status['progress'] = 0
+        status['message'] = "Iniciando coleta..."
+        status['error'] = None
+        status['total_found'] = 0
+        status['unique_results'] = 0
 
         search_query = f'{establishment_type} em {location}'
 
-        results = scrape_google_maps_v2(search_query, max_results)
+        scrape_args = (search_query, max_results, status, job.params.get("wait_mode"))
+        scrape_kwargs = {
+            "on_result": job.add_result,
+            "journal": journal,
+            "checkpoint": checkpoint,
+            "shards": build_shards(job.params),
+        }
+        status['engine'] = ENGINE
+        if async_engine is not None:
+            async_engine.run(scrape_google_maps_async(*scrape_args, **scrape_kwargs))
+        else:
+            scrape_google_maps_v2(*scrape_args, **scrape_kwargs)
 
-        search_results = results
-        search_status['total_found'] = len(results)
-        search_status['unique_results'] = len(results)
+        # Os resultados foram entregues ao job por on_result
+        unique_results = len(job.results)
+        status['total_found'] = unique_results
+        status['unique_results'] = unique_results
 
         end_time = time.time()
         duration = end_time - start_time
-        logging.info(f"[V2] Coleta concluída em {duration:.2f} segundos. {len(results)} resultados únicos.")
+        logging.info(f"[V2] Coleta concluída em {duration:.2f} segundos. {unique_results} resultados únicos.")
 
-        search_status['progress'] = 100
-        search_status['message'] = f"Coleta V2 concluída! {len(results)} resultados únicos encontrados em {duration:.2f}s."
-        search_status['is_running'] = False
+        status['duration_seconds'] = round(duration, 2)
+        status['progress'] = 100
+        status['message'] = f"Coleta V2 concluída! {unique_results} resultados únicos encontrados em {duration:.2f}s."
 
     except Exception as e:
         end_time = time.time()
         duration = end_time - start_time
         logging.exception("[V2] Erro crítico na thread do scraper.")
-        search_status['error'] = f"Erro crítico: {str(e)}"
-        search_status['message'] = f"Erro crítico após {duration:.2f}s. Verifique os logs."
-        search_status['progress'] = 0
-        search_status['is_running'] = False
+        status['error'] = f"Erro crítico: {str(e)}"
+        status['message'] = f"Erro crítico após {duration:.2f}s. Verifique os logs."
+        status['progress'] = 0
+    finally:
+        if journal is not None:
+            journal_store.finish(job.id, journal, "error" if status['error'] else FINISHED)
+
+# Fila compartilhada entre processos e hosts (SCRAPER_QUEUE_BACKEND). Sem ela,
+# os jobs rodam neste processo, como antes.
+job_store = job_store_from_env(os.path.join(DATA_DIR, 'jobs.sqlite3'))
+
+if job_store is None:
+    job_manager = JobManager(
+        run_scraper,
+        max_concurrent=int(os.environ.get('SCRAPER_MAX_CONCURRENT_JOBS', 2)),
+        max_queued=int(os.environ.get('SCRAPER_MAX_QUEUED_JOBS', 50)),
+        max_finished=int(os.environ.get('SCRAPER_MAX_FINISHED_JOBS', 20)),
+    )
+else:
+    # A coleta é feita pelos workers (python -m src.worker)
+    job_manager = SharedJobManager(
+        job_store,
+        max_queued=int(os.environ.get('SCRAPER_MAX_QUEUED_JOBS', 50)),
+        max_finished=int(os.environ.get('SCRAPER_MAX_FINISHED_JOBS', 20)),
+    )
+
+# Lotes de buscas (/api/batches): no máximo SCRAPER_BATCH_MAX_CONCURRENT jobs de lote
+# ativos ao mesmo tempo, somando todos os lotes
+BATCH_MAX_QUERIES = int(os.environ.get('SCRAPER_BATCH_MAX_QUERIES', 1000))
+batch_manager = BatchManager(
+    job_manager,
+    max_concurrent=int(os.environ.get('SCRAPER_BATCH_MAX_CONCURRENT', os.environ.get('SCRAPER_MAX_CONCURRENT_JOBS', 2))),
+    max_batches=int(os.environ.get('SCRAPER_MAX_FINISHED_BATCHES', 20)),
+)
+
+def resume_job(job_id):
+    """Reenfileira um job interrompido a partir do seu diário; retorna None se não houver diário."""
+    checkpoint = journal_store.load(job_id) if journal_store else None
+    if checkpoint is None or checkpoint.is_finished:
+        return None
+    if journal_store.is_active(job_id):
+        raise JobAlreadyActiveError(f"O job {job_id} já está em execução em outro processo.")
+    job = job_manager.submit(checkpoint.params, job_id=job_id, track_latest="batch_id" not in checkpoint.params)
+    logging.info(f"[V2] Job {job_id} reenfileirado a partir do diário ({len(checkpoint.results)} resultados salvos).")
+    return job
+
+def resume_interrupted_jobs():
+    """Retoma os jobs que ficaram sem finalizar (ex: após o reinício do worker)."""
+    if journal_store is None:
+        return
+    # Todos os workers do gunicorn e da fila importam este módulo: só um retoma
+    if not journal_store.claim_resume():
+        logging.info("[Journal] Retomada automática feita por outro processo.")
+        return
+    for checkpoint in journal_store.resumable():
+        if checkpoint.state is not None:
+            # Jobs que terminaram com erro são retomados apenas sob demanda
+            continue
+        if journal_store.is_active(checkpoint.job_id):
+            continue
+        try:
+            resume_job(checkpoint.job_id)
+        except (JobQueueFullError, JobAlreadyActiveError) as e:
+            logging.warning(f"[V2] Não foi possível retomar o job {checkpoint.job_id}: {e}")
+
+if os.environ.get('SCRAPER_RESUME_ON_START', '0') == '1':
+    resume_interrupted_jobs()
+
+# Status retornado por /api/status antes da primeira busca
+IDLE_STATUS = {
+    "is_running": False,
+    "progress": 0,
+    "message": "",
+    "error": None,
+    "total_found": 0,
+    "unique_results": 0
+}
+
+def get_job(job_id=None):
+    """Retorna o job pelo ID, ou o mais recente quando nenhum ID é informado."""
+    return job_manager.get(job_id) if job_id else job_manager.latest()
 
 @app.route('/')
 def index():
     return render_template('index.html')
 
+def parse_shard_params(form, establishment_type, location):
+    """Lê os parâmetros da busca dividida em sub-áreas; dicionário vazio sem divisão."""
+    shard_mode = form.get('shard_mode') or None
+    if shard_mode is None or shard_mode == 'none':
+        return {}
+    if shard_mode not in SHARD_MODES:
+        raise ValueError(f"Modo de divisão desconhecido: {shard_mode}")
+    params = {"shard_mode": shard_mode}
+    if shard_mode == 'areas':
+        sub_areas = [
+            area.strip() for area in form.get('sub_areas', '').replace(';', '\n').splitlines() if area.strip()
+        ]
+        if not sub_areas:
+            raise ValueError("Informe ao menos uma sub-área (uma por linha).")
+        params["sub_areas"] = sub_areas
+    else:
+        params["grid_center"] = form.get('grid_center', '')
+        params["grid_radius_km"] = float(form.get('grid_radius_km') or 5)
+        params["grid_size"] = int(form.get('grid_size') or 3)
+        if not 0 < params["grid_radius_km"] <= 100 or not 1 <= params["grid_size"] <= 10:
+            raise ValueError("O raio da grade deve estar entre 0 e 100 km e o tamanho entre 1 e 10.")
+    # Valida os parâmetros montando os shards
+    build_shards({"establishment_type": establishment_type, "location": location, **params})
+    return params
+
 @app.route('/search', methods=['POST'])
 def search():
-    global search_params, search_status
     logging.info(f"[V2] Recebida requisição /search: {request.form}")
 
     establishment_type = request.form.get('establishment_type')
@@ -397,166 +1153,261 @@ def search():
         logging.error("[V2] Requisição /search inválida: Faltando tipo ou localização.")
         return jsonify({"error": "Tipo de estabelecimento e localização são obrigatórios."}), 400
 
-    if search_status["is_running"]:
-        logging.warning("[V2] Requisição /search recebida enquanto outra busca está em andamento.")
-        return jsonify({"error": "Já existe uma busca em andamento. Aguarde a conclusão."}), 400
+    # Permite comparar a latência entre esperas por eventos e os tempos fixos originais
+    wait_mode = request.form.get('wait_mode')
+    if wait_mode not in WAIT_MODES:
+        wait_mode = WAIT_MODE
 
-    scraper_thread = threading.Thread(
-        target=run_scraper,
-        args=(establishment_type, location, max_results)
-    )
-    scraper_thread.daemon = True
-    scraper_thread.start()
-    logging.info("[V2] Thread do scraper (V2) iniciada.")
+    try:
+        shard_params = parse_shard_params(request.form, establishment_type, location)
+    except ValueError as e:
+        logging.error(f"[V2] Requisição /search inválida: {e}")
+        return jsonify({"error": f"Parâmetros de divisão da busca inválidos: {e}"}), 400
+
+    try:
+        job = job_manager.submit({
+            "establishment_type": establishment_type,
+            "location": location,
+            "max_results": max_results,
+            "wait_mode": wait_mode,
+            **shard_params
+        })
+    except JobQueueFullError as e:
+        logging.warning(f"[V2] Requisição /search recusada: {e}")
+        return jsonify({"error": f"{e} Aguarde a conclusão de outras buscas."}), 429
+    logging.info(f"[V2] Job {job.id} enfileirado.")
 
-    return redirect('/results')
+    return redirect(url_for('results', job=job.id))
 
 @app.route('/results')
 def results():
-    return render_template('results.html', initial_params=search_params)
+    job = get_job(request.args.get('job'))
+    return render_template(
+        'results.html',
+        initial_params=job.params if job else {},
+        job_id=job.id if job else None
+    )
 
-@app.route('/api/results')
-def api_results():
+@app.route('/api/jobs')
+def api_jobs():
     return jsonify({
-        "search_params": search_params,
-        "total_unique_found": search_status['unique_results'],
-        "results": search_results
+        "queue": job_store.describe() if job_store else {"backend": "local"},
+        "jobs": [job.to_dict() for job in job_manager.list()]
     })
 
-@app.route('/api/status')
-def api_status():
-    return jsonify(search_status)
+@app.route('/api/results')
+@app.route('/api/jobs/<job_id>/results')
+def api_results(job_id=None):
+    job = get_job(job_id)
+    if job_id and job is None:
+        return jsonify({"error": "Job não encontrado."}), 404
+    header = {
+        "job_id": job.id if job else None,
+        "search_params": job.params if job else {},
+        "total_unique_found": job.status['unique_results'] if job else 0,
+    }
+
+    def generate():
+        # Os resultados são lidos sob demanda do armazenamento do job, sem montar a lista
+        yield json.dumps(header, ensure_ascii=False)[:-1] + ', "results": ['
+        if job is not None:
+            for index, result in enumerate(islice(job.results, len(job.results))):
+                yield (", " if index else "") + json.dumps(result, ensure_ascii=False)
+        yield "]}"
+
+    return Response(generate(), mimetype='application/json')
 
-@app.route('/export/txt')
-def export_txt():
-    logging.info("[V2] Requisição /export/txt recebida.")
+@app.route('/api/status')
+@app.route('/api/jobs/<job_id>/status')
+def api_status(job_id=None):
+    job = get_job(job_id)
+    if job_id and job is None:
+        return jsonify({"error": "Job não encontrado."}), 404
+    return jsonify(job.status if job else IDLE_STATUS)
+
+def _sse_event(event, data, event_id=None):
+    """Formata um evento Server-Sent Events."""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data, ensure_ascii=False)}")
+    return "\n".join(lines) + "\n\n"
+
+@app.route('/api/stream')
+@app.route('/api/jobs/<job_id>/stream')
+def api_stream(job_id=None):
+    """Envia os resultados (evento ``result``) e o progresso (``status``) do job via SSE."""
+    job = get_job(job_id)
+    if job is None:
+        return jsonify({"error": "Job não encontrado."}), 404
+
+    # Em uma reconexão o navegador informa o último resultado recebido
     try:
-        if not search_results:
-            return jsonify({"error": "Nenhum resultado disponível para exportação."}), 404
-
-        content = f"Resultados da busca por: {search_params.get('establishment_type', 'N/A')} em {search_params.get('location', 'N/A')}\n"
-        content += f"Total de estabelecimentos únicos encontrados: {len(search_results)}\n"
-        content += "=" * 40 + "\n\n"
-
-        for result in search_results:
-            content += f"Nome: {result.get('name', 'N/A')}\n"
-            content += f"Tipo: {result.get('type', 'N/A')}\n"
-            content += f"Endereço: {result.get('address', 'N/A')}\n"
-            content += f"Telefone: {result.get('phone', 'N/A')}\n"
-            content += f"Website: {result.get('website', 'N/A')}\n"
-            content += f"Horário: {result.get('opening_hours', 'N/A')}\n"
-            content += f"Avaliação Média: {result.get('average_rating', 'N/A')}\n"
-            content += f"Contagem de Avaliações: {result.get('review_count', 'N/A')}\n"
-            content += f"Introdução: {result.get('introduction', 'N/A')}\n"
-            content += f"Compras na Loja: {'Sim' if result.get('store_shopping') else 'Não'}\n"
-            content += f"Retirada na Loja: {'Sim' if result.get('in_store_pickup') else 'Não'}\n"
-            content += f"Entrega: {'Sim' if result.get('delivery') else 'Não'}\n"
-            content += f"URL Google Maps: {result.get('google_maps_url', 'N/A')}\n"
-            content += "---" * 10 + "\n\n"
-
-        buffer = io.BytesIO()
-        buffer.write(content.encode('utf-8'))
-        buffer.seek(0)
-
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"resultados_{timestamp}.txt"
-
-        return send_file(
-            buffer,
-            as_attachment=True,
-            download_name=filename,
-            mimetype='text/plain; charset=utf-8'
-        )
-
-    except Exception as e:
-        logging.exception("[V2] Erro ao gerar exportação TXT.")
-        return jsonify({"error": f"Erro ao gerar TXT: {str(e)}"}), 500
+        sent_results = int(request.headers.get('Last-Event-ID', 0))
+    except ValueError:
+        sent_results = 0
+
+    def generate():
+        nonlocal sent_results
+        last_status = None
+        last_sent_at = time.time()
+        yield "retry: 2000\n\n"
+        while True:
+            job.wait_for_update(sent_results, timeout=1)
+            finished = job.is_finished
+            for result in job.results[sent_results:]:
+                sent_results += 1
+                yield _sse_event("result", {"index": sent_results - 1, "result": result}, event_id=sent_results)
+            status = dict(job.status)
+            if status != last_status:
+                last_status = status
+                yield _sse_event("status", status)
+                last_sent_at = time.time()
+            if finished:
+                yield _sse_event("done", {**status, "search_params": job.params})
+                return
+            if time.time() - last_sent_at > 15:
+                # Mantém a conexão aberta através de proxies
+                yield ": keepalive\n\n"
+                last_sent_at = time.time()
+
+    return Response(generate(), mimetype='text/event-stream', headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no"
+    })
 
-@app.route('/export/json')
-def export_json():
-    logging.info("[V2] Requisição /export/json recebida.")
+@app.route('/api/journals')
+def api_journals():
+    """Jobs interrompidos ou com erro que podem ser retomados."""
+    if journal_store is None:
+        return jsonify({"enabled": False, "jobs": []})
+    return jsonify({"enabled": True, "jobs": [checkpoint.to_dict() for checkpoint in journal_store.resumable()]})
+
+@app.route('/api/jobs/<job_id>/resume', methods=['POST'])
+def api_resume(job_id):
+    if journal_store is None:
+        return jsonify({"error": "Os diários de jobs estão desativados."}), 404
     try:
-        if not search_results:
-            return jsonify({"error": "Nenhum resultado disponível para exportação."}), 404
-
-        data = {
-            "search_params": search_params,
-            "total_unique_found": len(search_results),
-            "results": search_results
-        }
-
-        buffer = io.BytesIO()
-        buffer.write(json.dumps(data, ensure_ascii=False, indent=2).encode('utf-8'))
-        buffer.seek(0)
-
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"resultados_{timestamp}.json"
-
-        return send_file(
-            buffer,
-            as_attachment=True,
-            download_name=filename,
-            mimetype='application/json; charset=utf-8'
-        )
-
-    except Exception as e:
-        logging.exception("[V2] Erro ao gerar exportação JSON.")
-        return jsonify({"error": f"Erro ao gerar JSON: {str(e)}"}), 500
-
-@app.route('/export/csv')
-def export_csv():
-    logging.info("[V2] Requisição /export/csv recebida.")
+        job = resume_job(job_id)
+    except JobAlreadyActiveError as e:
+        return jsonify({"error": str(e)}), 409
+    except JobQueueFullError as e:
+        logging.warning(f"[V2] Retomada do job {job_id} recusada: {e}")
+        return jsonify({"error": f"{e} Aguarde a conclusão de outras buscas."}), 429
+    if job is None:
+        return jsonify({"error": "Nenhum diário retomável encontrado para este job."}), 404
+    return jsonify(job.to_dict()), 202
+
+def parse_batch_request():
+    """Lê as consultas de um lote enviado como JSON, CSV no corpo ou arquivo CSV (campo ``file``)."""
+    default_max_results = request.args.get('max_results', 50)
+    upload = request.files.get('file')
+    if upload is not None:
+        return parse_queries_csv(upload.read().decode('utf-8'), default_max_results=default_max_results, wait_modes=WAIT_MODES)
+    if request.mimetype == 'text/csv':
+        return parse_queries_csv(request.get_data(as_text=True), default_max_results=default_max_results, wait_modes=WAIT_MODES)
+    payload = request.get_json(silent=True)
+    if isinstance(payload, dict):
+        default_max_results = payload.get('max_results', default_max_results)
+        payload = payload.get('queries')
+    if not isinstance(payload, list):
+        raise ValueError("Envie uma lista JSON de consultas ({\"queries\": [...]}) ou um CSV.")
+    return parse_queries(payload, default_max_results=default_max_results, wait_modes=WAIT_MODES)
+
+@app.route('/api/batches', methods=['POST'])
+def api_create_batch():
     try:
-        if not search_results:
-            return jsonify({"error": "Nenhum resultado disponível para exportação."}), 404
-        output = io.StringIO()
-        writer = csv.writer(output, delimiter=';', quotechar='"', quoting=csv.QUOTE_MINIMAL)
-        headers = [
-            'Nome', 'Tipo', 'Endereço', 'Telefone', 'Website', 'Horário',
-            'Avaliação Média', 'Contagem de Avaliações', 'Introdução',
-            'Compras na Loja', 'Retirada na Loja', 'Entrega', 'URL Google Maps'
-        ]
-        writer.writerow(headers)
-        for result in search_results:
-            writer.writerow([
-                result.get('name', 'N/A'),
-                result.get('type', 'N/A'),
-                result.get('address', 'N/A'),
-                result.get('phone', 'N/A'),
-                result.get('website', 'N/A'),
-                result.get('opening_hours', 'N/A'),
-                result.get('average_rating', 'N/A'),
-                result.get('review_count', 'N/A'),
-                result.get('introduction', 'N/A'),
-                'Sim' if result.get('store_shopping') else 'Não',
-                'Sim' if result.get('in_store_pickup') else 'Não',
-                'Sim' if result.get('delivery') else 'Não',
-                result.get('google_maps_url', 'N/A')
-            ])
-        buffer = io.BytesIO()
-        buffer.write(output.getvalue().encode('utf-8-sig'))
-        buffer.seek(0)
-        output.close()
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"resultados_{timestamp}.csv"
-        return send_file(
-            buffer,
-            as_attachment=True,
-            download_name=filename,
-            mimetype='text/csv; charset=utf-8-sig'
-        )
-    except NameError:
-         logging.error("[V2] Módulo CSV não importado.")
-         return jsonify({"error": "Erro interno: Módulo CSV não disponível."}), 500
-    except Exception as e:
-        logging.exception("[V2] Erro ao gerar exportação CSV.")
-        return jsonify({"error": f"Erro ao gerar CSV: {str(e)}"}), 500
-
-try:
-    import csv
-except ImportError:
-    logging.warning("[V2] Módulo CSV não encontrado. Exportação CSV estará desabilitada.")
-    pass
+        queries = parse_batch_request()
+    except (ValueError, UnicodeDecodeError) as e:
+        logging.error(f"[V2] Lote inválido: {e}")
+        return jsonify({"error": f"Lote inválido: {e}"}), 400
+    if BATCH_MAX_QUERIES and len(queries) > BATCH_MAX_QUERIES:
+        return jsonify({"error": f"O lote tem {len(queries)} consultas; o máximo é {BATCH_MAX_QUERIES}."}), 400
+    batch = batch_manager.submit(queries)
+    return jsonify(batch.to_dict()), 202
+
+@app.route('/api/batches')
+def api_batches():
+    return jsonify({"batches": [batch.to_dict(include_queries=False) for batch in batch_manager.list()]})
+
+@app.route('/api/batches/<batch_id>')
+def api_batch(batch_id):
+    batch = batch_manager.get(batch_id)
+    if batch is None:
+        return jsonify({"error": "Lote não encontrado."}), 404
+    return jsonify(batch.to_dict())
+
+@app.route('/api/batches/<batch_id>/cancel', methods=['POST'])
+def api_cancel_batch(batch_id):
+    batch = batch_manager.cancel(batch_id)
+    if batch is None:
+        return jsonify({"error": "Lote não encontrado."}), 404
+    return jsonify(batch.to_dict(include_queries=False))
+
+@app.route('/api/batches/<batch_id>/export/<fmt>')
+def export_batch(batch_id, fmt):
+    """Exporta os resultados de todas as consultas do lote, já deduplicados, em um único arquivo."""
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({"error": f"Formato de exportação desconhecido: {fmt}"}), 404
+    if fmt in COLUMNAR_FORMATS and not columnar_available():
+        return jsonify({"error": f"Exportação {fmt.upper()} requer o pacote pyarrow."}), 501
+    batch = batch_manager.get(batch_id)
+    if batch is None or not batch.results:
+        return jsonify({"error": "Nenhum resultado disponível para exportação."}), 404
+
+    generator, extension, mimetype = EXPORT_FORMATS[fmt]
+    filename = f"lote_{batch.id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{extension}"
+    return Response(
+        logged_stream(generator(batch.results, batch.params), fmt),
+        mimetype=mimetype,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+@app.route('/metrics')
+def metrics():
+    """Métricas deste processo no formato de texto do Prometheus."""
+    return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/api/pool')
+def api_pool():
+    http = http_extractor.stats() if http_extractor is not None else None
+    if async_engine is not None:
+        return jsonify({"engine": ENGINE, "http_extractor": http, **async_engine.stats()})
+    return jsonify({"engine": ENGINE, "http_extractor": http, **browser_pool.stats()})
+
+@app.route('/api/governor')
+def api_governor():
+    """Ritmo atual de cada contexto: concorrência, pausa, taxa de falhas e estabelecimentos por minuto."""
+    return jsonify(governors.stats())
+
+@app.route('/api/cache')
+def api_cache():
+    cache = {"enabled": True, **place_cache.stats()} if place_cache is not None else {"enabled": False}
+    index = {"enabled": True, **place_index.stats()} if place_index is not None else {"enabled": False}
+    return jsonify({**cache, "dedupe_index": index})
+
+@app.route('/export/<fmt>')
+@app.route('/export/<job_id>/<fmt>')
+def export_results(fmt, job_id=None):
+    """Exporta os resultados do job em streaming, sem montar o arquivo inteiro em memória."""
+    logging.info(f"[V2] Requisição /export/{fmt} recebida (job: {job_id or 'mais recente'}).")
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({"error": f"Formato de exportação desconhecido: {fmt}"}), 404
+    if fmt in COLUMNAR_FORMATS and not columnar_available():
+        return jsonify({"error": f"Exportação {fmt.upper()} requer o pacote pyarrow."}), 501
+    job = get_job(job_id)
+    if job is None or not job.results:
+        return jsonify({"error": "Nenhum resultado disponível para exportação."}), 404
+
+    generator, extension, mimetype = EXPORT_FORMATS[fmt]
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    filename = f"resultados_{timestamp}.{extension}"
+    return Response(
+        logged_stream(generator(job.results, job.params), fmt),
+        mimetype=mimetype,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
 
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
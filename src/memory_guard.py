@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+"""Limite de memória para a reciclagem de navegadores e páginas.
+
+A memória dos renderizadores do Chromium cresce ao longo de jobs longos. O
+``MemoryGuard`` mede periodicamente o RSS do processo Python somado ao dos
+navegadores e, acima do limite, autoriza a reciclagem de um navegador (ou de uma
+página, no motor assíncrono) por vez, medindo de novo antes da próxima.
+"""
+import logging
+import os
+import threading
+import time
+
+from src.metrics import psutil, rss_bytes
+
+
+class MemoryGuard:
+    """Decide quando reciclar um navegador pela memória somada do processo e dos navegadores."""
+
+    def __init__(self, max_rss_mb, check_interval=5.0, cooldown=15.0):
+        self.max_rss_bytes = int(max_rss_mb * 1024 * 1024)
+        self.check_interval = check_interval
+        # Tempo para uma reciclagem surtir efeito antes de autorizar a próxima
+        self.cooldown = cooldown
+        self.recycles = 0
+        self.last_rss_bytes = None
+        self._sampled_at = 0.0
+        self._recycled_at = 0.0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        """Cria o limite a partir de SCRAPER_MAX_RSS_MB; None se não definido ou sem psutil."""
+        max_rss_mb = float(os.environ.get('SCRAPER_MAX_RSS_MB', 0) or 0)
+        if max_rss_mb <= 0:
+            return None
+        if psutil is None:
+            logging.warning("[Memory] psutil não instalado. Reciclagem por memória desativada.")
+            return None
+        return cls(max_rss_mb, check_interval=float(os.environ.get('SCRAPER_RSS_CHECK_INTERVAL', 5)))
+
+    def _sample(self, now):
+        if now - self._sampled_at >= self.check_interval:
+            try:
+                python_rss, browsers_rss = rss_bytes()
+                self.last_rss_bytes = python_rss + browsers_rss
+            except Exception as e:
+                logging.error(f"[Memory] Erro ao medir o uso de memória: {e}")
+            self._sampled_at = now
+        return self.last_rss_bytes
+
+    def claim_recycle(self):
+        """Motivo da reciclagem se a memória passou do limite; só um chamador recebe por vez."""
+        with self._lock:
+            now = time.time()
+            if now - self._recycled_at < self.cooldown:
+                return None
+            total = self._sample(now)
+            if total is None or total <= self.max_rss_bytes:
+                return None
+            self._recycled_at = now
+            # A próxima decisão usa uma medição feita depois desta reciclagem
+            self._sampled_at = 0.0
+            self.recycles += 1
+            return f"memória em {total / 1024 / 1024:.0f} MB, acima de {self.max_rss_bytes / 1024 / 1024:.0f} MB"
+
+    def stats(self):
+        return {
+            "max_rss_mb": round(self.max_rss_bytes / 1024 / 1024),
+            "last_rss_mb": round(self.last_rss_bytes / 1024 / 1024, 1) if self.last_rss_bytes else None,
+            "recycles": self.recycles,
+        }
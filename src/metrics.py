@@ -0,0 +1,305 @@
+# -*- coding: utf-8 -*-
+"""Métricas do scraper (contadores, gauges e histogramas) no formato de texto do Prometheus.
+
+Implementação mínima e sem dependências: cada métrica guarda seus valores por
+combinação de labels e ``render()`` gera o texto servido em ``/metrics``. O
+amostrador ``RssSampler`` atualiza em segundo plano o uso de memória do processo
+Python e dos navegadores.
+"""
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+
+def _format_labels(labelnames, values, extra=()):
+    pairs = list(zip(labelnames, values)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"A métrica {self.name} espera os labels {self.labelnames}, recebeu {tuple(labels)}.")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.extend(self._render_sample(key, value))
+        return lines
+
+    def _render_sample(self, key, value):
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state["counts"][index] += 1
+            state["sum"] += value
+            state["count"] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Observa a duração do bloco, mesmo se ele lançar uma exceção."""
+        start = time.time()
+        try:
+            yield
+        finally:
+            self.observe(time.time() - start, **labels)
+
+    def render(self):
+        with self._lock:
+            items = sorted((key, {**state, "counts": list(state["counts"])}) for key, state in self._values.items())
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for key, state in items:
+            for bound, count in zip(self.buckets, state["counts"]):
+                labels = _format_labels(self.labelnames, key, [("le", _format_value(bound))])
+                lines.append(f"{self.name}_bucket{labels} {count}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(state['sum'])}")
+            lines.append(f"{self.name}_count{labels} {state['count']}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+# --- Métricas do scraper ---
+
+BROWSER_LAUNCH_SECONDS = REGISTRY.register(Histogram(
+    "gms_browser_launch_seconds", "Tempo para iniciar um navegador do pool"))
+BROWSER_RECYCLES_TOTAL = REGISTRY.register(Counter(
+    "gms_browser_recycles_total", "Reciclagens de navegadores e páginas por motivo (health, uses, age, memory)",
+    ["reason"]))
+PAGE_LOAD_SECONDS = REGISTRY.register(Histogram(
+    "gms_page_load_seconds", "Tempo de carregamento de páginas (goto + espera de prontidão)", ["page"]))
+SEARCH_SECONDS = REGISTRY.register(Histogram(
+    "gms_search_seconds", "Tempo entre o início da busca e o painel de resultados"))
+SCROLL_ITERATION_SECONDS = REGISTRY.register(Histogram(
+    "gms_scroll_iteration_seconds", "Duração de cada rolagem da lista de resultados (rolagem + espera + leitura)"))
+LISTING_READY_SECONDS = REGISTRY.register(Histogram(
+    "gms_listing_ready_seconds", "Tempo do clique/navegação até o painel de detalhes pronto", ["mode"]))
+LISTING_EXTRACT_SECONDS = REGISTRY.register(Histogram(
+    "gms_listing_extract_seconds", "Tempo de extração dos campos de um estabelecimento",
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)))
+JOB_PHASE_SECONDS = REGISTRY.register(Histogram(
+    "gms_job_phase_seconds", "Tempo de cada fase de um job (busca, rolagem, detalhes)", ["phase"]))
+JOB_DURATION_SECONDS = REGISTRY.register(Histogram(
+    "gms_job_duration_seconds", "Duração total dos jobs",
+    buckets=(5, 15, 30, 60, 120, 300, 600, 1200, 1800, 3600)))
+LISTINGS_TOTAL = REGISTRY.register(Counter(
+    "gms_listings_total", "Estabelecimentos processados por destino (unique, duplicate, no_name, failed, skipped)",
+    ["outcome"]))
+HTTP_EXTRACTIONS_TOTAL = REGISTRY.register(Counter(
+    "gms_http_extractions_total", "Extrações via HTTP por resultado (parsed, fallback, blocked, error)", ["outcome"]))
+ERRORS_TOTAL = REGISTRY.register(Counter(
+    "gms_errors_total", "Erros por etapa da coleta", ["stage"]))
+JOBS_TOTAL = REGISTRY.register(Counter(
+    "gms_jobs_total", "Jobs finalizados por estado", ["state"]))
+JOBS_RUNNING = REGISTRY.register(Gauge(
+    "gms_jobs_running", "Jobs em execução neste processo"))
+GOVERNOR_CONCURRENCY = REGISTRY.register(Gauge(
+    "gms_governor_concurrency", "Concorrência permitida pelo governador em cada contexto", ["context"]))
+GOVERNOR_DELAY_SECONDS = REGISTRY.register(Gauge(
+    "gms_governor_delay_seconds", "Pausa entre requisições imposta pelo governador em cada contexto", ["context"]))
+GOVERNOR_BACKOFFS_TOTAL = REGISTRY.register(Counter(
+    "gms_governor_backoffs_total", "Reduções de ritmo do governador por motivo (timeout, no_name, blocked)",
+    ["reason"]))
+RSS_BYTES = REGISTRY.register(Gauge(
+    "gms_rss_bytes", "Memória residente (RSS) do processo Python e dos navegadores", ["process"]))
+
+
+def rss_bytes():
+    """RSS do processo atual e, somados, dos processos filhos (navegadores); None sem psutil."""
+    if psutil is None:
+        return None
+    process = psutil.Process()
+    python_rss = process.memory_info().rss
+    browsers_rss = 0
+    for child in process.children(recursive=True):
+        try:
+            browsers_rss += child.memory_info().rss
+        except psutil.Error:
+            pass
+    return python_rss, browsers_rss
+
+
+class RssSampler:
+    """Atualiza periodicamente a métrica de RSS em uma thread de segundo plano e guarda o pico.
+
+    Também pode ser usado como gerenciador de contexto, que amostra apenas
+    durante o bloco (ex: o pico de memória de uma execução do benchmark).
+    """
+
+    def __init__(self, interval=15):
+        self.interval = interval
+        # Maior RSS somado (Python + navegadores) observado, em bytes
+        self.peak_bytes = None
+        self._thread = None
+        self._stopped = threading.Event()
+        self._lock = threading.Lock()
+
+    def sample(self):
+        try:
+            sample = rss_bytes()
+        except Exception as e:
+            logging.error(f"[Metrics] Erro ao medir o uso de memória: {e}")
+            return None
+        if sample is None:
+            return None
+        python_rss, browsers_rss = sample
+        total = python_rss + browsers_rss
+        self.peak_bytes = total if self.peak_bytes is None else max(self.peak_bytes, total)
+        RSS_BYTES.set(python_rss, process="python")
+        RSS_BYTES.set(browsers_rss, process="browsers")
+        logging.debug(
+            f"[Metrics] Memória: Python {python_rss / 1024 / 1024:.1f} MB, navegadores {browsers_rss / 1024 / 1024:.1f} MB."
+        )
+        return sample
+
+    @property
+    def peak_mb(self):
+        return self.peak_bytes / 1024 / 1024 if self.peak_bytes is not None else None
+
+    def _loop(self):
+        self.sample()
+        while not self._stopped.wait(self.interval):
+            self.sample()
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            if psutil is None:
+                logging.warning("[Metrics] psutil não instalado. Métricas de memória desativadas.")
+                return
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._loop, name="rss-sampler", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Encerra a thread de amostragem após uma última medição."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._stopped.set()
+            thread.join()
+            self.sample()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+rss_sampler = RssSampler(interval=float(os.environ.get('SCRAPER_RSS_SAMPLE_INTERVAL', 15)))
+
+
+def serve(port, host="0.0.0.0"):
+    """Expõe ``/metrics`` em uma porta própria (usado pelos workers, que não rodam o Flask)."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            payload = REGISTRY.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    logging.info(f"[Metrics] Métricas disponíveis em http://{host}:{port}/metrics")
+    return server
@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+"""Cache em disco (SQLite) dos detalhes extraídos de cada estabelecimento.
+
+A chave é o identificador do lugar contido na URL do Google Maps, de modo que o
+mesmo estabelecimento encontrado em buscas diferentes seja extraído uma só vez
+dentro do TTL configurado.
+"""
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from urllib.parse import unquote, urlsplit
+
+# Identificadores estáveis presentes no parâmetro data= das URLs /maps/place
+_PLACE_ID_RE = re.compile(r"!19s(ChIJ[\w-]+)")
+_FEATURE_ID_RE = re.compile(r"!1s(0x[0-9a-fA-F]+:0x[0-9a-fA-F]+)")
+_CID_RE = re.compile(r"[?&]cid=(\d+)")
+
+
+def place_id_from_url(url):
+    """Extrai um identificador estável do lugar a partir da URL /maps/place.
+
+    Usa, nesta ordem: o place ID (ChIJ...), o feature ID (0x...:0x...), o cid
+    ou, na falta deles, o caminho da URL sem parâmetros. Retorna None se a URL
+    não for de um lugar.
+    """
+    if not url or "/maps/place" not in url:
+        return None
+    for pattern in (_PLACE_ID_RE, _FEATURE_ID_RE, _CID_RE):
+        match = pattern.search(url)
+        if match:
+            return match.group(1)
+    path = unquote(urlsplit(url).path)
+    # Remove o trecho de viewport (/@lat,lng,zoom) e o data=, que variam entre buscas
+    path = path.split("/@")[0].split("/data=")[0]
+    return path.rstrip("/") or None
+
+
+class PlaceCache:
+    """Cache de resultados por lugar com TTL e remoção dos menos usados ao atingir o limite."""
+
+    def __init__(self, path, ttl=86400, max_entries=50000):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._puts_since_eviction = 0
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS places ("
+            " place_id TEXT PRIMARY KEY,"
+            " data TEXT NOT NULL,"
+            " updated_at REAL NOT NULL,"
+            " accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_places_accessed ON places (accessed_at)")
+        self._conn.commit()
+
+    @classmethod
+    def from_env(cls, default_path):
+        """Cria o cache a partir de SCRAPER_CACHE_*; retorna None se estiver desativado."""
+        if os.environ.get('SCRAPER_CACHE_ENABLED', '1') == '0':
+            return None
+        try:
+            return cls(
+                os.environ.get('SCRAPER_CACHE_PATH', default_path),
+                ttl=int(os.environ.get('SCRAPER_CACHE_TTL', 86400)),
+                max_entries=int(os.environ.get('SCRAPER_CACHE_MAX_ENTRIES', 50000)),
+            )
+        except (sqlite3.Error, OSError) as e:
+            logging.error(f"[Cache] Não foi possível abrir o cache de lugares: {e}. Cache desativado.")
+            return None
+
+    def get(self, url):
+        """Retorna o resultado em cache para a URL do lugar, ou None se ausente/expirado."""
+        place_id = place_id_from_url(url)
+        if place_id is None:
+            return None
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data, updated_at FROM places WHERE place_id = ?", (place_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            data, updated_at = row
+            if self.ttl and now - updated_at > self.ttl:
+                self._conn.execute("DELETE FROM places WHERE place_id = ?", (place_id,))
+                self._conn.commit()
+                return None
+            self._conn.execute("UPDATE places SET accessed_at = ? WHERE place_id = ?", (now, place_id))
+            self._conn.commit()
+        result = json.loads(data)
+        result["google_maps_url"] = url
+        return result
+
+    def put(self, url, result):
+        """Grava o resultado extraído de um lugar."""
+        place_id = place_id_from_url(url)
+        if place_id is None:
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO places (place_id, data, updated_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (place_id, json.dumps(result, ensure_ascii=False), now, now)
+            )
+            self._puts_since_eviction += 1
+            if self._puts_since_eviction >= 100:
+                self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        """Remove entradas expiradas e, acima do limite, as acessadas há mais tempo."""
+        self._puts_since_eviction = 0
+        if self.ttl:
+            self._conn.execute("DELETE FROM places WHERE updated_at < ?", (time.time() - self.ttl,))
+        if self.max_entries:
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM places").fetchone()
+            excess = count - self.max_entries
+            if excess > 0:
+                self._conn.execute(
+                    "DELETE FROM places WHERE place_id IN "
+                    "(SELECT place_id FROM places ORDER BY accessed_at LIMIT ?)", (excess,)
+                )
+                logging.info(f"[Cache] {excess} lugares removidos do cache (limite de {self.max_entries}).")
+
+    def stats(self):
+        with self._lock:
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM places").fetchone()
+        return {"path": self.path, "entries": count, "ttl": self.ttl, "max_entries": self.max_entries}
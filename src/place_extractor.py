@@ -0,0 +1,245 @@
+# -*- coding: utf-8 -*-
+"""Extração dos campos do painel de detalhes de um estabelecimento.
+
+Há dois modos:
+
+- ``evaluate``: um único ``page.evaluate`` coleta todos os campos de uma vez,
+  usando os mesmos XPaths via ``document.evaluate`` (1 chamada IPC por listagem);
+- ``locators``: o modo original, com ``count()`` + ``inner_text()`` por campo
+  (20+ chamadas IPC por listagem).
+
+Os dois retornam o mesmo dicionário, com "N/A" para campos ausentes. O motor
+assíncrono usa ``extract_place_details_async``, com o mesmo script e o mesmo
+dicionário do modo ``evaluate``.
+"""
+import logging
+import os
+
+# XPaths do painel de detalhes
+NAME_XPATH = '//h1[contains(@class, "DUwDvf")] | //h1[contains(@class, "fontHeadlineLarge")]'
+PLACE_TYPE_XPATH = '//button[contains(@jsaction, "category")]'
+ADDRESS_XPATH = '//button[@data-item-id="address"]//div[contains(@class, "fontBodyMedium")]'
+PHONE_XPATH = '//button[contains(@data-item-id, "phone:tel:")]//div[contains(@class, "fontBodyMedium")]'
+WEBSITE_XPATH = '//a[@data-item-id="authority"]//div[contains(@class, "fontBodyMedium")]'
+OPENING_HOURS_XPATH = '//div[contains(@aria-label, "Horário")] | //button[contains(@data-item-id, "oh")]'
+INTRO_XPATH = '//div[contains(@class, "WeS02d")]//div[contains(@class, "PYvSYb")]'
+REVIEWS_XPATH = '//div[contains(@class, "F7nice")]'
+REVIEW_COUNT_SPAN_XPATH = REVIEWS_XPATH + '//span[contains(@aria-label, "avaliaç")]'
+INFO_XPATH_BASE = '//div[contains(@class, "LTs0Rc")] | //div[contains(@class, "iP2t7d")]'
+
+# Modo de extração padrão: "evaluate" (uma chamada) ou "locators" (uma por campo)
+EXTRACTION_MODE = os.environ.get('SCRAPER_EXTRACTION_MODE', 'evaluate')
+
+# Campos de texto simples e seus XPaths, na ordem do dicionário de resultado
+TEXT_FIELDS = [
+    ("name", NAME_XPATH, "Nome"),
+    ("type", PLACE_TYPE_XPATH, "Tipo"),
+    ("address", ADDRESS_XPATH, "Endereço"),
+    ("phone", PHONE_XPATH, "Telefone"),
+    ("website", WEBSITE_XPATH, "Website"),
+    ("opening_hours", OPENING_HOURS_XPATH, "Horário"),
+    ("introduction", INTRO_XPATH, "Introdução"),
+]
+
+# Script executado na página: recebe os XPaths e devolve todos os campos em um único JSON
+EXTRACT_PLACE_JS = """
+(xpaths) => {
+    const first = (xpath) => document.evaluate(
+        xpath, document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null
+    ).singleNodeValue;
+    const text = (node) => node ? (node.innerText ?? node.textContent ?? '') : null;
+    const fields = {};
+    for (const [key, xpath] of Object.entries(xpaths.fields)) {
+        const value = text(first(xpath));
+        fields[key] = value === null ? null : value.trim();
+    }
+    const reviews = first(xpaths.reviews);
+    const countSpan = reviews ? first(xpaths.reviewCountSpan) : null;
+    const info = document.evaluate(
+        xpaths.info, document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null
+    );
+    const infoTexts = [];
+    for (let i = 0; i < info.snapshotLength; i++) {
+        infoTexts.push(text(info.snapshotItem(i)));
+    }
+    return {
+        fields,
+        reviewText: text(reviews),
+        reviewAriaLabel: countSpan ? countSpan.getAttribute('aria-label') : null,
+        infoTexts,
+    };
+}
+"""
+
+EXTRACT_PLACE_ARGS = {
+    "fields": {key: xpath for key, xpath, _ in TEXT_FIELDS},
+    "reviews": REVIEWS_XPATH,
+    "reviewCountSpan": REVIEW_COUNT_SPAN_XPATH,
+    "info": INFO_XPATH_BASE,
+}
+
+# Métodos de Page/Locator que não fazem chamada ao navegador
+_LOCAL_METHODS = {"locator", "first", "last", "nth", "filter", "frame_locator", "get_by_role", "get_by_text"}
+
+
+class IpcCounter:
+    """Envolve uma Page (ou Locator) e conta as chamadas que vão até o navegador."""
+
+    def __init__(self, target, counter=None):
+        self._target = target
+        self._counter = counter if counter is not None else [0]
+
+    @property
+    def calls(self):
+        return self._counter[0]
+
+    def _wrap(self, value):
+        if isinstance(value, list):
+            return [self._wrap(item) for item in value]
+        if type(value).__name__ == "Locator":
+            return IpcCounter(value, self._counter)
+        return value
+
+    def __getattr__(self, name):
+        attr = getattr(self._target, name)
+        if not callable(attr):
+            return self._wrap(attr)
+
+        def call(*args, **kwargs):
+            if name not in _LOCAL_METHODS:
+                self._counter[0] += 1
+            return self._wrap(attr(*args, **kwargs))
+        return call
+
+
+# Função para extrair dados de um elemento usando XPath
+def extract_data(xpath, page, field_name="Dado"):
+    """Extrai texto de um elemento usando XPath, com logging."""
+    try:
+        locator = page.locator(xpath)
+        if locator.count() > 0:
+            data = locator.first.inner_text().strip()
+            return data
+        else:
+            return "N/A"
+    except Exception as e:
+        logging.error(f"Erro ao extrair {field_name} com XPath {xpath}: {e}")
+        return "N/A"
+
+
+def parse_reviews(review_text, get_aria_label):
+    """Converte o texto do bloco de avaliações em (média, contagem).
+
+    ``get_aria_label`` só é chamado quando a contagem não aparece no texto.
+    """
+    rev_count = "N/A"
+    rev_avg = "N/A"
+    if review_text is None:
+        logging.warning("[V2] Bloco de avaliações não encontrado.")
+        return rev_avg, rev_count
+    parts = review_text.split()
+    if parts:
+        try: rev_avg = float(parts[0].replace(",", "."))
+        except (ValueError, IndexError): rev_avg = "N/A"
+        try:
+            count_part = next((p.strip("()").replace(".", "").replace(",", "") for p in parts if p.startswith("(")), None)
+            if count_part and count_part.isdigit(): rev_count = int(count_part)
+            elif len(parts) > 1 and parts[1].replace(".", "").replace(",", "").isdigit(): rev_count = int(parts[1].replace(".", "").replace(",", ""))
+            else:
+                aria_label = get_aria_label()
+                if aria_label is not None:
+                    count_part_aria = aria_label.split()[0].replace(".", "").replace(",", "")
+                    if count_part_aria.isdigit(): rev_count = int(count_part_aria)
+                    else: rev_count = "N/A"
+                else: rev_count = "N/A"
+        except (ValueError, IndexError, AttributeError) as rev_e:
+            logging.warning(f"[V2] Não foi possível extrair contagem de avaliações de '{review_text}': {rev_e}")
+            rev_count = "N/A"
+    return rev_avg, rev_count
+
+
+def parse_service_badges(info_texts):
+    """Identifica compras na loja, retirada e entrega nos textos de informações de serviço."""
+    store_shopping = False
+    in_store_pickup = False
+    delivery = False
+    for info_text in info_texts:
+        info_text = (info_text or "").lower()
+        if "compra" in info_text or "shop" in info_text: store_shopping = True
+        if "retira" in info_text or "pickup" in info_text: in_store_pickup = True
+        if "entrega" in info_text or "delivery" in info_text: delivery = True
+    return store_shopping, in_store_pickup, delivery
+
+
+def build_result(fields, rev_avg, rev_count, badges, google_maps_url):
+    """Monta o dicionário de resultado com os campos e a ordem usados por todos os modos de extração."""
+    store_shopping, in_store_pickup, delivery = badges
+    return {
+        "name": fields["name"],
+        "type": fields["type"],
+        "address": fields["address"],
+        "phone": fields["phone"],
+        "website": fields["website"],
+        "opening_hours": fields["opening_hours"],
+        "average_rating": rev_avg,
+        "review_count": rev_count,
+        "introduction": fields["introduction"],
+        "store_shopping": store_shopping,
+        "in_store_pickup": in_store_pickup,
+        "delivery": delivery,
+        "google_maps_url": google_maps_url
+    }
+
+
+def _extract_with_locators(page, google_maps_url):
+    """Modo original: uma consulta ao navegador por campo."""
+    fields = {key: extract_data(xpath, page, label) for key, xpath, label in TEXT_FIELDS}
+
+    rev_avg, rev_count = "N/A", "N/A"
+    try:
+        review_text = None
+        if page.locator(REVIEWS_XPATH).count() > 0:
+            review_text = page.locator(REVIEWS_XPATH).first.inner_text()
+
+        def get_aria_label():
+            if page.locator(REVIEW_COUNT_SPAN_XPATH).count() > 0:
+                return page.locator(REVIEW_COUNT_SPAN_XPATH).first.get_attribute("aria-label")
+            return None
+
+        rev_avg, rev_count = parse_reviews(review_text, get_aria_label)
+    except Exception as e_rev: logging.error(f"[V2] Erro ao processar bloco de avaliações: {e_rev}")
+
+    badges = (False, False, False)
+    try:
+        badges = parse_service_badges(element.inner_text() for element in page.locator(INFO_XPATH_BASE).all())
+    except Exception as e_info: logging.error(f"[V2] Erro ao extrair informações de serviço: {e_info}")
+
+    return build_result(fields, rev_avg, rev_count, badges, google_maps_url)
+
+
+def result_from_payload(payload, google_maps_url):
+    """Resultado a partir dos textos brutos do painel (formato devolvido por ``EXTRACT_PLACE_JS``)."""
+    fields = {key: "N/A" if value is None else value for key, value in payload["fields"].items()}
+    rev_avg, rev_count = parse_reviews(payload["reviewText"], lambda: payload["reviewAriaLabel"])
+    badges = parse_service_badges(payload["infoTexts"])
+    return build_result(fields, rev_avg, rev_count, badges, google_maps_url)
+
+
+def _extract_with_evaluate(page, google_maps_url):
+    """Modo de chamada única: todos os campos em um só ``page.evaluate``."""
+    return result_from_payload(page.evaluate(EXTRACT_PLACE_JS, EXTRACT_PLACE_ARGS), google_maps_url)
+
+
+async def extract_place_details_async(page, google_maps_url):
+    """Versão para a API assíncrona do Playwright; sempre usa a chamada única."""
+    return result_from_payload(await page.evaluate(EXTRACT_PLACE_JS, EXTRACT_PLACE_ARGS), google_maps_url)
+
+
+def extract_place_details(page, google_maps_url, mode=None):
+    """Extrai todos os campos do painel de detalhes aberto na página."""
+    if (mode or EXTRACTION_MODE) == "evaluate":
+        try:
+            return _extract_with_evaluate(page, google_maps_url)
+        except Exception as e:
+            logging.warning(f"[V2] Extração em chamada única falhou ({e}); usando extração campo a campo.")
+    return _extract_with_locators(page, google_maps_url)
@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+"""Índice persistente (SQLite) para deduplicar estabelecimentos entre buscas.
+
+Guarda, para cada identificador de lugar visto nas URLs do Google Maps, a chave
+normalizada (nome + endereço ou telefone) do estabelecimento extraído, e o último
+resultado extraído para cada chave. Assim, lugares que aparecem com
+identificadores diferentes em buscas repetidas ou sobrepostas são reconhecidos
+antes de abrir os detalhes, e lugares já extraídos por outro job não são
+extraídos de novo.
+"""
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+
+# Abreviações comuns em endereços, expandidas antes da comparação
+_ADDRESS_ABBREVIATIONS = {
+    "r": "rua",
+    "av": "avenida",
+    "al": "alameda",
+    "tv": "travessa",
+    "trav": "travessa",
+    "pc": "praca",
+    "pca": "praca",
+    "rod": "rodovia",
+    "estr": "estrada",
+    "jd": "jardim",
+    "vl": "vila",
+    "pq": "parque",
+    "res": "residencial",
+    "dr": "doutor",
+}
+# Palavras que não ajudam a distinguir endereços ("nº", "n", "s/n"...)
+_ADDRESS_NOISE = {"n", "no", "nº", "numero", "sn", "s"}
+
+
+def _normalize_text(value):
+    """Minúsculas, sem acentos e pontuação, com espaços simples; '' para valores ausentes."""
+    if not value or value == "N/A":
+        return ""
+    value = unicodedata.normalize("NFKD", value)
+    value = "".join(char for char in value if not unicodedata.combining(char))
+    return " ".join(re.sub(r"[^\w]+", " ", value.casefold()).split())
+
+
+def normalize_name(name):
+    return _normalize_text(name)
+
+
+def normalize_address(address):
+    words = [_ADDRESS_ABBREVIATIONS.get(word, word) for word in _normalize_text(address).split()]
+    return " ".join(word for word in words if word not in _ADDRESS_NOISE)
+
+
+def normalize_phone(phone):
+    """Apenas os dígitos, sem o código do país (55) e o zero do DDD."""
+    digits = re.sub(r"\D", "", phone or "")
+    if len(digits) >= 12 and digits.startswith("55"):
+        digits = digits[2:]
+    return digits.lstrip("0")
+
+
+def dedupe_key(result):
+    """Chave normalizada do estabelecimento: nome + endereço (ou telefone, sem endereço)."""
+    second = normalize_address(result.get("address")) or normalize_phone(result.get("phone"))
+    return f"{normalize_name(result.get('name'))}|{second}"
+
+
+class PlaceIndex:
+    """Mapeia identificadores de lugar para a chave normalizada do estabelecimento."""
+
+    def __init__(self, path, max_entries=200000):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._adds_since_eviction = 0
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS place_keys ("
+            " place_id TEXT PRIMARY KEY,"
+            " dedupe_key TEXT NOT NULL,"
+            " updated_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_place_keys_updated ON place_keys (updated_at)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS place_results ("
+            " dedupe_key TEXT PRIMARY KEY,"
+            " result TEXT NOT NULL,"
+            " updated_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_place_results_updated ON place_results (updated_at)")
+        self._conn.commit()
+
+    @classmethod
+    def from_env(cls, default_path):
+        """Cria o índice a partir de SCRAPER_DEDUPE_INDEX_*; retorna None se estiver desativado."""
+        if os.environ.get('SCRAPER_DEDUPE_INDEX_ENABLED', '1') == '0':
+            return None
+        try:
+            return cls(
+                os.environ.get('SCRAPER_DEDUPE_INDEX_PATH', default_path),
+                max_entries=int(os.environ.get('SCRAPER_DEDUPE_INDEX_MAX_ENTRIES', 200000)),
+            )
+        except (sqlite3.Error, OSError) as e:
+            logging.error(f"[Dedupe] Não foi possível abrir o índice de lugares: {e}. Índice desativado.")
+            return None
+
+    def keys_for(self, place_ids):
+        """Chaves conhecidas para os identificadores informados (identificador -> chave)."""
+        place_ids = [place_id for place_id in set(place_ids) if place_id]
+        keys = {}
+        with self._lock:
+            # Consulta em lotes para respeitar o limite de parâmetros do SQLite
+            for start in range(0, len(place_ids), 500):
+                batch = place_ids[start:start + 500]
+                rows = self._conn.execute(
+                    f"SELECT place_id, dedupe_key FROM place_keys WHERE place_id IN ({','.join('?' * len(batch))})",
+                    batch
+                ).fetchall()
+                keys.update(rows)
+        return keys
+
+    def results_for(self, keys):
+        """Último resultado extraído para cada chave informada (chave -> resultado)."""
+        keys = [key for key in set(keys) if key]
+        results = {}
+        with self._lock:
+            for start in range(0, len(keys), 500):
+                batch = keys[start:start + 500]
+                rows = self._conn.execute(
+                    f"SELECT dedupe_key, result FROM place_results WHERE dedupe_key IN ({','.join('?' * len(batch))})",
+                    batch
+                ).fetchall()
+                results.update((key, json.loads(result)) for key, result in rows)
+        return results
+
+    def add(self, place_id, key, result=None):
+        if not place_id or not key:
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO place_keys (place_id, dedupe_key, updated_at) VALUES (?, ?, ?)",
+                (place_id, key, now)
+            )
+            if result is not None:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO place_results (dedupe_key, result, updated_at) VALUES (?, ?, ?)",
+                    (key, json.dumps(result, ensure_ascii=False), now)
+                )
+            self._adds_since_eviction += 1
+            if self._adds_since_eviction >= 500:
+                self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        """Acima do limite, remove as entradas atualizadas há mais tempo."""
+        self._adds_since_eviction = 0
+        if not self.max_entries:
+            return
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM place_keys").fetchone()
+        excess = count - self.max_entries
+        if excess > 0:
+            self._conn.execute(
+                "DELETE FROM place_keys WHERE place_id IN "
+                "(SELECT place_id FROM place_keys ORDER BY updated_at LIMIT ?)", (excess,)
+            )
+            logging.info(f"[Dedupe] {excess} lugares removidos do índice (limite de {self.max_entries}).")
+        self._conn.execute(
+            "DELETE FROM place_results WHERE dedupe_key NOT IN (SELECT dedupe_key FROM place_keys)"
+        )
+
+    def stats(self):
+        with self._lock:
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM place_keys").fetchone()
+            (results,) = self._conn.execute("SELECT COUNT(*) FROM place_results").fetchone()
+        return {"path": self.path, "entries": count, "results": results, "max_entries": self.max_entries}
@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+"""Bloqueio de requisições desnecessárias (imagens, fontes, tiles do mapa, telemetria).
+
+As regras são aplicadas com ``context.route`` em cada contexto do pool. Como o
+handler da rota roda na mesma thread da tarefa que está usando a página, os
+contadores de cada job são associados via ``threading.local``.
+"""
+import logging
+import os
+import threading
+from contextlib import contextmanager
+
+DEFAULT_BLOCKED_TYPES = ["image", "media", "font"]
+
+# Tiles do mapa, fotos e beacons de telemetria/analytics
+DEFAULT_BLOCKED_URL_PATTERNS = [
+    "/maps/vt",
+    "/kh/v=",
+    "khms",
+    "streetviewpixels",
+    "googleusercontent.com/p/",
+    "/gen_204",
+    "/log204",
+    "/maps/preview/log",
+    "google-analytics.com",
+    "googletagmanager.com",
+    "doubleclick.net",
+    "play.google.com/log",
+]
+
+# Tamanho médio estimado (bytes) das respostas bloqueadas, usado para estimar a economia
+ESTIMATED_BYTES_BY_TYPE = {
+    "image": 25_000,
+    "media": 200_000,
+    "font": 40_000,
+    "stylesheet": 20_000,
+    "script": 60_000,
+    "xhr": 2_000,
+    "fetch": 2_000,
+    "ping": 500,
+}
+DEFAULT_ESTIMATED_BYTES = 5_000
+
+
+def _env_list(name, default):
+    value = os.environ.get(name)
+    if value is None:
+        return list(default)
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+
+class BlockStats:
+    """Contadores de requisições bloqueadas e bytes economizados (estimados) de um job."""
+
+    def __init__(self):
+        self.blocked = 0
+        self.allowed = 0
+        self.estimated_saved_bytes = 0
+        self.blocked_by_type = {}
+        self._lock = threading.Lock()
+
+    def record(self, blocked, resource_type):
+        with self._lock:
+            if not blocked:
+                self.allowed += 1
+                return
+            self.blocked += 1
+            self.blocked_by_type[resource_type] = self.blocked_by_type.get(resource_type, 0) + 1
+            self.estimated_saved_bytes += ESTIMATED_BYTES_BY_TYPE.get(resource_type, DEFAULT_ESTIMATED_BYTES)
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                "blocked_requests": self.blocked,
+                "allowed_requests": self.allowed,
+                "estimated_saved_bytes": self.estimated_saved_bytes,
+                "blocked_by_type": dict(self.blocked_by_type),
+            }
+
+
+class ResourceBlocker:
+    """Regras de permissão/bloqueio por tipo de recurso e trecho de URL."""
+
+    def __init__(self, blocked_types=None, blocked_url_patterns=None, allowed_url_patterns=None, enabled=True):
+        self.enabled = enabled
+        self.blocked_types = set(DEFAULT_BLOCKED_TYPES if blocked_types is None else blocked_types)
+        self.blocked_url_patterns = list(DEFAULT_BLOCKED_URL_PATTERNS if blocked_url_patterns is None else blocked_url_patterns)
+        self.allowed_url_patterns = list(allowed_url_patterns or [])
+        self.totals = BlockStats()
+        self._local = threading.local()
+
+    @classmethod
+    def from_env(cls):
+        """Cria o bloqueador a partir das variáveis de ambiente SCRAPER_BLOCK_*."""
+        return cls(
+            blocked_types=_env_list('SCRAPER_BLOCK_TYPES', DEFAULT_BLOCKED_TYPES),
+            blocked_url_patterns=_env_list('SCRAPER_BLOCK_URL_PATTERNS', DEFAULT_BLOCKED_URL_PATTERNS),
+            allowed_url_patterns=_env_list('SCRAPER_ALLOW_URL_PATTERNS', []),
+            enabled=os.environ.get('SCRAPER_BLOCK_RESOURCES', '1') != '0',
+        )
+
+    def should_block(self, resource_type, url):
+        """Regras de permissão têm prioridade sobre as de bloqueio."""
+        if any(pattern in url for pattern in self.allowed_url_patterns):
+            return False
+        if resource_type in self.blocked_types:
+            return True
+        return any(pattern in url for pattern in self.blocked_url_patterns)
+
+    def _decide(self, request, job_stats):
+        blocked = self.should_block(request.resource_type, request.url)
+        self.totals.record(blocked, request.resource_type)
+        if job_stats is not None:
+            job_stats.record(blocked, request.resource_type)
+        return blocked
+
+    def _handle(self, route):
+        request = route.request
+        blocked = self._decide(request, getattr(self._local, "stats", None))
+        try:
+            if blocked:
+                route.abort()
+            else:
+                route.continue_()
+        except Exception as e:
+            logging.debug(f"[Blocker] Falha ao tratar requisição {request.url}: {e}")
+
+    def install(self, context):
+        """Instala as regras em um contexto do navegador."""
+        if self.enabled:
+            context.route("**/*", self._handle)
+
+    async def install_async(self, page, get_stats):
+        """Instala as regras em uma página da API assíncrona.
+
+        Todas as páginas do motor assíncrono rodam na mesma thread, então os
+        contadores do job são obtidos por ``get_stats()`` em vez de ``track``.
+        """
+        if not self.enabled:
+            return
+
+        async def handle(route):
+            request = route.request
+            blocked = self._decide(request, get_stats())
+            try:
+                if blocked:
+                    await route.abort()
+                else:
+                    await route.continue_()
+            except Exception as e:
+                logging.debug(f"[Blocker] Falha ao tratar requisição {request.url}: {e}")
+
+        await page.route("**/*", handle)
+
+    @contextmanager
+    def track(self, stats):
+        """Associa as requisições feitas pela thread atual aos contadores de um job."""
+        previous = getattr(self._local, "stats", None)
+        self._local.stats = stats
+        try:
+            yield stats
+        finally:
+            self._local.stats = previous
@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+"""Armazenamento compacto dos resultados de um job ou lote, com transbordo para disco.
+
+Em memória, cada resultado é guardado como uma tupla na ordem de
+``EXPORT_FIELDS``, em vez de um dicionário com as mesmas 13 chaves repetidas.
+Valores que se repetem muito (o "N/A" dos campos ausentes, tipos, horários e
+notas) são compartilhados entre os registros. Acima de ``SCRAPER_RESULTS_SPILL_ROWS``
+registros, os resultados passam para um arquivo SQLite temporário, removido
+junto com o armazenamento.
+
+``ResultStore`` se comporta como uma lista somente de acréscimo: ``len``,
+índices, fatias e iteração devolvem dicionários, lidos sob demanda, de modo que
+``/api/results`` e as exportações percorrem os resultados sem copiá-los.
+"""
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import weakref
+
+from src.exporters import EXPORT_FIELDS
+
+FIELDS = tuple(key for key, _, _ in EXPORT_FIELDS)
+# Campos com poucos valores distintos, compartilhados entre os registros
+_SHARED_FIELDS = {"type", "opening_hours", "average_rating"}
+# Marca campos ausentes no resultado original (diferente de "N/A")
+_MISSING = object()
+
+SPILL_ROWS = int(os.environ.get('SCRAPER_RESULTS_SPILL_ROWS', 50000))
+SPILL_DIR = os.environ.get('SCRAPER_RESULTS_SPILL_DIR') or None
+
+
+def _remove_spill(conn, path):
+    try:
+        conn.close()
+    except sqlite3.Error:
+        pass
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+class ResultStore:
+    """Lista somente de acréscimo de resultados, compacta em memória e transbordada para SQLite."""
+
+    PAGE_SIZE = 500
+
+    def __init__(self, spill_rows=None, spill_dir=None):
+        self.spill_rows = SPILL_ROWS if spill_rows is None else spill_rows
+        self.spill_dir = spill_dir or SPILL_DIR
+        self._rows = []
+        self._length = 0
+        self._shared = {}
+        self._conn = None
+        self._pending_commit = 0
+        self._lock = threading.Lock()
+
+    # --- Representação compacta ---
+
+    def _share(self, value):
+        # Chave com o tipo: 1.0 e True, por exemplo, são iguais para o dicionário
+        return self._shared.setdefault((type(value), value), value)
+
+    def _pack(self, result):
+        values = []
+        for key in FIELDS:
+            value = result.get(key, _MISSING)
+            if value == "N/A" or (key in _SHARED_FIELDS and isinstance(value, (str, float))):
+                value = self._share(value)
+            values.append(value)
+        extra = {key: value for key, value in result.items() if key not in FIELDS}
+        if extra:
+            values.append(extra)
+        return tuple(values)
+
+    @staticmethod
+    def _unpack(row):
+        result = {key: value for key, value in zip(FIELDS, row) if value is not _MISSING}
+        if len(row) > len(FIELDS):
+            result.update(row[len(FIELDS)])
+        return result
+
+    # --- Transbordo para disco ---
+
+    def _spill(self):
+        fd, path = tempfile.mkstemp(prefix="gms-results-", suffix=".sqlite3", dir=self.spill_dir)
+        os.close(fd)
+        conn = sqlite3.connect(path, check_same_thread=False)
+        # Arquivo temporário: não precisa sobreviver a uma queda do processo
+        conn.execute("PRAGMA journal_mode=OFF")
+        conn.execute("PRAGMA synchronous=OFF")
+        conn.execute("CREATE TABLE results (idx INTEGER PRIMARY KEY, data TEXT NOT NULL)")
+        conn.executemany(
+            "INSERT INTO results (idx, data) VALUES (?, ?)",
+            ((index, json.dumps(self._unpack(row), ensure_ascii=False)) for index, row in enumerate(self._rows))
+        )
+        conn.commit()
+        self._conn = conn
+        self._rows = []
+        self._shared = {}
+        weakref.finalize(self, _remove_spill, conn, path)
+        logging.info(f"[Results] {self._length} resultados transferidos para {path}.")
+
+    def append(self, result):
+        with self._lock:
+            if self._conn is None and self.spill_rows and self._length >= self.spill_rows:
+                self._spill()
+            if self._conn is not None:
+                self._conn.execute(
+                    "INSERT INTO results (idx, data) VALUES (?, ?)",
+                    (self._length, json.dumps(result, ensure_ascii=False))
+                )
+                self._pending_commit += 1
+                if self._pending_commit >= 100:
+                    self._conn.commit()
+                    self._pending_commit = 0
+            else:
+                self._rows.append(self._pack(result))
+            self._length += 1
+
+    # --- Leitura ---
+
+    @property
+    def spilled(self):
+        return self._conn is not None
+
+    def _range(self, start, stop):
+        with self._lock:
+            stop = min(stop, self._length)
+            if start >= stop:
+                return []
+            if self._conn is None:
+                return [self._unpack(row) for row in self._rows[start:stop]]
+            rows = self._conn.execute(
+                "SELECT data FROM results WHERE idx >= ? AND idx < ? ORDER BY idx", (start, stop)
+            ).fetchall()
+        return [json.loads(data) for (data,) in rows]
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            positions = range(*index.indices(self._length))
+            if not positions:
+                return []
+            # Lê o trecho contínuo coberto pela fatia e aplica o passo (inclusive negativo)
+            results = self._range(min(positions), max(positions) + 1)
+            return results[::positions.step] if positions.step > 0 else results[::-1][::-positions.step]
+        if index < 0:
+            index += self._length
+        results = self._range(index, index + 1) if index >= 0 else []
+        if not results:
+            raise IndexError(index)
+        return results[0]
+
+    def __iter__(self):
+        # Em páginas: os resultados acrescentados durante a iteração também são lidos
+        start = 0
+        while True:
+            page = self._range(start, start + self.PAGE_SIZE)
+            yield from page
+            if len(page) < self.PAGE_SIZE:
+                return
+            start += len(page)
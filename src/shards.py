@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+"""Divisão de uma busca em sub-áreas (shards) para contornar o limite da lista do Maps.
+
+A lista de resultados do Google Maps para de crescer em torno de 120 lugares por
+consulta. Para cobrir uma cidade inteira, a localização é dividida em bairros
+(uma consulta por bairro) ou em uma grade de coordenadas, cada célula aberta com
+o viewport (``/@lat,lng,zoomz``) na URL. Células que atingem o limite são
+subdivididas em quatro.
+"""
+import math
+from urllib.parse import quote
+
+SHARD_MODES = ("areas", "grid")
+
+# Tamanho aproximado da lista do Maps por consulta
+FEED_CAP = 120
+
+# Largura aproximada (pixels) do mapa visível ao lado da lista de resultados
+_VIEWPORT_WIDTH_PX = 1000
+_EARTH_CIRCUMFERENCE_KM = 40075.0
+_KM_PER_DEGREE_LAT = 111.32
+
+
+class Shard:
+    """Uma sub-área da busca: uma consulta por nome ou uma célula da grade."""
+
+    def __init__(self, label, query, url=None, bounds=None, depth=0):
+        self.label = label
+        self.query = query
+        self.url = url
+        # (sul, oeste, norte, leste) das células da grade
+        self.bounds = bounds
+        self.depth = depth
+        self.found = 0
+        self.new_urls = 0
+        self.unique_results = 0
+        self.capped = False
+        self.subdivided = False
+        self.error = None
+
+    @property
+    def can_subdivide(self):
+        return self.bounds is not None
+
+    def subdivide(self):
+        """Divide a célula em quatro quadrantes, um nível de zoom mais próximo."""
+        south, west, north, east = self.bounds
+        mid_lat = (south + north) / 2
+        mid_lng = (west + east) / 2
+        quadrants = [
+            ("SO", (south, west, mid_lat, mid_lng)),
+            ("SE", (south, mid_lng, mid_lat, east)),
+            ("NO", (mid_lat, west, north, mid_lng)),
+            ("NE", (mid_lat, mid_lng, north, east)),
+        ]
+        self.subdivided = True
+        return [
+            grid_cell(self.query, bounds, f"{self.label}/{suffix}", self.depth + 1)
+            for suffix, bounds in quadrants
+        ]
+
+    def to_dict(self):
+        return {
+            "label": self.label,
+            "depth": self.depth,
+            "found": self.found,
+            "new_urls": self.new_urls,
+            "unique_results": self.unique_results,
+            "capped": self.capped,
+            "subdivided": self.subdivided,
+            "error": self.error,
+        }
+
+
+def zoom_for_width(width_km, lat):
+    """Nível de zoom em que ``width_km`` ocupa aproximadamente o mapa visível."""
+    km_per_px_at_zoom0 = _EARTH_CIRCUMFERENCE_KM * math.cos(math.radians(lat)) / 256
+    zoom = math.log2(km_per_px_at_zoom0 * _VIEWPORT_WIDTH_PX / max(width_km, 0.05))
+    return max(3, min(21, int(round(zoom))))
+
+
+def search_url(query, lat, lng, zoom):
+    return f"https://www.google.com/maps/search/{quote(query)}/@{lat:.6f},{lng:.6f},{zoom}z"
+
+
+def grid_cell(establishment_type, bounds, label, depth=0):
+    south, west, north, east = bounds
+    lat = (south + north) / 2
+    lng = (west + east) / 2
+    width_km = (east - west) * _KM_PER_DEGREE_LAT * math.cos(math.radians(lat))
+    url = search_url(establishment_type, lat, lng, zoom_for_width(width_km, lat))
+    return Shard(label, establishment_type, url=url, bounds=bounds, depth=depth)
+
+
+def parse_center(value):
+    """Converte "lat,lng" em uma tupla de floats."""
+    parts = [part.strip() for part in str(value).split(",")]
+    if len(parts) != 2:
+        raise ValueError("O centro da grade deve estar no formato 'latitude,longitude'.")
+    lat, lng = float(parts[0]), float(parts[1])
+    if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+        raise ValueError("Coordenadas do centro da grade fora do intervalo válido.")
+    return lat, lng
+
+
+def area_shards(establishment_type, location, sub_areas):
+    """Uma consulta por sub-área (ex: bairros) da localização."""
+    return [
+        Shard(area, f"{establishment_type} em {area}, {location}")
+        for area in sub_areas
+    ]
+
+
+def grid_shards(establishment_type, center, radius_km, size):
+    """Grade ``size`` x ``size`` cobrindo o quadrado de lado 2 * ``radius_km`` em volta do centro."""
+    lat, lng = center
+    half_lat = radius_km / _KM_PER_DEGREE_LAT
+    half_lng = radius_km / (_KM_PER_DEGREE_LAT * max(math.cos(math.radians(lat)), 0.01))
+    south, west = lat - half_lat, lng - half_lng
+    step_lat = 2 * half_lat / size
+    step_lng = 2 * half_lng / size
+    shards = []
+    for row in range(size):
+        for col in range(size):
+            bounds = (
+                south + row * step_lat,
+                west + col * step_lng,
+                south + (row + 1) * step_lat,
+                west + (col + 1) * step_lng,
+            )
+            shards.append(grid_cell(establishment_type, bounds, f"{row + 1}x{col + 1}"))
+    return shards
+
+
+def build_shards(params):
+    """Monta os shards iniciais a partir dos parâmetros do job; lista vazia sem divisão."""
+    mode = params.get("shard_mode")
+    establishment_type = params["establishment_type"]
+    if mode == "areas":
+        return area_shards(establishment_type, params["location"], params.get("sub_areas") or [])
+    if mode == "grid":
+        return grid_shards(
+            establishment_type,
+            parse_center(params["grid_center"]),
+            float(params.get("grid_radius_km", 5)),
+            int(params.get("grid_size", 3)),
+        )
+    return []
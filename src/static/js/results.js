@@ -12,18 +12,81 @@ document.addEventListener('DOMContentLoaded', function() {
     const totalResults = document.getElementById('totalResults');
     const resultsList = document.getElementById('resultsList');
     const alertContainer = document.getElementById('alertContainer');
+    const inlineStatus = document.getElementById('inlineStatus');
     
-    // Iniciar verificação de status
-    checkStatus();
+    // Endpoints do job desta página (ou do job mais recente, se nenhum ID foi informado)
+    const jobId = document.body.dataset.jobId;
+    const apiBase = jobId ? `/api/jobs/${jobId}` : '/api';
+    
+    // Acompanhar a busca: stream de eventos quando suportado, senão consulta periódica
+    if (window.EventSource) {
+        streamResults();
+    } else {
+        checkStatus();
+    }
+    
+    // Função para receber resultados e progresso em tempo real (Server-Sent Events)
+    function streamResults() {
+        const source = new EventSource(`${apiBase}/stream`);
+        searchResults = [];
+        resultsList.innerHTML = '';
+        
+        source.addEventListener('status', event => {
+            const data = JSON.parse(event.data);
+            updateProgress(data);
+            
+            if (data.error) {
+                showAlert(data.error, 'error');
+            }
+        });
+        
+        source.addEventListener('result', event => {
+            const data = JSON.parse(event.data);
+            // Ignorar resultados já exibidos (ex: após reconexão)
+            if (data.index < searchResults.length) {
+                return;
+            }
+            searchResults.push(data.result);
+            appendResult(data.result, data.index);
+            totalResults.textContent = searchResults.length;
+            // Os primeiros resultados já podem ser consultados enquanto a coleta continua
+            loadingOverlay.classList.remove('active');
+        });
+        
+        source.addEventListener('done', event => {
+            const data = JSON.parse(event.data);
+            source.close();
+            searchParams = data.search_params;
+            searchQuery.textContent = `${searchParams.establishment_type} em ${searchParams.location}`;
+            updateProgress(data);
+            if (searchResults.length === 0) {
+                displayResults();
+            }
+            loadingOverlay.classList.remove('active');
+        });
+        
+        source.onerror = () => {
+            // O navegador reconecta automaticamente; se a conexão foi encerrada, usar a consulta periódica
+            if (source.readyState === EventSource.CLOSED) {
+                checkStatus();
+            }
+        };
+    }
+    
+    // Função para atualizar a barra de progresso e a mensagem de status
+    function updateProgress(data) {
+        progressBarFill.style.width = `${data.progress}%`;
+        progressStatus.textContent = data.message;
+        inlineStatus.textContent = data.is_running ? data.message : '';
+    }
     
     // Função para verificar o status da busca
     function checkStatus() {
-        fetch('/api/status')
+        fetch(`${apiBase}/status`)
             .then(response => response.json())
             .then(data => {
                 // Atualizar barra de progresso
-                progressBarFill.style.width = `${data.progress}%`;
-                progressStatus.textContent = data.message;
+                updateProgress(data);
                 
                 // Verificar se há erro
                 if (data.error) {
@@ -55,7 +118,7 @@ document.addEventListener('DOMContentLoaded', function() {
     
     // Função para carregar os resultados
     function loadResults() {
-        fetch('/api/results')
+        fetch(`${apiBase}/results`)
             .then(response => response.json())
             .then(data => {
                 // Armazenar resultados e parâmetros
@@ -64,7 +127,7 @@ document.addEventListener('DOMContentLoaded', function() {
                 
                 // Atualizar informações de busca
                 searchQuery.textContent = `${searchParams.establishment_type} em ${searchParams.location}`;
-                totalResults.textContent = data.total_found;
+                totalResults.textContent = data.total_unique_found;
                 
                 // Exibir resultados
                 displayResults();
@@ -96,87 +159,90 @@ document.addEventListener('DOMContentLoaded', function() {
         }
         
         // Adicionar cada resultado à lista
-        searchResults.forEach((result, index) => {
-            const resultItem = document.createElement('div');
-            resultItem.className = 'result-item';
-            
-            // Função para verificar se um valor é válido (não é N/A, null, undefined ou vazio)
-            function isValidValue(value) {
-                return value && value !== 'N/A' && value.trim() !== '';
-            }
-            
-            // Construir HTML do item com apenas os campos que existem
-            let resultHTML = `
-                <div class="result-header">
-                    <h3 class="result-title">${result.name || 'Nome não disponível'}</h3>
-                    <span class="result-number">#${index + 1}</span>
-                </div>
-            `;
-            
-            // Adicionar tipo se disponível
-            if (isValidValue(result.type)) {
-                resultHTML += `<p class="result-info"><span class="result-label">Tipo:</span> ${result.type}</p>`;
-            }
-            
-            // Adicionar endereço se disponível
-            if (isValidValue(result.address)) {
-                resultHTML += `<p class="result-info"><span class="result-label">Endereço:</span> ${result.address}</p>`;
-            }
-            
-            // Adicionar telefone se disponível
-            if (isValidValue(result.phone)) {
-                resultHTML += `<p class="result-info"><span class="result-label">Telefone:</span> <a href="tel:${result.phone}">${result.phone}</a></p>`;
-            }
-            
-            // Adicionar website se disponível
-            if (isValidValue(result.website)) {
-                const websiteUrl = result.website.startsWith('http') ? result.website : `https://${result.website}`;
-                resultHTML += `<p class="result-info"><span class="result-label">Website:</span> <a href="${websiteUrl}" target="_blank" rel="noopener">${result.website}</a></p>`;
-            }
-            
-            // Adicionar botões de ação
+        searchResults.forEach((result, index) => appendResult(result, index));
+    }
+    
+    // Função para adicionar um resultado ao final da lista
+    function appendResult(result, index) {
+        const resultItem = document.createElement('div');
+        resultItem.className = 'result-item';
+        
+        // Função para verificar se um valor é válido (não é N/A, null, undefined ou vazio)
+        function isValidValue(value) {
+            return value && value !== 'N/A' && value.trim() !== '';
+        }
+        
+        // Construir HTML do item com apenas os campos que existem
+        let resultHTML = `
+            <div class="result-header">
+                <h3 class="result-title">${result.name || 'Nome não disponível'}</h3>
+                <span class="result-number">#${index + 1}</span>
+            </div>
+        `;
+        
+        // Adicionar tipo se disponível
+        if (isValidValue(result.type)) {
+            resultHTML += `<p class="result-info"><span class="result-label">Tipo:</span> ${result.type}</p>`;
+        }
+        
+        // Adicionar endereço se disponível
+        if (isValidValue(result.address)) {
+            resultHTML += `<p class="result-info"><span class="result-label">Endereço:</span> ${result.address}</p>`;
+        }
+        
+        // Adicionar telefone se disponível
+        if (isValidValue(result.phone)) {
+            resultHTML += `<p class="result-info"><span class="result-label">Telefone:</span> <a href="tel:${result.phone}">${result.phone}</a></p>`;
+        }
+        
+        // Adicionar website se disponível
+        if (isValidValue(result.website)) {
+            const websiteUrl = result.website.startsWith('http') ? result.website : `https://${result.website}`;
+            resultHTML += `<p class="result-info"><span class="result-label">Website:</span> <a href="${websiteUrl}" target="_blank" rel="noopener">${result.website}</a></p>`;
+        }
+        
+        // Adicionar botões de ação
+        resultHTML += `
+            <div class="result-actions">
+                <a href="https://www.google.com/maps/search/?api=1&query=${encodeURIComponent((result.name || '') + ' ' + (result.address || ''))}" 
+                   target="_blank" 
+                   rel="noopener"
+                   class="btn btn-outline">
+                    <span class="material-icons">map</span>
+                    Ver no Google Maps
+                </a>
+        `;
+        
+        // Adicionar botão de ligar se houver telefone
+        if (isValidValue(result.phone)) {
             resultHTML += `
-                <div class="result-actions">
-                    <a href="https://www.google.com/maps/search/?api=1&query=${encodeURIComponent((result.name || '') + ' ' + (result.address || ''))}" 
+                <a href="tel:${result.phone}" class="btn btn-outline">
+                    <span class="material-icons">phone</span>
+                    Ligar
+                </a>
+            `;
+        }
+        
+        // Adicionar botão do WhatsApp se houver telefone
+        if (isValidValue(result.phone)) {
+            const cleanPhone = result.phone.replace(/\D/g, ''); // Remove caracteres não numéricos
+            if (cleanPhone.length >= 10) {
+                resultHTML += `
+                    <a href="https://wa.me/55${cleanPhone}" 
                        target="_blank" 
                        rel="noopener"
                        class="btn btn-outline">
-                        <span class="material-icons">map</span>
-                        Ver no Google Maps
-                    </a>
-            `;
-            
-            // Adicionar botão de ligar se houver telefone
-            if (isValidValue(result.phone)) {
-                resultHTML += `
-                    <a href="tel:${result.phone}" class="btn btn-outline">
-                        <span class="material-icons">phone</span>
-                        Ligar
+                        <span class="material-icons">chat</span>
+                        WhatsApp
                     </a>
                 `;
             }
-            
-            // Adicionar botão do WhatsApp se houver telefone
-            if (isValidValue(result.phone)) {
-                const cleanPhone = result.phone.replace(/\D/g, ''); // Remove caracteres não numéricos
-                if (cleanPhone.length >= 10) {
-                    resultHTML += `
-                        <a href="https://wa.me/55${cleanPhone}" 
-                           target="_blank" 
-                           rel="noopener"
-                           class="btn btn-outline">
-                            <span class="material-icons">chat</span>
-                            WhatsApp
-                        </a>
-                    `;
-                }
-            }
-            
-            resultHTML += '</div>'; // Fechar result-actions
-            
-            resultItem.innerHTML = resultHTML;
-            resultsList.appendChild(resultItem);
-        });
+        }
+        
+        resultHTML += '</div>'; // Fechar result-actions
+        
+        resultItem.innerHTML = resultHTML;
+        resultsList.appendChild(resultItem);
     }
     
     // Função para mostrar alertas
@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+"""Esperas do scraper: por eventos da página ou por tempos fixos.
+
+No modo ``event`` cada espera termina assim que a página indica que está pronta
+(crescimento da lista, troca do painel de detalhes, DOM estável), sempre com um
+teto de tempo. O modo ``fixed`` reproduz os tempos fixos originais e serve de
+referência para comparar a latência total dos jobs.
+"""
+import logging
+import os
+import threading
+import time
+
+from playwright.sync_api import TimeoutError as PlaywrightTimeoutError
+
+WAIT_MODES = ("event", "fixed")
+WAIT_MODE = os.environ.get('SCRAPER_WAIT_MODE', 'event')
+# Tempo máximo para o painel de detalhes exibir o estabelecimento clicado
+DETAIL_TIMEOUT_MS = 15000
+
+# Resolve quando o DOM passa `quietMs` sem mutações, ou com false ao atingir `timeoutMs`
+DOM_STABLE_JS = """
+([quietMs, timeoutMs]) => new Promise(resolve => {
+    let quietTimer = null;
+    let ceilingTimer = null;
+    const finish = (stable) => {
+        observer.disconnect();
+        clearTimeout(quietTimer);
+        clearTimeout(ceilingTimer);
+        resolve(stable);
+    };
+    const observer = new MutationObserver(() => {
+        clearTimeout(quietTimer);
+        quietTimer = setTimeout(() => finish(true), quietMs);
+    });
+    observer.observe(document.body, {subtree: true, childList: true, characterData: true});
+    quietTimer = setTimeout(() => finish(true), quietMs);
+    ceilingTimer = setTimeout(() => finish(false), timeoutMs);
+})
+"""
+
+# Verdadeiro quando há mais links de resultado do que na rolagem anterior
+FEED_GROWTH_JS = """
+([xpath, previousCount]) => document.evaluate(
+    `count(${xpath})`, document, null, XPathResult.NUMBER_TYPE, null
+).numberValue > previousCount
+"""
+
+# Verdadeiro quando o painel de detalhes mostra outro estabelecimento. A URL muda
+# antes do painel, então só o nome no h1 confirma a troca; a URL serve apenas quando
+# o item clicado tem o mesmo nome do anterior (ex: filiais de uma rede).
+DETAIL_CHANGED_JS = """
+([xpath, previousName, previousUrl, listingUrl]) => {
+    const node = document.evaluate(
+        xpath, document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null
+    ).singleNodeValue;
+    const name = node ? (node.innerText || '').trim() : '';
+    if (name === '') return false;
+    if (name !== previousName) return true;
+    const link = listingUrl ? document.querySelector(`a[href="${CSS.escape(listingUrl)}"]`) : null;
+    const expected = link ? (link.getAttribute('aria-label') || '').trim() : '';
+    return expected === previousName && location.href !== previousUrl;
+}
+"""
+
+# Verdadeiro quando o campo de busca já contém o texto digitado
+INPUT_VALUE_JS = """
+([selector, value]) => {
+    const input = document.querySelector(selector);
+    return !!input && input.value === value;
+}
+"""
+
+
+def wait_for_dom_stable(page, quiet_ms=300, timeout_ms=1500):
+    """Aguarda o DOM ficar sem mutações por ``quiet_ms``; retorna False se atingir o teto."""
+    try:
+        return bool(page.evaluate(DOM_STABLE_JS, [quiet_ms, timeout_ms]))
+    except Exception as e:
+        logging.warning(f"[Waits] Falha ao aguardar DOM estável: {e}")
+        return False
+
+
+def wait_for_feed_growth(page, link_xpath, previous_count, timeout_ms=3000):
+    """Aguarda a lista de resultados ganhar novos links após uma rolagem."""
+    try:
+        page.wait_for_function(FEED_GROWTH_JS, arg=[link_xpath, previous_count], timeout=timeout_ms)
+        return True
+    except PlaywrightTimeoutError:
+        return False
+
+
+def wait_for_detail_change(page, name_xpath, previous_name, previous_url, listing_url=None, timeout_ms=DETAIL_TIMEOUT_MS):
+    """Aguarda o painel de detalhes trocar de estabelecimento após clicar em ``listing_url``."""
+    try:
+        page.wait_for_function(
+            DETAIL_CHANGED_JS, arg=[name_xpath, previous_name, previous_url, listing_url], timeout=timeout_ms
+        )
+        return True
+    except PlaywrightTimeoutError:
+        return False
+
+
+def wait_for_input_value(page, selector, value, timeout_ms=1000):
+    """Aguarda o campo de busca conter o texto preenchido."""
+    try:
+        page.wait_for_function(INPUT_VALUE_JS, arg=[selector, value], timeout=timeout_ms)
+        return True
+    except PlaywrightTimeoutError:
+        return False
+
+
+def wait_for_maps_ready(page, timeout_ms=5000):
+    """Aguarda a página inicial do Maps exibir o campo de busca e estabilizar."""
+    try:
+        page.wait_for_selector("#searchboxinput", state="visible", timeout=timeout_ms)
+    except PlaywrightTimeoutError:
+        logging.warning("[Waits] Campo de busca não apareceu dentro do tempo limite.")
+        return False
+    return wait_for_dom_stable(page, quiet_ms=500, timeout_ms=timeout_ms)
+
+
+class Waiter:
+    """Aplica as esperas de um job no modo configurado e acumula o tempo gasto nelas."""
+
+    def __init__(self, mode=None):
+        self.mode = mode if mode in WAIT_MODES else WAIT_MODE
+        self.total_seconds = 0.0
+        self.by_step = {}
+        self._lock = threading.Lock()
+
+    def record(self, step, elapsed):
+        """Soma ao total o tempo gasto em uma espera (usado também pelo motor assíncrono)."""
+        with self._lock:
+            self.total_seconds += elapsed
+            self.by_step[step] = self.by_step.get(step, 0.0) + elapsed
+
+    def _timed(self, step, fn, *args):
+        start = time.time()
+        try:
+            return fn(*args)
+        finally:
+            self.record(step, time.time() - start)
+
+    @property
+    def event_driven(self):
+        return self.mode == "event"
+
+    def after_goto(self, page):
+        """Após carregar a página inicial do Maps."""
+        if self.event_driven:
+            return self._timed("goto", wait_for_maps_ready, page)
+        return self._timed("goto", page.wait_for_timeout, 5000)
+
+    def after_fill(self, page, selector, value):
+        """Após preencher o campo de busca."""
+        if self.event_driven:
+            return self._timed("fill", wait_for_input_value, page, selector, value, 1000)
+        return self._timed("fill", page.wait_for_timeout, 1000)
+
+    def after_hover(self, page):
+        """Após o hover inicial na lista de resultados."""
+        if not self.event_driven:
+            self._timed("hover", page.wait_for_timeout, 500)
+
+    def after_scroll(self, page, link_xpath, previous_count):
+        """Após cada rolagem da lista de resultados."""
+        if self.event_driven:
+            return self._timed("scroll", wait_for_feed_growth, page, link_xpath, previous_count, 3000)
+        return self._timed("scroll", page.wait_for_timeout, 3000)
+
+    def between_scrolls(self, page):
+        """Pausa entre duas rolagens."""
+        if not self.event_driven:
+            self._timed("scroll", page.wait_for_timeout, 500)
+
+    def after_click(self, page, name_xpath, previous_name, previous_url, listing_url=None, timeout_ms=DETAIL_TIMEOUT_MS):
+        """Após clicar em um elemento da lista: aguarda o painel trocar de estabelecimento."""
+        if self.event_driven:
+            return self._timed(
+                "detail", wait_for_detail_change, page, name_xpath, previous_name, previous_url, listing_url, timeout_ms
+            )
+
+    def after_detail_load(self, page):
+        """Após o nome aparecer no painel de detalhes, antes de extrair os campos."""
+        if self.event_driven:
+            return self._timed("detail", wait_for_dom_stable, page, 300, 1500)
+        return self._timed("detail", page.wait_for_timeout, 1500)
+
+    def between_items(self, page):
+        """Pausa entre dois elementos processados por clique."""
+        if not self.event_driven:
+            self._timed("detail", page.wait_for_timeout, 500)
+
+    def summary(self):
+        with self._lock:
+            return {
+                "wait_mode": self.mode,
+                "wait_seconds": round(self.total_seconds, 2),
+                "wait_seconds_by_step": {step: round(seconds, 2) for step, seconds in self.by_step.items()},
+            }
@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+"""Worker de coleta: consome jobs da fila compartilhada e executa o scraping.
+
+Requer ``SCRAPER_QUEUE_BACKEND=sqlite`` ou ``redis`` (a mesma configuração do
+servidor web). Vários workers, em um ou mais hosts, podem consumir a mesma fila.
+
+Uso: python -m src.worker
+"""
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+import logging
+import signal
+import socket
+import threading
+
+from src import metrics
+from src.jobs import Job, run_job
+from src.main import async_engine, browser_pool, job_store, run_scraper
+
+# Intervalo máximo (segundos) entre as gravações do status no armazenamento compartilhado
+SYNC_INTERVAL = float(os.environ.get('SCRAPER_WORKER_SYNC_INTERVAL', 1))
+
+
+class StoreSync:
+    """Grava o status e os novos resultados de um job local no armazenamento compartilhado."""
+
+    def __init__(self, store, job, record):
+        self.store = store
+        self.job = job
+        self.record = record
+        self.sent_results = 0
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name=f"sync-{job.id}", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def flush(self):
+        job = self.job
+        new_results = job.results[self.sent_results:]
+        self.record.update({
+            "started_at": job.started_at,
+            "finished_at": job.finished_at,
+            "status": dict(job.status),
+        })
+        self.store.save(self.record, new_results)
+        self.sent_results += len(new_results)
+
+    def _loop(self):
+        while not self._stopped.is_set():
+            # Acorda a cada novo resultado, ou no máximo a cada SYNC_INTERVAL (sinal de vida)
+            self.job.wait_for_update(self.sent_results, timeout=SYNC_INTERVAL)
+            if self._stopped.is_set():
+                return
+            try:
+                self.flush()
+            except Exception as e:
+                logging.error(f"[Worker] Erro ao gravar o job {self.job.id} no armazenamento: {e}")
+            if self.job.is_finished:
+                self._stopped.wait(SYNC_INTERVAL)
+
+    def stop(self):
+        self._stopped.set()
+        self._thread.join()
+        self.flush()
+
+
+def process(record):
+    """Executa um job reservado na fila."""
+    job = Job(record["params"], record["job_id"])
+    job.created_at = record["created_at"]
+    sync = StoreSync(job_store, job, record)
+    sync.start()
+    try:
+        run_job(job, run_scraper)
+    finally:
+        sync.stop()
+
+
+def consume(worker_id, stopping):
+    logging.info(f"[Worker] {worker_id} aguardando jobs.")
+    while not stopping.is_set():
+        try:
+            record = job_store.claim(worker_id, timeout=5)
+        except Exception as e:
+            logging.error(f"[Worker] Erro ao consultar a fila: {e}")
+            stopping.wait(5)
+            continue
+        if record is None:
+            continue
+        logging.info(f"[Worker] {worker_id} assumiu o job {record['job_id']}.")
+        try:
+            process(record)
+        except Exception:
+            logging.exception(f"[Worker] Erro ao processar o job {record['job_id']}.")
+
+
+def main():
+    if job_store is None:
+        logging.error("[Worker] Defina SCRAPER_QUEUE_BACKEND=sqlite ou redis para usar o worker.")
+        return 1
+
+    concurrency = max(1, int(os.environ.get('SCRAPER_WORKER_JOBS', os.environ.get('SCRAPER_MAX_CONCURRENT_JOBS', 2))))
+    stopping = threading.Event()
+
+    def request_stop(signum, frame):
+        logging.info("[Worker] Encerrando após os jobs em andamento...")
+        stopping.set()
+
+    signal.signal(signal.SIGTERM, request_stop)
+    signal.signal(signal.SIGINT, request_stop)
+
+    # Cada worker tem suas próprias métricas; exponha-as em uma porta para o Prometheus
+    metrics_port = os.environ.get('SCRAPER_METRICS_PORT')
+    if metrics_port:
+        metrics.serve(int(metrics_port))
+
+    prefix = f"{socket.gethostname()}:{os.getpid()}"
+    logging.info(f"[Worker] Iniciando {concurrency} consumidores na fila {job_store.describe()}.")
+    threads = [
+        threading.Thread(target=consume, args=(f"{prefix}:{index}", stopping), name=f"worker-{index}")
+        for index in range(concurrency)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    browser_pool.shutdown()
+    if async_engine is not None:
+        async_engine.shutdown()
+    logging.info("[Worker] Worker encerrado.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
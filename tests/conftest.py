@@ -0,0 +1,6 @@
+# -*- coding: utf-8 -*-
+import os
+import tempfile
+
+# Caches, índices e diários criados ao importar src.main ficam fora de data/
+os.environ.setdefault("SCRAPER_DATA_DIR", tempfile.mkdtemp(prefix="gms-tests-"))
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+"""Governador do pool no motor sync: limita quantos navegadores extraem ao mesmo tempo."""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from src import main
+from src.governor import OK, TIMEOUT, GovernorRegistry
+
+
+class SlowBrowserPool:
+    """Pool falso com ``size`` navegadores que mede quantas extrações rodam ao mesmo tempo."""
+
+    def __init__(self, size):
+        self.size = size
+        self.running = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(size)
+
+    def _extract(self, url):
+        with self._lock:
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+        time.sleep(0.05)
+        with self._lock:
+            self.running -= 1
+        return {"name": url, "address": url, "google_maps_url": url}, 1
+
+    def submit(self, fn, run, extract, index, url, *args):
+        return self._executor.submit(self._extract, url)
+
+
+def extract_all(pool, monkeypatch, count=8):
+    monkeypatch.setattr(main, "browser_pool", pool)
+    monkeypatch.setattr(main, "place_cache", None)
+    monkeypatch.setattr(main, "place_index", None)
+    monkeypatch.setattr(main, "http_extractor", None)
+    results = []
+    main.extract_details_parallel(
+        [f"https://www.google.com/maps/place/{index}" for index in range(count)],
+        lambda index, result, round_trips: results.append(result), main.ScrapeRun({}), workers=pool.size
+    )
+    return results
+
+
+def test_pool_governor_limits_browsers_after_failures(monkeypatch):
+    governors = GovernorRegistry(window=4, failure_threshold=0.2, max_delay=0)
+    monkeypatch.setattr(main, "governors", governors)
+
+    pool = SlowBrowserPool(4)
+    assert len(extract_all(pool, monkeypatch)) == 8
+    assert pool.peak == 4
+
+    # Timeouts seguidos: a concorrência do pool cai pela metade
+    pool_governor = governors.get(main.POOL_GOVERNOR, 4)
+    pool_governor.record(TIMEOUT)
+    assert pool_governor.stats()["concurrency"] == 2
+    pool = SlowBrowserPool(4)
+    assert len(extract_all(pool, monkeypatch)) == 8
+    assert pool.peak == 2
+
+    # Com sucessos, volta a crescer aos poucos
+    for _ in range(10):
+        pool_governor.record(OK)
+    assert pool_governor.stats()["concurrency"] == 4
@@ -0,0 +1,233 @@
+# -*- coding: utf-8 -*-
+"""Extração via HTTP verificada com páginas salvas em ``tests/fixtures``."""
+import asyncio
+import gzip
+import os
+import re
+import threading
+from contextlib import asynccontextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from src import http_extractor, main
+from src.http_extractor import (
+    HttpPlaceExtractor, parse_initialization_state, parse_place_html, parse_place_page
+)
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures")
+URL = "https://www.google.com/maps/place/Exemplo/data=!4m2!3m1!1s0x1:0x2"
+
+
+def fixture(name):
+    with open(os.path.join(FIXTURES, name), encoding="utf-8") as file:
+        return file.read()
+
+
+def test_panel_page_fields():
+    result = parse_place_page(fixture("place_panel.html"), URL)
+    assert result == {
+        "name": "Estabelecimento 3003",
+        "type": "Farmácia",
+        "address": "Rua 4, Amambaí - Campo Grande - MS",
+        "phone": "(67) 3003-3003",
+        "website": "estabelecimento3003.com.br",
+        "opening_hours": "Aberto ⋅ Fecha às 22:00",
+        "average_rating": 3.3,
+        "review_count": 331,
+        "introduction": "Atendimento de bairro com entrega rápida.",
+        "store_shopping": True,
+        "in_store_pickup": True,
+        "delivery": False,
+        "google_maps_url": URL,
+    }
+
+
+def test_panel_page_with_missing_fields():
+    result = parse_place_page(fixture("place_panel_missing_fields.html"), URL)
+    assert result["name"] == "Padaria Sem Telefone"
+    assert result["address"] == "Rua das Flores, 12 - Centro - Campo Grande - MS"
+    for key in ("type", "phone", "website", "opening_hours", "average_rating", "review_count", "introduction"):
+        assert result[key] == "N/A", key
+    assert (result["store_shopping"], result["in_store_pickup"], result["delivery"]) == (False, False, False)
+
+
+def test_initialization_state_fields():
+    html = fixture("place_initialization_state.html")
+    assert parse_place_html(html, URL) is None
+    result = parse_place_page(html, URL)
+    assert result == {
+        "name": "Drogaria Exemplo",
+        "type": "Farmácia",
+        "address": "Av. Afonso Pena, 1000 - Centro, Campo Grande - MS, 79002-070",
+        "phone": "(67) 3321-0000",
+        "website": "drogariaexemplo.com.br",
+        "opening_hours": "segunda-feira: 08:00–22:00; domingo: Fechado",
+        "average_rating": 4.6,
+        "review_count": 128,
+        "introduction": "Farmácia de manipulação com entrega em domicílio.",
+        "store_shopping": False,
+        "in_store_pickup": True,
+        "delivery": True,
+        "google_maps_url": URL,
+    }
+
+
+def test_initialization_state_with_changed_layout_is_not_parsed():
+    # Se o nome sair da posição conhecida, nada é extraído e o navegador é usado
+    html = fixture("place_initialization_state.html").replace('\\"Drogaria Exemplo\\"', "null", 1)
+    assert html != fixture("place_initialization_state.html")
+    assert parse_initialization_state(html, URL) is None
+
+
+def test_non_place_page_is_not_parsed():
+    assert parse_place_page(fixture("search_page.html"), URL) is None
+
+
+@pytest.fixture
+def fixture_server():
+    """Serve as páginas salvas: /place/<arquivo>, /blocked (429), /missing (404) e corpos comprimidos corrompidos."""
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def do_GET(self):
+            match = re.fullmatch(r"/place/([\w.]+)", self.path)
+            encoding = None
+            if match:
+                status, body = 200, fixture(match.group(1)).encode("utf-8")
+            elif self.path == "/gzip-truncated":
+                status, encoding = 200, "gzip"
+                body = gzip.compress(fixture("place_panel.html").encode("utf-8"))[:-200]
+            elif self.path == "/deflate-corrupt":
+                status, encoding, body = 200, "deflate", b"isto n\xe3o \xe9 deflate"
+            elif self.path == "/blocked":
+                status, body = 429, b"Too Many Requests"
+            else:
+                status, body = 404, b"Not Found"
+            self.send_response(status)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            if encoding:
+                self.send_header("Content-Encoding", encoding)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def make_extractor(base_url, path):
+    return HttpPlaceExtractor("test", max_connections=2, timeout=5, url_rewriter=lambda url: base_url + path)
+
+
+def test_extract_counts_outcomes(fixture_server):
+    cases = [
+        ("/place/place_panel.html", "parsed"),
+        ("/place/search_page.html", "fallback"),
+        ("/missing", "fallback"),
+        ("/blocked", "blocked"),
+        ("/gzip-truncated", "error"),
+        ("/deflate-corrupt", "error"),
+    ]
+    for path, outcome in cases:
+        extractor = make_extractor(fixture_server, path)
+        try:
+            result = extractor.extract(URL)
+            assert (result is not None) == (outcome == "parsed"), path
+            assert extractor.stats()[outcome] == 1, path
+        finally:
+            extractor.shutdown()
+
+
+def test_extract_parser_error_falls_back(fixture_server, monkeypatch):
+    def broken_parser(html, url):
+        raise IndexError("layout inesperado")
+
+    monkeypatch.setattr(http_extractor, "parse_place_page", broken_parser)
+    extractor = make_extractor(fixture_server, "/place/place_panel.html")
+    try:
+        assert extractor.extract(URL) is None
+        assert extractor.stats()["error"] == 1
+    finally:
+        extractor.shutdown()
+
+
+class FakeBrowserPool:
+    def __init__(self):
+        self.calls = []
+
+    def run(self, fn, *args):
+        self.calls.append(args)
+        return {"name": "Pelo navegador", "google_maps_url": URL}, 1
+
+
+@pytest.mark.parametrize("path, uses_browser", [
+    ("/place/place_panel.html", False),
+    ("/place/search_page.html", True),
+    ("/blocked", True),
+    ("/gzip-truncated", True),
+])
+def test_extract_fast_falls_back_to_browser(fixture_server, monkeypatch, path, uses_browser):
+    extractor = make_extractor(fixture_server, path)
+    pool = FakeBrowserPool()
+    monkeypatch.setattr(main, "http_extractor", extractor)
+    monkeypatch.setattr(main, "browser_pool", pool)
+    monkeypatch.setattr(main, "store_cached_place", lambda url, result: None)
+    run = main.ScrapeRun({})
+    try:
+        result, round_trips = main._extract_fast(0, URL, run)
+    finally:
+        extractor.shutdown()
+    assert bool(pool.calls) == uses_browser
+    if uses_browser:
+        assert (result["name"], round_trips) == ("Pelo navegador", 1)
+        assert (run.counters["http_extractions"], run.counters["http_fallbacks"]) == (0, 1)
+    else:
+        assert (result["name"], round_trips) == ("Estabelecimento 3003", 0)
+        assert (run.counters["http_extractions"], run.counters["http_fallbacks"]) == (1, 0)
+
+
+class FakeAsyncEngine:
+    max_pages = 2
+    pages_per_context = 2
+
+    @asynccontextmanager
+    async def page(self, block_stats):
+        yield object()
+
+    def context_name(self, page):
+        return "context-1"
+
+
+def test_async_details_fall_back_to_browser(fixture_server, monkeypatch):
+    paths = {"https://a": "/place/place_panel.html", "https://b": "/deflate-corrupt", "https://c": "/place/search_page.html"}
+    extractor = HttpPlaceExtractor("test", max_connections=2, timeout=5,
+                                   url_rewriter=lambda url: fixture_server + paths[url])
+    browser_urls = []
+
+    async def fake_extract_from_url_async(page, index, url, run, governor, retries=0):
+        browser_urls.append(url)
+        return {"name": "Pelo navegador", "google_maps_url": url}, 1
+
+    monkeypatch.setattr(main, "http_extractor", extractor)
+    monkeypatch.setattr(main, "async_engine", FakeAsyncEngine())
+    monkeypatch.setattr(main, "extract_from_url_async", fake_extract_from_url_async)
+    monkeypatch.setattr(main, "store_cached_place", lambda url, result: None)
+    run = main.ScrapeRun({})
+    results = {}
+    try:
+        asyncio.run(main._extract_details_async(
+            list(paths), lambda index, result, round_trips: results.__setitem__(index, result["name"]), run
+        ))
+    finally:
+        extractor.shutdown()
+    assert results == {0: "Estabelecimento 3003", 1: "Pelo navegador", 2: "Pelo navegador"}
+    assert sorted(browser_urls) == ["https://b", "https://c"]
@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+"""Deduplicação entre jobs pelo índice persistente de lugares."""
+from concurrent.futures import Future
+
+import pytest
+
+from src import main
+from src.place_index import PlaceIndex
+
+
+def place_url(place_id):
+    return f"https://www.google.com/maps/place/Lugar+{place_id}/data=!4m2!3m1!1s0x{place_id:x}:0x1!19sChIJ{place_id}"
+
+
+class FakeBrowserPool:
+    """Executa a extração na hora, registrando as URLs abertas no "navegador"."""
+
+    size = 2
+
+    def __init__(self):
+        self.opened = []
+
+    def submit(self, fn, run, extract, index, url, *args):
+        self.opened.append(url)
+        place_id = int(url.rsplit("ChIJ", 1)[1])
+        future = Future()
+        future.set_result(({"name": f"Lugar {place_id}", "address": f"Rua {place_id}", "google_maps_url": url}, 1))
+        return future
+
+
+@pytest.fixture
+def index(tmp_path, monkeypatch):
+    place_index = PlaceIndex(str(tmp_path / "place_index.sqlite3"))
+    monkeypatch.setattr(main, "place_index", place_index)
+    monkeypatch.setattr(main, "place_cache", None)
+    monkeypatch.setattr(main, "http_extractor", None)
+    return place_index
+
+
+def run_job(listing_urls, pool, monkeypatch):
+    monkeypatch.setattr(main, "browser_pool", pool)
+    run, collector = main._start_scrape("lugares em Campo Grande", 10, {}, None, None, None, None)
+    listing_urls = main.drop_known_duplicates(listing_urls, run)
+    main.extract_details_parallel(
+        listing_urls, lambda index, result, round_trips: collector.register(index, result, len(listing_urls), round_trips),
+        run, workers=2
+    )
+    return run, list(collector.results)
+
+
+def test_overlapping_jobs_do_not_reextract_places(index, monkeypatch):
+    first_pool = FakeBrowserPool()
+    _, first_results = run_job([place_url(place_id) for place_id in (1, 2, 3)], first_pool, monkeypatch)
+    assert len(first_pool.opened) == 3
+    assert index.stats()["results"] == 3
+
+    # O segundo job cobre parte da mesma área: só o lugar novo é aberto
+    second_pool = FakeBrowserPool()
+    run, second_results = run_job([place_url(place_id) for place_id in (2, 3, 4)], second_pool, monkeypatch)
+    assert second_pool.opened == [place_url(4)]
+    assert run.counters["index_hits"] == 2
+    assert sorted(result["name"] for result in second_results) == ["Lugar 2", "Lugar 3", "Lugar 4"]
+    reused = next(result for result in second_results if result["name"] == "Lugar 2")
+    assert reused == next(result for result in first_results if result["name"] == "Lugar 2")
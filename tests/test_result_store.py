@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+"""Fatias dos resultados em memória, transbordados e na fila compartilhada."""
+import pytest
+
+from src.job_store import SqliteJobStore
+from src.jobs import StoredResults
+from src.result_store import ResultStore
+
+EXPECTED = [{"name": f"Lugar {i}", "rating": float(i)} for i in range(7)]
+
+
+def assert_slices_match(results):
+    for start in (None, -9, -3, 0, 2, 6, 9):
+        for stop in (None, -9, -2, 0, 3, 7, 9):
+            for step in (None, 1, 2, 3, -1, -2, -4):
+                index = slice(start, stop, step)
+                assert results[index] == EXPECTED[index], index
+    assert results[-1] == EXPECTED[-1]
+    with pytest.raises(IndexError):
+        results[len(EXPECTED)]
+
+
+@pytest.mark.parametrize("spill_rows", [0, 3])
+def test_result_store_slices_match_list(tmp_path, spill_rows):
+    store = ResultStore(spill_rows=spill_rows, spill_dir=str(tmp_path))
+    for result in EXPECTED:
+        store.append(result)
+    assert store.spilled == bool(spill_rows)
+    assert_slices_match(store)
+
+
+def test_stored_results_slices_match_list(tmp_path):
+    store = SqliteJobStore(str(tmp_path / "jobs.sqlite3"))
+    record = store.enqueue("job1", {}, {"state": "queued"})
+    store.save(record, EXPECTED)
+    assert_slices_match(StoredResults(store, "job1"))